@@ -0,0 +1,57 @@
+"""Draws detection boxes and the capture summary onto an image and encodes it as JPEG."""
+import cv2
+import numpy as np
+
+import config
+from image_utils import load_image
+
+BOX_COLOR = (255, 0, 0)
+TEXT_COLOR = (0, 255, 0)
+
+
+def predictions_array(predictions):
+    """Packs a predictions list into an (N, 5) array of center x, center y, width, height, confidence."""
+    if len(predictions) == 0:
+        return np.empty((0, 5), dtype=np.float32)
+    return np.array([[p["x"], p["y"], p["width"], p["height"], p["confidence"]] for p in predictions],
+                    dtype=np.float32)
+
+
+def draw_predictions(image, predictions, label="FAA"):
+    """Draws every box and its confidence onto image in place."""
+    boxes = predictions if isinstance(predictions, np.ndarray) else predictions_array(predictions)
+    corners = np.empty((len(boxes), 4), dtype=np.int32)
+    corners[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+    corners[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+    corners[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+    corners[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+    for (x1, y1, x2, y2), confidence in zip(corners.tolist(), boxes[:, 4].tolist()):
+        cv2.rectangle(image, (x1, y1), (x2, y2), BOX_COLOR, 2)
+        cv2.putText(image, f"{label}: {confidence:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, TEXT_COLOR, 2)
+    return image
+
+
+def annotate(image, predictions, info_text=None, copy=False):
+    """Decodes image (path, bytes or array) once and draws the predictions and summary line onto it."""
+    image = load_image(image)
+    if copy:
+        image = image.copy()
+    draw_predictions(image, predictions)
+    if info_text:
+        cv2.putText(image, info_text, (10, image.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, TEXT_COLOR, 2)
+    return image
+
+
+def encode_jpeg(image, quality=config.ANNOTATION_JPEG_QUALITY):
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Unable to encode annotated image")
+    return encoded.tobytes()
+
+
+def render_annotated(image, predictions, output_path, info_text=None, quality=config.ANNOTATION_JPEG_QUALITY):
+    """Annotates an image and writes it to output_path as a JPEG. Returns the encoded bytes."""
+    data = encode_jpeg(annotate(image, predictions, info_text), quality)
+    with open(output_path, "wb") as f:
+        f.write(data)
+    return data
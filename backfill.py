@@ -0,0 +1,191 @@
+"""Re-runs inference over archived captures in parallel and upserts the counts into MosquitoData.
+
+Results are appended to a JSON Lines file as they arrive, so an interrupted run can be resumed:
+images that already have a successful result for the current model are skipped.
+
+    python backfill.py captured_images --workers 4
+    python backfill.py "archive/2025_0[1-3]_*.jpg" --output rescore.jsonl
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import re
+import sys
+import time
+from multiprocessing import Pool
+
+from db import get_database
+from image_catalog import filename_captured_at
+from mosquito_data import SCHEDULED_HOURS, parse_legacy_datetime
+from rollups import refresh_buckets
+from worker_ipc import WorkerClient, WorkerError
+
+# 2025_02_23_AM.jpg, an off-slot 2025_02_23_AM_071502.jpg, or a later burst shot 2025_02_23_AM_070000-2.jpg
+CAPTURE_FILENAME = re.compile(r"(\d{4})_(\d{2})_(\d{2})_(AM|PM)(?:_\d{6}(?:-\d+)?)?\.jpg$")
+BURST_SHOT = re.compile(r"((\d{4}_\d{2}_\d{2}_(AM|PM))_(\d{6}))-\d+\.jpg$")
+
+
+def find_images(patterns):
+    """Expands directories and glob patterns into a sorted list of capture images."""
+    images = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            images.update(path for path in glob.glob(os.path.join(pattern, "*.jpg"))
+                          if CAPTURE_FILENAME.match(os.path.basename(path)))
+        else:
+            images.update(path for path in glob.glob(pattern) if path.lower().endswith(".jpg"))
+    return sorted(images)
+
+
+def capture_datetime(image_path):
+    """Maps a capture filename (2025_02_23_AM.jpg, 2025_02_23_AM_071502-2.jpg...) to its MosquitoData datetime (2025-02-23 AM)."""
+    match = CAPTURE_FILENAME.match(os.path.basename(image_path))
+    if match is None:
+        return None
+    year, month, day, period = match.groups()
+    return f"{year}-{month}-{day} {period}"
+
+
+def capture_source(image_path):
+    """The filename a capture's row is logged under (its source): the first shot of its burst, as in worker.log_data."""
+    filename = os.path.basename(image_path)
+    match = BURST_SHOT.match(filename)
+    if match is None:
+        return filename
+    first = f"{match[1]}.jpg"
+    if not os.path.exists(os.path.join(os.path.dirname(image_path), first)) \
+            and match[4] == f"{SCHEDULED_HOURS[match[3]]:02d}0000":
+        return f"{match[2]}.jpg"  # A burst at the usual slot starts with the plain 2025_02_23_AM.jpg
+    return first
+
+
+def load_completed(output_path, model_id):
+    """Returns the images that already have a successful result for model_id (a detector fingerprint) in the output file."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial line from an interrupted run
+            if record.get("type") == "result" and record.get("model_id") == model_id and "error" not in record:
+                completed.add(record["image"])
+    return completed
+
+
+def init_worker():
+    # Keep worker chatter off stdout, which carries the JSON Lines stream
+    sys.stdout = sys.stderr
+    # Each process builds its own detector (and HTTP session / ONNX net) once
+    from detector import get_detector
+    get_detector()
+
+
+def score_image(image_path):
+    from detector import get_detector
+    start = time.perf_counter()
+    record = {"type": "result", "image": image_path, "model_id": get_detector().fingerprint,
+              "datetime": capture_datetime(image_path), "source": capture_source(image_path)}
+    try:
+        result = get_detector().detect(image_path)
+        record["faa_count"] = len(result.get("predictions", []))
+    except Exception as e:
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def upsert_count(cursor, source, datetime_str, faa_count):
+    """Updates the count of the capture's row, found by its source, or inserts one when the capture was never logged.
+
+    As in worker.log_data, a row keeps the highest count of its burst's shots: a count no higher than
+    the stored one is skipped, whichever run or shot stored it.
+    """
+    row = cursor.execute("SELECT id, captured_at, faa_count FROM MosquitoData WHERE source = ?;", (source,)).fetchone()
+    if row is None:
+        # Rows logged before the source column have none; the half-day's row is only theirs when it is the only one
+        legacy = cursor.execute("SELECT id, captured_at, faa_count FROM MosquitoData WHERE source IS NULL AND datetime = ? LIMIT 2;",
+                                (datetime_str,)).fetchall()
+        row = legacy[0] if len(legacy) == 1 else None
+    if row is not None:
+        if row[2] is not None and faa_count <= row[2]:
+            return
+        cursor.execute("UPDATE MosquitoData SET faa_count = ?, source = ? WHERE id = ?;", (faa_count, source, row[0]))
+        refresh_buckets(cursor, [row[1]])
+    else:
+        fallback, capture_type = parse_legacy_datetime(datetime_str)
+        cursor.execute("INSERT INTO MosquitoData (datetime, faa_count, temperature, captured_at, capture_type, source) "
+                       "VALUES (?, ?, NULL, ?, ?, ?);",
+                       (datetime_str, faa_count, filename_captured_at(source, fallback), capture_type, source))
+
+
+def reload_forecast():
+    """Asks a running capture worker to rebuild its forecast, which only reads past counts when it loads."""
+    try:
+        WorkerClient().reload_forecast()
+        print("📈 Capture worker reloaded its forecast", file=sys.stderr)
+    except WorkerError as e:
+        print(f"⚠️ Forecast not reloaded ({e}); it picks up the new counts when the worker restarts", file=sys.stderr)
+
+
+def emit(record, output):
+    line = json.dumps(record)
+    output.write(line + "\n")
+    output.flush()
+    print(line, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run inference over archived captures in parallel.")
+    parser.add_argument("paths", nargs="+", help="Directories, files or glob patterns of captures")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default="backfill_results.jsonl", help="JSON Lines file results are appended to")
+    parser.add_argument("--force", action="store_true", help="Re-score images that already have results")
+    parser.add_argument("--no-db", action="store_true", help="Do not upsert counts into MosquitoData")
+    parser.add_argument("--progress-every", type=int, default=10, help="Progress record interval in images")
+    args = parser.parse_args()
+
+    images = find_images(args.paths)
+    # The model version or file contents and how it is run, so a retrained model re-scores everything
+    with contextlib.redirect_stdout(sys.stderr):
+        from detector import get_detector
+        model_id = get_detector().fingerprint
+    completed = set() if args.force else load_completed(args.output, model_id)
+    todo = [image for image in images if image not in completed]
+    print(f"🗂️ {len(images)} image(s) found, {len(images) - len(todo)} already scored, {len(todo)} to run",
+          file=sys.stderr)
+    if not todo:
+        return
+
+    database = None if args.no_db else get_database()
+    done = failed = 0
+    start = time.perf_counter()
+    with open(args.output, "a") as output, Pool(args.workers, initializer=init_worker) as pool:
+        for record in pool.imap_unordered(score_image, todo):
+            done += 1
+            if "error" in record:
+                failed += 1
+            elif database is not None and record["datetime"] is not None:
+                # Wait for the commit before the result is written so a resumed run never skips an unsaved count
+                database.write(upsert_count, record["source"], record["datetime"], record["faa_count"]).result()
+            emit(record, output)
+
+            if done % args.progress_every == 0 or done == len(todo):
+                elapsed = time.perf_counter() - start
+                emit({"type": "progress", "done": done, "total": len(todo), "failed": failed,
+                      "images_per_second": round(done / elapsed, 2)}, output)
+
+    if database is not None and done > failed:
+        reload_forecast()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Scored {done - failed}/{len(todo)} image(s) in {elapsed:.1f} s ({done / elapsed:.2f} images/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Micro-benchmark of insert and read throughput: connection-per-call vs the pooled WAL data layer."""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db import Database
+
+INSERT = "INSERT INTO MosquitoData (datetime, faa_count, temperature) VALUES (?, ?, ?);"
+SELECT = "SELECT datetime, faa_count, temperature FROM MosquitoData ORDER BY id DESC LIMIT 50;"
+
+
+def run(label, fn, count, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(fn, range(count)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {count / elapsed:10.0f} ops/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--inserts", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        Database(legacy_path)  # Same schema, but used through a fresh connection per call below
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode = DELETE;")
+        conn.close()
+        lock = threading.Lock()
+
+        def legacy_insert(i):
+            # Mirrors the old log_data: connect, insert, commit, close (serialised to avoid "database is locked")
+            with lock:
+                conn = sqlite3.connect(legacy_path, timeout=30)
+                conn.execute(INSERT, ("2025-01-01 AM", i % 60, 27.5))
+                conn.commit()
+                conn.close()
+
+        def legacy_read(i):
+            conn = sqlite3.connect(legacy_path, timeout=30)
+            conn.execute(SELECT).fetchall()
+            conn.close()
+
+        database = Database(os.path.join(tmp, "wal.db"))
+
+        def pooled_insert(i):
+            database.execute(INSERT, ("2025-01-01 AM", i % 60, 27.5))
+
+        def pooled_read(i):
+            with database.read() as conn:
+                conn.execute(SELECT).fetchall()
+
+        print(f"🧪 {args.inserts} inserts / {args.reads} reads across {args.threads} threads")
+        run("insert, connection per call", legacy_insert, args.inserts, args.threads)
+        run("insert, WAL + batching writer", pooled_insert, args.inserts, args.threads)
+        run("read, connection per call", legacy_read, args.reads, args.threads)
+        run("read, WAL + pooled readers", pooled_read, args.reads, args.threads)
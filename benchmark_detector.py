@@ -0,0 +1,54 @@
+"""Compares per-image latency of the local ONNX detector against the hosted API path."""
+import argparse
+import os
+import time
+import numpy as np
+
+import config
+from detector import HostedDetector, LocalDetector
+from image_utils import load_image
+from mock_inference_server import start_mock_server
+
+
+def benchmark(detector, image, runs, warmup=1):
+    for _ in range(warmup):
+        detector.detect(image)
+    latencies = []
+    count = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = detector.detect(image)
+        latencies.append(time.perf_counter() - start)
+        count = len(result.get("predictions", []))
+    latencies = np.array(latencies) * 1000
+    print(f"{detector.name:>8}: mean {latencies.mean():8.1f} ms | p50 {np.percentile(latencies, 50):8.1f} ms | "
+          f"p95 {np.percentile(latencies, 95):8.1f} ms | {count} boxes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("image", help="JPEG to run detection on (e.g. a 1920x1080 capture)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--model", default=config.LOCAL_MODEL_PATH, help="Path to the ONNX model")
+    parser.add_argument("--api-url", default=None, help="Hosted endpoint to hit (default: local mock server)")
+    parser.add_argument("--mock-latency", type=float, default=0.3, help="Server-side latency of the mock endpoint")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+    print(f"📷 {args.image}: {load_image(image_bytes).shape[1::-1]} px, {len(image_bytes) / 1024:.0f} KiB")
+
+    server = None
+    api_url = args.api_url
+    if api_url is None:
+        server, api_url = start_mock_server(latency=args.mock_latency)
+        print(f"🧪 Hosted path served by mock at {api_url} ({args.mock_latency * 1000:.0f} ms server latency)")
+
+    benchmark(HostedDetector(api_url=api_url), image_bytes, args.runs)
+    if os.path.exists(args.model):
+        benchmark(LocalDetector(model_path=args.model), image_bytes, args.runs)
+    else:
+        print(f"⚠️ Skipping local detector: model not found at {args.model}")
+
+    if server is not None:
+        server.shutdown()
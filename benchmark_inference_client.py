@@ -0,0 +1,67 @@
+"""Load-tests the shared inference client against the local mock endpoint."""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from inference_client import InferenceClient, InferenceError
+from mock_inference_server import start_mock_server
+
+
+def run(args, image_bytes, max_side):
+    """Sends args.requests uploads of image_bytes through a fresh client and mock server. Returns a summary."""
+    server, url = start_mock_server(latency=args.latency, failure_rate=args.failure_rate, bandwidth=args.bandwidth * 1e6)
+    client = InferenceClient(api_url=url, max_concurrency=args.concurrency, max_retries=args.retries,
+                             backoff=args.backoff, upload_max_side=max_side, upload_quality=args.quality)
+
+    def infer(_):
+        try:
+            return client.infer(image_bytes)
+        except InferenceError:
+            return None
+
+    start = time.perf_counter()
+    with client.session:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(infer, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    return {
+        "succeeded": sum(result is not None for result in results),
+        "elapsed": elapsed,
+        "http_requests": server.requests_served,
+        "bytes_per_request": server.bytes_received / max(server.requests_served, 1),
+        "stats": client.stats.summary(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("image", help="JPEG to upload on every request")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=config.INFERENCE_MAX_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock server latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of mock responses that are 503")
+    parser.add_argument("--retries", type=int, default=config.INFERENCE_MAX_RETRIES)
+    parser.add_argument("--backoff", type=float, default=0.1)
+    parser.add_argument("--bandwidth", type=float, default=0, help="Simulated uplink in Mbit/s (0 for unlimited)")
+    parser.add_argument("--max-side", type=int, default=config.UPLOAD_MAX_SIDE, help="Upload size limit (0 uploads as is)")
+    parser.add_argument("--quality", type=int, default=config.UPLOAD_JPEG_QUALITY, help="Upload JPEG quality")
+    parser.add_argument("--compare", action="store_true", help="Also run with the image uploaded as is, for a before/after table")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+
+    print(f"🧪 {args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.latency * 1000:.0f} ms latency, {args.failure_rate:.0%} failures, "
+          f"{f'{args.bandwidth:g} Mbit/s' if args.bandwidth else 'unlimited'} uplink")
+    runs = [("as is", 0)] if args.compare else []
+    runs.append((f"{args.max_side}px q{args.quality}" if args.max_side else "as is", args.max_side))
+
+    print(f"{'upload':<14}{'ok':>6}{'KB/req':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for label, max_side in runs:
+        r = run(args, image_bytes, max_side)
+        s = r["stats"]
+        print(f"{label:<14}{r['succeeded']:>6}{r['bytes_per_request'] / 1024:>9.1f}{args.requests / r['elapsed']:>8.1f}"
+              f"{s.get('p50_ms', 0):>9}{s.get('p95_ms', 0):>9}")
@@ -0,0 +1,147 @@
+"""End-to-end benchmark of the capture -> inference -> log pipeline on simulated hardware.
+
+Runs the capture worker's own scheduled_capture and inference job against the simulated camera, clock and flash,
+the mock inference server and a throwaway database, then reports per-stage latency and the
+pipeline's throughput. Runs on any Linux box; nothing touches the real camera, RTC or GPIO.
+"""
+import argparse
+import contextlib
+import functools
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cycles", type=int, default=1000, help="Number of simulated scheduled captures")
+    parser.add_argument("--fixtures", default="captured_images", help="Folder of .jpg frames the camera replays")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock inference server latency in seconds")
+    parser.add_argument("--burst", type=int, default=1, help="Shots per scheduled capture window")
+    parser.add_argument("--camera-latency", type=float, default=0.0,
+                        help="Simulated seconds per shot (e.g. ~1.5 for libcamera-still start-up, ~0.1 for a warm session)")
+    parser.add_argument("--workers", type=int, default=1, help="Inference job workers")
+    parser.add_argument("--detector", default="hosted", help="DETECTOR_BACKEND (hosted runs against the mock server)")
+    parser.add_argument("--in-memory", action="store_true", help="Capture to memory and save in the background (IN_MEMORY_PIPELINE=1)")
+    parser.add_argument("--lazy-annotation", action="store_true", help="Skip writing annotated images (LAZY_ANNOTATION=1)")
+    parser.add_argument("--prediction-cache", action="store_true", help="Enable the prediction cache (repeated fixtures hit it)")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's per-capture log output")
+    args = parser.parse_args()
+
+    # The app reads its configuration at import time, so everything is set up before importing it
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    fixtures = os.path.abspath(args.fixtures)
+    workdir = tempfile.mkdtemp(prefix="pipeline-bench-")
+    os.environ.update({
+        "HARDWARE_BACKEND": "simulated",
+        "SIM_FIXTURES_DIR": fixtures,
+        "SIM_CAMERA_LATENCY": str(args.camera_latency),
+        "SENSOR_POLL_INTERVAL": "0",  # No sampling thread: every read sees the fake clock's current time
+        "DATABASE_PATH": os.path.join(workdir, "bench.db"),
+        "ROBOFLOW_API_URL": f"http://127.0.0.1:{port}",
+        "DETECTOR_BACKEND": args.detector,
+        "PREDICTION_CACHE_ENABLED": "1" if args.prediction_cache else "0",
+        "PREDICTION_CACHE_PATH": os.path.join(workdir, "prediction_cache.db"),
+        "LAZY_ANNOTATION": "1" if args.lazy_annotation else "0",
+        "IN_MEMORY_PIPELINE": "1" if args.in_memory else "0",
+        "INFERENCE_DELAY_SECONDS": "0",
+        "JOB_WORKERS": str(args.workers),
+        "JOB_MAX_PENDING": str(args.cycles * args.burst + 1),
+        "JOB_POLL_INTERVAL": "0.01",
+        "WORKER_LOCK_FILE": os.path.join(workdir, "worker.lock"),  # Runs alongside a real worker
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)  # captured_images/, inference_output/ etc. are created here
+
+    from inference_client import LatencyStats
+    from mock_inference_server import start_mock_server
+
+    server, _ = start_mock_server(port=port, latency=args.latency)
+    report = sys.stdout
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+
+    stages = {}
+    capture_started = {}
+
+    def timed(stage, fn):
+        stats = stages.setdefault(stage, LatencyStats(window=args.cycles))
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = fn(*a, **kw)
+                ok = True
+                return result
+            finally:
+                stats.record(time.perf_counter() - start, ok, 0)
+        return wrapper
+
+    end_to_end = LatencyStats(window=args.cycles)
+    completed = threading.Semaphore(0)
+
+    with quiet:
+        import worker
+
+        worker.camera.capture = timed("camera", worker.camera.capture)
+        worker.camera.capture_bytes = timed("camera", worker.camera.capture_bytes)
+        detector = worker.get_detector()
+        detector.detect = timed("detect", detector.detect)
+        worker.render_annotated = timed("annotate", worker.render_annotated)
+        worker.annotate = timed("annotate", worker.annotate)  # The in-memory pipeline's decode + draw (encoding not included)
+        worker.log_data = timed("log", worker.log_data)
+        run_inference = timed("inference job", worker.job_queue.handlers["inference"])
+
+        def inference_job(image_path, filename, slot=None, temperature=None):
+            try:
+                run_inference(image_path, filename, slot, temperature)
+                end_to_end.record(time.perf_counter() - capture_started[filename], True, 0)
+            finally:
+                completed.release()
+
+        worker.job_queue.handlers["inference"] = inference_job
+        queue_inference = worker.run_inference_later
+
+        def run_inference_later(image_path, filename, slot=None, temperature=None):
+            capture_started[filename] = capture_time
+            queue_inference(image_path, filename, slot, temperature)
+
+        worker.run_inference_later = run_inference_later
+        worker.job_queue.start()
+
+        print(f"🧪 {args.cycles} capture cycles of {args.burst} shot(s), {args.detector} detector, "
+              f"{args.latency * 1000:.0f} ms mock latency, {args.workers} worker(s)", file=report)
+        from scheduler import Schedule
+        schedule = Schedule(f"0 7,20 * * * x{args.burst}")
+        capture = timed("capture (incl. enqueue)", worker.scheduled_capture)
+        slot = worker.rtc.now() - worker.rtc.now() % 86400 + 7 * 3600
+        start = time.perf_counter()
+        for i in range(args.cycles):
+            worker.rtc.set(slot + (i // 2) * 86400 + (i % 2) * 13 * 3600)  # 07:00 and 20:00 every day
+            capture_time = time.perf_counter()
+            capture(schedule)
+        for _ in range(args.cycles * args.burst):
+            completed.acquire()
+        worker.image_writer.flush()  # Every image is on disk before the clock stops
+        elapsed = time.perf_counter() - start
+        worker.job_queue.stop()
+
+    print(f"✅ {args.cycles} cycles in {elapsed:.2f} s ({args.cycles / elapsed:.1f} cycles/s), "
+          f"{server.requests_served} inference requests served", file=report)
+    toggles = worker.flash.toggles
+    flash_on = [off[0] - on[0] for on, off in zip(toggles[::2], toggles[1::2])]
+    if flash_on:
+        print(f"💡 Flash on {sum(flash_on) / len(flash_on) * 1000:.0f} ms per window on average, "
+              f"{max(flash_on) * 1000:.0f} ms max", file=report)
+    print(f"{'stage':<26}{'calls':>7}{'fail':>6}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}", file=report)
+    for stage, stats in [*stages.items(), ("end to end", end_to_end)]:
+        s = stats.summary()
+        print(f"{stage:<26}{s['calls']:>7}{s['failures']:>6}{s.get('mean_ms', 0):>10}{s.get('p50_ms', 0):>9}"
+              f"{s.get('p95_ms', 0):>9}{s.get('max_ms', 0):>9}", file=report)
+    print(f"📁 Artifacts left in {workdir}", file=report)
+    server.shutdown()
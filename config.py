@@ -0,0 +1,137 @@
+import os
+
+# Database file path
+DATABASE_PATH = os.getenv("DATABASE_PATH", "FAA_DB.db")
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "64"))  # Writes committed together by the writer thread
+DB_WRITE_BATCH_WINDOW = float(os.getenv("DB_WRITE_BATCH_WINDOW", "0.005"))  # Seconds to wait for more writes
+
+# Image folders, relative to the app directory
+IMAGE_FOLDER = "captured_images"
+INFERENCE_OUTPUT_FOLDER = "inference_output"
+TEST_INFERENCE_FOLDER = "system_test"
+
+# Configuration for Roboflow API
+API_URL = os.getenv("ROBOFLOW_API_URL", "https://detect.roboflow.com")
+API_KEY = os.getenv("ROBOFLOW_API_KEY", "122aOY67jDoRdfvlcYg6")
+MODEL_ID = os.getenv("ROBOFLOW_MODEL_ID", "mosquito_faa/1")
+
+# Hosted inference client: keep-alive pool size / parallel requests, (connect, read) timeouts and retries
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "4"))
+INFERENCE_TIMEOUT = (float(os.getenv("INFERENCE_CONNECT_TIMEOUT", "5")), float(os.getenv("INFERENCE_READ_TIMEOUT", "30")))
+INFERENCE_MAX_RETRIES = int(os.getenv("INFERENCE_MAX_RETRIES", "3"))
+INFERENCE_BACKOFF = float(os.getenv("INFERENCE_BACKOFF", "1.0"))
+# Images are shrunk to UPLOAD_MAX_SIDE pixels on the longer side (the hosted model's input size) and
+# re-encoded at UPLOAD_JPEG_QUALITY before upload; boxes come back in original-frame pixels. 0 uploads as is.
+UPLOAD_MAX_SIDE = int(os.getenv("UPLOAD_MAX_SIDE", "640"))
+UPLOAD_JPEG_QUALITY = int(os.getenv("UPLOAD_JPEG_QUALITY", "90"))
+
+# Hardware backend: "pi" (libcamera-still, DS3231 over I2C, GPIO flash) or "simulated" (replays the
+# .jpg fixtures in SIM_FIXTURES_DIR, fake clock, recorded flash toggles) for running off-device
+HARDWARE_BACKEND = os.getenv("HARDWARE_BACKEND", "pi")
+SIM_FIXTURES_DIR = os.getenv("SIM_FIXTURES_DIR", "sim_fixtures")
+SIM_CAMERA_LATENCY = float(os.getenv("SIM_CAMERA_LATENCY", "0"))  # Seconds per simulated shot
+CAPTURE_WIDTH = int(os.getenv("CAPTURE_WIDTH", "1920"))
+CAPTURE_HEIGHT = int(os.getenv("CAPTURE_HEIGHT", "1080"))
+# Pi camera: "picamera2" keeps one camera session running, "libcamera" runs libcamera-still per shot,
+# "auto" uses picamera2 when it is installed
+CAMERA_BACKEND = os.getenv("CAMERA_BACKEND", "auto")
+CAMERA_SETTLE_SECONDS = float(os.getenv("CAMERA_SETTLE_SECONDS", "1"))
+FLASH_GPIO_PIN = int(os.getenv("FLASH_GPIO_PIN", "23"))
+
+# How often the sensor service reads the DS3231 clock and temperature over I2C
+SENSOR_POLL_INTERVAL = float(os.getenv("SENSOR_POLL_INTERVAL", "1"))
+
+# Capture schedules: cron fields "minute hour day month weekday", optionally "xN" for a burst of N shots,
+# separated by ";". A missed window is captured late after a reboot if it is at most
+# SCHEDULER_CATCHUP_WINDOW seconds old.
+CAPTURE_SCHEDULE = os.getenv("CAPTURE_SCHEDULE", "0 7 * * *; 0 20 * * *")
+CAPTURE_BURST_INTERVAL = float(os.getenv("CAPTURE_BURST_INTERVAL", "0.5"))
+SCHEDULER_CATCHUP_WINDOW = float(os.getenv("SCHEDULER_CATCHUP_WINDOW", str(3 * 3600)))
+SCHEDULER_MAX_SLEEP = float(os.getenv("SCHEDULER_MAX_SLEEP", "300"))
+SCHEDULER_RETRY_SECONDS = float(os.getenv("SCHEDULER_RETRY_SECONDS", "5"))  # After a failed RTC read
+
+# Detector backend: "hosted" (Roboflow API) or "local" (ONNX model on the Pi's CPU)
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "hosted")
+
+# Local ONNX export of the mosquito_faa YOLO model
+LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH", "models/mosquito_faa.onnx")
+LOCAL_INPUT_SIZE = int(os.getenv("LOCAL_INPUT_SIZE", "640"))
+LOCAL_CLASS_NAMES = os.getenv("LOCAL_CLASS_NAMES", "FAA").split(",")
+CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.4"))
+IOU_THRESHOLD = float(os.getenv("IOU_THRESHOLD", "0.5"))
+
+# Cache of raw detector output keyed by image SHA-256 + model, LRU-evicted beyond the byte budget
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "1") == "1"
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH", "prediction_cache.db")
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Sliced inference: split full-resolution captures into overlapping tiles before detection.
+# Smaller tiles find smaller insects but cost more model passes per capture.
+TILING_ENABLED = os.getenv("TILING_ENABLED", "0") == "1"
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = int(os.getenv("TILE_OVERLAP", "64"))
+TILE_BATCH_SIZE = int(os.getenv("TILE_BATCH_SIZE", "4"))
+
+# Prefilter for scheduled captures: crop to the trap region TRAP_ROI ("x,y,width,height" in capture pixels,
+# empty for the whole frame) and compare it with the previous capture. An unchanged board reuses the previous
+# predictions; otherwise only the changed regions go to the detector, unless more than
+# PREFILTER_MAX_CHANGED_FRACTION of the board changed. Every PREFILTER_FULL_EVERY captures the whole board is
+# detected again so differences cannot drift.
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "0") == "1"
+TRAP_ROI = os.getenv("TRAP_ROI", "")
+PREFILTER_SCALE = int(os.getenv("PREFILTER_SCALE", "4"))  # Frames are compared at 1/PREFILTER_SCALE resolution
+PREFILTER_DIFF_THRESHOLD = int(os.getenv("PREFILTER_DIFF_THRESHOLD", "25"))  # Grey-level change that counts as changed
+PREFILTER_MIN_AREA = int(os.getenv("PREFILTER_MIN_AREA", "4"))  # Smallest changed blob, in downscaled pixels
+PREFILTER_PADDING = int(os.getenv("PREFILTER_PADDING", "48"))  # Context added around each changed region
+PREFILTER_MIN_REGION = int(os.getenv("PREFILTER_MIN_REGION", "160"))
+PREFILTER_MAX_CHANGED_FRACTION = float(os.getenv("PREFILTER_MAX_CHANGED_FRACTION", "0.4"))
+PREFILTER_FULL_EVERY = int(os.getenv("PREFILTER_FULL_EVERY", "14"))
+
+# Durable inference job queue
+INFERENCE_DELAY_SECONDS = float(os.getenv("INFERENCE_DELAY_SECONDS", "30"))  # Wait after capture before inference
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))  # Jobs beyond this backlog wait as "deferred"
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))  # A running job is re-issued after this long
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "30"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+
+# In-memory pipeline: captures are taken as JPEG buffers and handed straight to the inference job
+# (with no INFERENCE_DELAY_SECONDS wait), while a background writer saves every image once.
+IN_MEMORY_PIPELINE = os.getenv("IN_MEMORY_PIPELINE", "0") == "1"
+IMAGE_WRITER_MAX_PENDING = int(os.getenv("IMAGE_WRITER_MAX_PENDING", "16"))  # Capture waits beyond this many unsaved images
+
+# Annotated output images. In lazy mode run_inference writes nothing and /inference_output/<filename>
+# renders (and keeps) the annotated image the first time it is requested.
+ANNOTATION_JPEG_QUALITY = int(os.getenv("ANNOTATION_JPEG_QUALITY", "85"))
+LAZY_ANNOTATION = os.getenv("LAZY_ANNOTATION", "0") == "1"
+
+# Server-Sent Events (/events): sensor snapshot interval, per-page backlog before a stalled page is
+# disconnected, keep-alive comment interval and the browser's reconnect delay
+SSE_TICK_SECONDS = float(os.getenv("SSE_TICK_SECONDS", "1"))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+SSE_HISTORY = int(os.getenv("SSE_HISTORY", "100"))  # Recent events kept for web processes to relay
+
+# Serving mode: "standalone" (python main.py runs the web pages, camera, scheduler and inference in one
+# process) or "web" (wsgi.py: the web tier only, talking to the capture worker, worker.py, over WORKER_SOCKET).
+# Only the process holding WORKER_LOCK_FILE runs the camera and scheduler.
+APP_MODE = os.getenv("APP_MODE", "standalone")
+WORKER_SOCKET = os.getenv("WORKER_SOCKET", "faa_worker.sock")
+WORKER_AUTHKEY = os.getenv("WORKER_AUTHKEY", "faa-forecaster-worker")
+WORKER_LOCK_FILE = os.getenv("WORKER_LOCK_FILE", "faa_worker.lock")
+
+# Boxes of consecutive captures of a board within this many pixels (centre to centre) are the same insect
+TRACK_MATCH_RADIUS = float(os.getenv("TRACK_MATCH_RADIUS", "20"))
+
+# Count forecast: rolling regression over the last FORECAST_WINDOW scheduled captures (two per day),
+# projected FORECAST_HORIZON captures ahead
+FORECAST_WINDOW = int(os.getenv("FORECAST_WINDOW", "30"))
+FORECAST_HORIZON = int(os.getenv("FORECAST_HORIZON", "14"))
+
+# Downscaled image tiers served by ?size=thumb|preview, and how long browsers may cache image responses
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "thumbnails")
+THUMBNAIL_JPEG_QUALITY = int(os.getenv("THUMBNAIL_JPEG_QUALITY", "80"))
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", str(365 * 86400)))
@@ -0,0 +1,196 @@
+"""Data-access layer for FAA_DB.db.
+
+The database runs in WAL mode so readers never block the writer. Reads borrow a connection from
+a small pool; every write is handed to one dedicated writer thread, which batches whatever is
+queued into a single transaction (each write inside its own savepoint, so one failing write
+does not undo the others). Schema changes are applied as numbered migrations tracked in
+PRAGMA user_version.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import config
+from detections_store import create_tables as create_detection_tables
+from image_catalog import create_tables as create_image_catalog_tables
+from job_queue import CREATE_JOBS_TABLE, CREATE_JOBS_INDEX
+from mosquito_data import add_capture_source, add_captured_at
+from rollups import create_rollups
+from scheduler import create_tables as create_scheduler_tables
+from tracking import create_board_tracks
+
+
+def create_mosquito_data(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS MosquitoData (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            datetime TEXT NOT NULL,
+            faa_count INTEGER,
+            temperature REAL
+        );
+    ''')
+
+
+def create_inference_jobs(conn):
+    conn.execute(CREATE_JOBS_TABLE)
+    conn.execute(CREATE_JOBS_INDEX)
+
+
+def create_detections(conn):
+    create_detection_tables(conn)
+
+
+def create_image_catalog(conn):
+    create_image_catalog_tables(conn)  # Filled by the reconcile scan the app runs at startup
+
+
+def create_scheduler_state(conn):
+    create_scheduler_tables(conn)
+
+
+def index_mosquito_data_datetime(conn):
+    # Serves lookups of a capture row by its datetime text (backfill upserts, lazy annotation)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mosquito_data_datetime ON MosquitoData (datetime);")
+
+
+# Applied in order; the index + 1 of the last applied migration is stored in PRAGMA user_version.
+# Only ever append to this list. Every migration must also cope with databases created before
+# migrations existed, which already have some of these tables.
+MIGRATIONS = [
+    create_mosquito_data,
+    create_inference_jobs,
+    create_detections,
+    index_mosquito_data_datetime,
+    add_captured_at,
+    create_rollups,
+    create_image_catalog,
+    create_scheduler_state,
+    create_board_tracks,
+    add_capture_source,
+]
+
+
+class Database:
+    def __init__(self, path=config.DATABASE_PATH, read_pool_size=config.DB_READ_POOL_SIZE,
+                 batch_size=config.DB_WRITE_BATCH_SIZE, batch_window=config.DB_WRITE_BATCH_WINDOW):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.readers = queue.LifoQueue()
+        self.read_slots = threading.BoundedSemaphore(read_pool_size)
+        self.writes = queue.Queue()
+        self.migrate()
+        self.writer = threading.Thread(target=self.write_loop, name="db-writer", daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")  # Durable across app crashes; WAL makes it safe
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    def migrate(self):
+        """Brings the schema up to date. Returns the number of migrations applied."""
+        conn = self.connect()
+        applied = 0
+        try:
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                # Read under the write lock: another process (a web worker, the capture worker) may be migrating too
+                version = conn.execute("PRAGMA user_version;").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    conn.execute("COMMIT")
+                    return applied
+                migration = MIGRATIONS[version]
+                try:
+                    migration(conn)
+                    conn.execute(f"PRAGMA user_version = {version + 1};")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                applied += 1
+                print(f"🗄️ Applied database migration {version + 1}: {migration.__name__}")
+        finally:
+            conn.close()
+
+    @contextmanager
+    def read(self):
+        """Borrows a pooled read connection for the duration of the with block."""
+        with self.read_slots:
+            try:
+                conn = self.readers.get_nowait()
+            except queue.Empty:
+                conn = self.connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self.readers.put(conn)
+
+    def write(self, fn, *args):
+        """Queues fn(cursor, *args) for the writer thread. Returns a Future with fn's return value."""
+        future = Future()
+        self.writes.put((fn, args, future))
+        return future
+
+    def execute(self, sql, params=()):
+        """Runs one write statement and waits for it to commit. Returns the cursor's lastrowid."""
+        return self.write(lambda cursor: cursor.execute(sql, params).lastrowid).result()
+
+    def next_batch(self):
+        batch = [self.writes.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.writes.get(timeout=remaining) if remaining > 0 else self.writes.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def write_loop(self):
+        conn = self.connect()
+        while True:
+            batch = self.next_batch()
+            cursor = conn.cursor()
+            outcomes = []
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                for fn, args, future in batch:
+                    cursor.execute("SAVEPOINT write")
+                    try:
+                        outcomes.append((future, fn(cursor, *args), None))
+                        cursor.execute("RELEASE write")
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO write")
+                        cursor.execute("RELEASE write")
+                        outcomes.append((future, None, e))
+                cursor.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                outcomes = [(future, None, e) for _, _, future in batch]
+            for future, result, error in outcomes:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_database():
+    """Returns the process-wide database, migrating it and starting the writer on first use."""
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = Database()
+        return _database
@@ -0,0 +1,109 @@
+"""Per-detection storage: one row per box, linked to its MosquitoData capture row.
+
+Box geometry is mirrored into an SQLite R-tree so region queries ("left half of the board")
+do not scan every detection.
+"""
+import sqlite3
+
+CREATE_DETECTIONS_TABLE = '''
+CREATE TABLE IF NOT EXISTS Detections (
+    id INTEGER PRIMARY KEY,
+    capture_id INTEGER NOT NULL REFERENCES MosquitoData (id) ON DELETE CASCADE,
+    captured_at INTEGER NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    width REAL NOT NULL,
+    height REAL NOT NULL,
+    confidence REAL NOT NULL,
+    class TEXT
+);
+'''
+CREATE_DETECTIONS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_detections_capture_id ON Detections (capture_id);",
+    "CREATE INDEX IF NOT EXISTS idx_detections_captured_at ON Detections (captured_at);",
+    "CREATE INDEX IF NOT EXISTS idx_detections_confidence ON Detections (confidence);",
+]
+CREATE_DETECTIONS_RTREE = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS DetectionsGeometry USING rtree (
+    id,
+    min_x, max_x,
+    min_y, max_y
+);
+'''
+
+
+def create_tables(conn):
+    conn.execute(CREATE_DETECTIONS_TABLE)
+    for statement in CREATE_DETECTIONS_INDEXES:
+        conn.execute(statement)
+    conn.execute(CREATE_DETECTIONS_RTREE)
+
+
+def insert_detections(cursor, capture_id, captured_at, predictions):
+    """Bulk-inserts every box of one capture. Runs inside the caller's transaction; the caller commits."""
+    if not predictions:
+        return 0
+    # Ids are assigned up front so the R-tree rows can be written with the same executemany pattern
+    first_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM Detections;").fetchone()[0]
+    rows, boxes = [], []
+    for i, p in enumerate(predictions):
+        x, y, width, height = float(p["x"]), float(p["y"]), float(p["width"]), float(p["height"])
+        rows.append((first_id + i, capture_id, captured_at, x, y, width, height, float(p["confidence"]), p.get("class")))
+        boxes.append((first_id + i, x - width / 2, x + width / 2, y - height / 2, y + height / 2))
+    cursor.executemany("INSERT INTO Detections (id, capture_id, captured_at, x, y, width, height, confidence, class) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);", rows)
+    cursor.executemany("INSERT INTO DetectionsGeometry (id, min_x, max_x, min_y, max_y) VALUES (?, ?, ?, ?, ?);", boxes)
+    return len(rows)
+
+
+def delete_capture(cursor, capture_id):
+    """Deletes the boxes of one capture, e.g. before storing the boxes of a better shot of its burst."""
+    cursor.execute("DELETE FROM DetectionsGeometry WHERE id IN (SELECT id FROM Detections WHERE capture_id = ?);", (capture_id,))
+    cursor.execute("DELETE FROM Detections WHERE capture_id = ?;", (capture_id,))
+
+
+def delete_all(cursor):
+    cursor.execute("DELETE FROM Detections;")
+    cursor.execute("DELETE FROM DetectionsGeometry;")
+
+
+def count_detections(conn, min_confidence=None, region=None, since=None, until=None):
+    """Counts detections matching the filters.
+
+    region is (min_x, min_y, max_x, max_y) in frame pixels and matches boxes that lie inside it;
+    since/until are epoch seconds on the capture time.
+    """
+    query = "SELECT COUNT(*) FROM Detections d"
+    clauses, params = [], []
+    if region is not None:
+        query += " JOIN DetectionsGeometry g ON g.id = d.id"
+        clauses += ["g.min_x >= ?", "g.max_x <= ?", "g.min_y >= ?", "g.max_y <= ?"]
+        params += [region[0], region[2], region[1], region[3]]
+    if min_confidence is not None:
+        clauses.append("d.confidence >= ?")
+        params.append(min_confidence)
+    if since is not None:
+        clauses.append("d.captured_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("d.captured_at < ?")
+        params.append(until)
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    return conn.execute(query, params).fetchone()[0]
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import DATABASE_PATH
+
+    parser = argparse.ArgumentParser(description="Count stored detections.")
+    parser.add_argument("--min-confidence", type=float)
+    parser.add_argument("--region", type=float, nargs=4, metavar=("MIN_X", "MIN_Y", "MAX_X", "MAX_Y"))
+    parser.add_argument("--since", type=int, help="Epoch seconds")
+    parser.add_argument("--until", type=int, help="Epoch seconds")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    print(count_detections(conn, args.min_confidence, args.region, args.since, args.until))
+    conn.close()
@@ -0,0 +1,199 @@
+import hashlib
+import time
+import cv2
+import numpy as np
+
+import config
+from image_utils import load_image
+from inference_client import InferenceClient, get_client
+
+
+def non_max_suppression(boxes, scores, iou_threshold, classes=None):
+    """Greedy NMS over (N, 4) x1/y1/x2/y2 boxes. Returns the kept indices, best score first."""
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    boxes = np.asarray(boxes, dtype=np.float32)
+    if classes is not None:
+        # Offset each class into its own coordinate range so boxes of different classes never overlap
+        offsets = np.asarray(classes, dtype=np.float32)[:, None] * (boxes.max() + 1)
+        boxes = boxes + offsets
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    order = np.argsort(scores)[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def predictions_to_arrays(predictions):
+    """Converts a predictions list into x1/y1/x2/y2 boxes, scores and class names arrays."""
+    if not predictions:
+        return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=object)
+    centers = np.array([[p["x"], p["y"], p["width"], p["height"]] for p in predictions], dtype=np.float32)
+    boxes = np.concatenate([centers[:, :2] - centers[:, 2:] / 2, centers[:, :2] + centers[:, 2:] / 2], axis=1)
+    scores = np.array([p["confidence"] for p in predictions], dtype=np.float32)
+    names = np.array([p.get("class", "FAA") for p in predictions], dtype=object)
+    return boxes, scores, names
+
+
+def to_predictions(boxes, scores, class_ids, class_names):
+    """Converts x1/y1/x2/y2 boxes into the Roboflow-style predictions list."""
+    predictions = []
+    for (x1, y1, x2, y2), score, class_id in zip(boxes, scores, class_ids):
+        class_id = int(class_id)
+        predictions.append({
+            "x": float((x1 + x2) / 2),
+            "y": float((y1 + y2) / 2),
+            "width": float(x2 - x1),
+            "height": float(y2 - y1),
+            "confidence": float(score),
+            "class": class_names[class_id] if class_id < len(class_names) else str(class_id),
+            "class_id": class_id,
+        })
+    return predictions
+
+
+class HostedDetector:
+    """Runs detection through the Roboflow hosted API."""
+
+    name = "hosted"
+
+    def __init__(self, api_url=None, api_key=config.API_KEY, model_id=config.MODEL_ID):
+        if api_url is None:
+            self.client = get_client()
+        else:
+            self.client = InferenceClient(api_url=api_url, api_key=api_key, model_id=model_id)
+        # The model version is part of the hosted model id; the upload resize changes what the model sees
+        self.fingerprint = (f"hosted:{model_id}:upload{self.client.upload_max_side}"
+                            f"q{self.client.upload_quality if self.client.upload_max_side else ''}")
+
+    def detect(self, image):
+        return self.client.infer(image)
+
+    def detect_batch(self, images):
+        return self.client.infer_many(images)
+
+
+class LocalDetector:
+    """Runs the exported mosquito_faa YOLO model on the CPU with OpenCV DNN."""
+
+    name = "local"
+
+    def __init__(self, model_path=config.LOCAL_MODEL_PATH, input_size=config.LOCAL_INPUT_SIZE,
+                 class_names=config.LOCAL_CLASS_NAMES, confidence_threshold=config.CONFIDENCE_THRESHOLD,
+                 iou_threshold=config.IOU_THRESHOLD):
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.class_names = class_names
+        self.confidence_threshold = confidence_threshold
+        self.iou_threshold = iou_threshold
+        self.batch_supported = True
+        # A model retrained under the same path gets a new fingerprint from its contents
+        with open(model_path, "rb") as f:
+            model_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+        self.fingerprint = (f"local:{model_hash}:in{input_size}:conf{confidence_threshold}:iou{iou_threshold}:"
+                            f"{','.join(class_names)}")
+
+    def preprocess(self, image):
+        """Letterboxes the image into a square model input. Returns the canvas, scale and padding."""
+        height, width = image.shape[:2]
+        scale = min(self.input_size / width, self.input_size / height)
+        resized_w, resized_h = int(round(width * scale)), int(round(height * scale))
+        pad_x, pad_y = (self.input_size - resized_w) // 2, (self.input_size - resized_h) // 2
+        canvas = np.full((self.input_size, self.input_size, 3), 114, dtype=np.uint8)
+        canvas[pad_y:pad_y + resized_h, pad_x:pad_x + resized_w] = cv2.resize(
+            image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+        return canvas, scale, pad_x, pad_y
+
+    def postprocess(self, output, scale, pad_x, pad_y, width, height):
+        """Decodes raw YOLO output (v5 or v8 layout) for one image into frame-space predictions."""
+        num_classes = len(self.class_names)
+        if output.shape[0] == 4 + num_classes:
+            # YOLOv8 exports (4 + classes, anchors) with no objectness column
+            output = output.T
+            class_scores = output[:, 4:]
+        else:
+            class_scores = output[:, 5:] * output[:, 4:5]
+        class_ids = np.argmax(class_scores, axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        mask = scores >= self.confidence_threshold
+        if not np.any(mask):
+            return []
+        cx, cy, w, h = output[mask, 0], output[mask, 1], output[mask, 2], output[mask, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        boxes -= np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)
+        boxes /= scale
+        boxes = np.clip(boxes, 0, [width, height, width, height])
+        scores, class_ids = scores[mask], class_ids[mask]
+        keep = non_max_suppression(boxes, scores, self.iou_threshold, class_ids)
+        return to_predictions(boxes[keep], scores[keep], class_ids[keep], self.class_names)
+
+    def forward(self, canvases):
+        """Runs one forward pass over a list of letterboxed canvases."""
+        blob = cv2.dnn.blobFromImages(canvases, 1 / 255.0, swapRB=True)
+        self.net.setInput(blob)
+        return self.net.forward()
+
+    def detect_batch(self, images):
+        """Detects on several images in as few forward passes as the exported model allows."""
+        images = [load_image(image) for image in images]
+        prepared = [self.preprocess(image) for image in images]
+        canvases = [canvas for canvas, _, _, _ in prepared]
+        start = time.perf_counter()
+        if self.batch_supported and len(canvases) > 1:
+            try:
+                outputs = self.forward(canvases)
+            except cv2.error:
+                # Models exported with a static batch dimension only accept one image per pass
+                self.batch_supported = False
+        if not self.batch_supported or len(canvases) == 1:
+            outputs = np.concatenate([self.forward([canvas]) for canvas in canvases], axis=0)
+        elapsed = time.perf_counter() - start
+
+        results = []
+        for image, (_, scale, pad_x, pad_y), output in zip(images, prepared, outputs):
+            height, width = image.shape[:2]
+            results.append({
+                "time": elapsed / len(images),
+                "image": {"width": width, "height": height},
+                "predictions": self.postprocess(output, scale, pad_x, pad_y, width, height),
+            })
+        return results
+
+    def detect(self, image):
+        return self.detect_batch([image])[0]
+
+
+DETECTOR_BACKENDS = {
+    "hosted": HostedDetector,
+    "local": LocalDetector,
+}
+
+_detector = None
+
+
+def get_detector():
+    """Returns the detector selected by DETECTOR_BACKEND, creating it on first use."""
+    global _detector
+    if _detector is None:
+        if config.DETECTOR_BACKEND not in DETECTOR_BACKENDS:
+            raise ValueError(f"Unknown detector backend: {config.DETECTOR_BACKEND}")
+        _detector = DETECTOR_BACKENDS[config.DETECTOR_BACKEND]()
+        if config.TILING_ENABLED:
+            from tiling import TiledDetector
+            _detector = TiledDetector(_detector)
+        if config.PREDICTION_CACHE_ENABLED:
+            from prediction_cache import CachedDetector, get_cache
+            _detector = CachedDetector(_detector, get_cache())
+        print(f"🧠 Using {_detector.name} detector backend")
+    return _detector
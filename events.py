@@ -0,0 +1,111 @@
+"""Server-Sent Events broadcast to every open dashboard page (GET /events).
+
+Each subscriber gets a small queue; publish() formats an event once and drops it into every queue,
+so the cost of an event does not depend on what the pages do with it. One ticker thread
+publishes the shared sensor snapshot every SSE_TICK_SECONDS while anyone is subscribed, instead
+of every open page polling /data. A subscriber that stops reading and lets its queue fill up is
+disconnected rather than holding events in memory.
+
+Recent events are also kept in a short history, so that under the production server each web
+process can relay the capture worker's events to its own pages with one long-poll (see wait()).
+"""
+import json
+import queue
+import threading
+from collections import deque
+
+import config
+
+
+def image_event(folder, filename):
+    """Data of the "image" event for an image saved in folder, served at /<folder>/<filename>."""
+    return {"folder": folder, "filename": filename, "url": f"/{folder}/{filename}"}
+
+
+class Subscriber:
+    def __init__(self, size):
+        self.queue = queue.Queue(size)
+        self.dropped = False
+
+
+class EventBroker:
+    def __init__(self, queue_size=config.SSE_QUEUE_SIZE, keepalive=config.SSE_KEEPALIVE_SECONDS, history=config.SSE_HISTORY):
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.lock = threading.Lock()
+        self.published_event = threading.Condition(self.lock)
+        self.history = deque(maxlen=history)  # (id, event, data) of recent events that are not replayed
+        self.subscribers = set()
+        self.last = {}  # Latest message of each type, replayed to new subscribers (e.g. the sensor snapshot)
+        self.published = 0
+        self.stopping = threading.Event()
+        self.ticker = None
+
+    def publish(self, event, data, replay=False):
+        """Sends one event to every subscriber. With replay, pages that subscribe later get it first."""
+        message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        with self.lock:
+            if replay:
+                self.last[event] = message
+            self.published += 1
+            if not replay:
+                self.history.append((self.published, event, data))
+                self.published_event.notify_all()
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.queue.put_nowait(message)
+                except queue.Full:
+                    subscriber.dropped = True
+                    self.subscribers.discard(subscriber)
+
+    def stream(self):
+        """Generator of SSE text for one client. Ends when the client disconnects or falls too far behind."""
+        subscriber = Subscriber(self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            replayed = list(self.last.values())
+        try:
+            yield f"retry: {config.SSE_RETRY_MS}\n\n"
+            yield from replayed
+            while not subscriber.dropped:
+                try:
+                    yield subscriber.queue.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"  # Also how a closed connection is noticed
+        finally:
+            with self.lock:
+                self.subscribers.discard(subscriber)
+
+    def wait(self, after, timeout):
+        """Events published after the id `after`, waiting up to timeout seconds for one. Returns (last id, events).
+
+        With after=None it only returns the current id to start from. A caller that fell further
+        behind than the history misses the oldest events.
+        """
+        with self.lock:
+            if after is None or after > self.published:  # A larger id is from before a worker restart
+                return self.published, []
+            self.published_event.wait_for(lambda: self.history and self.history[-1][0] > after, timeout)
+            return self.published, [(event, data) for number, event, data in self.history if number > after]
+
+    def start_ticker(self, snapshot, interval=config.SSE_TICK_SECONDS, event="sensor"):
+        """Publishes snapshot() as event every interval seconds while there are subscribers."""
+        def run():
+            while not self.stopping.is_set():
+                if self.subscribers:
+                    try:
+                        self.publish(event, snapshot(), replay=True)
+                    except Exception as e:
+                        print(f"❌ Failed to publish {event} event: {e}")
+                self.stopping.wait(interval)
+
+        if self.ticker is None:
+            self.ticker = threading.Thread(target=run, name=f"sse-{event}-ticker", daemon=True)
+            self.ticker.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def stats(self):
+        with self.lock:
+            return {"subscribers": len(self.subscribers), "published": self.published}
@@ -0,0 +1,175 @@
+"""Rolling-window linear regression forecast of FAA counts from temperature and the previous count.
+
+Each scheduled capture is one sample: faa_count ~ b0 + b1 * temperature + b2 * previous faa_count.
+The fit only ever uses the last FORECAST_WINDOW samples (15 days of AM/PM captures by default).
+Instead of refitting, the forecaster keeps the window's sufficient statistics (X'X and X'y, plus
+the sums of the temperature trend line) and adds the new sample / subtracts the evicted one on
+every insert, so an update is O(1) no matter how long the log is. The latest forecast is kept
+ready to serve.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import config
+from mosquito_data import SCHEDULED_HOURS, wall_clock_epoch
+
+NUM_FEATURES = 3
+RIDGE = 1e-6  # Keeps the normal equations solvable while the window is still nearly degenerate
+DAY = 86400
+
+
+def features(temperature, previous_count):
+    return np.array([1.0, temperature, previous_count])
+
+
+def rolling_fit(X, y, window):
+    """Coefficients of every rolling window fit over the history at once, using cumulative sums.
+
+    Returns an (N, NUM_FEATURES) array whose row i is the fit over samples (i - window, i];
+    rows without a full window are NaN.
+    """
+    outer = np.einsum("ni,nj->nij", X, X)
+    xty = X * y[:, None]
+    cum_xtx = np.concatenate([np.zeros((1, NUM_FEATURES, NUM_FEATURES)), np.cumsum(outer, axis=0)])
+    cum_xty = np.concatenate([np.zeros((1, NUM_FEATURES)), np.cumsum(xty, axis=0)])
+    coefficients = np.full((len(X), NUM_FEATURES), np.nan)
+    if len(X) < window:
+        return coefficients
+    ends = np.arange(window, len(X) + 1)
+    xtx = cum_xtx[ends] - cum_xtx[ends - window] + RIDGE * np.eye(NUM_FEATURES)
+    coefficients[ends - 1] = np.linalg.solve(xtx, (cum_xty[ends] - cum_xty[ends - window])[..., None])[..., 0]
+    return coefficients
+
+
+def next_capture_times(after, count):
+    """Epoch seconds of the next count scheduled capture slots (07:00 and 20:00) after a given time."""
+    slots = []
+    day = datetime.fromtimestamp(after, timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    while len(slots) < count:
+        for hour in sorted(SCHEDULED_HOURS.values()):
+            slot = wall_clock_epoch((day + timedelta(hours=hour)).timetuple())
+            if slot > after and len(slots) < count:
+                slots.append(slot)
+        day += timedelta(days=1)
+    return slots
+
+
+class Forecaster:
+    def __init__(self, window=config.FORECAST_WINDOW, horizon=config.FORECAST_HORIZON):
+        self.window = window
+        self.horizon = horizon
+        self.lock = threading.Lock()
+        self.samples = deque()  # (x, y, captured_at, temperature) of the samples inside the window
+        self.xtx = np.zeros((NUM_FEATURES, NUM_FEATURES))
+        self.xty = np.zeros(NUM_FEATURES)
+        # Running sums for the temperature trend line: n, t, t^2, T, t*T with t in days
+        self.trend = np.zeros(5)
+        self.last_count = None
+        self.last_captured_at = None
+        self.backtest_mae = None
+        self.cached = {"status": "insufficient data", "samples": 0, "forecast": []}
+
+    def trend_terms(self, captured_at, temperature):
+        t = captured_at / DAY
+        return np.array([1.0, t, t * t, temperature, t * temperature])
+
+    def add_sample(self, captured_at, count, temperature):
+        """Slides the window forward by one capture. Caller holds the lock."""
+        if self.last_count is not None:
+            x = features(temperature, self.last_count)
+            self.samples.append((x, count, captured_at, temperature))
+            self.xtx += np.outer(x, x)
+            self.xty += x * count
+            self.trend += self.trend_terms(captured_at, temperature)
+            if len(self.samples) > self.window:
+                old_x, old_y, old_captured_at, old_temperature = self.samples.popleft()
+                self.xtx -= np.outer(old_x, old_x)
+                self.xty -= old_x * old_y
+                self.trend -= self.trend_terms(old_captured_at, old_temperature)
+        self.last_count = count
+        self.last_captured_at = captured_at
+
+    def load(self, database):
+        """Reads the scheduled captures into arrays and primes the window and backtest."""
+        with database.read() as conn:
+            rows = conn.execute(
+                "SELECT captured_at, faa_count, temperature FROM MosquitoData "
+                "WHERE capture_type = 'scheduled' AND faa_count IS NOT NULL AND temperature IS NOT NULL "
+                "ORDER BY captured_at, id;").fetchall()
+        data = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        counts, temperatures = data[:, 1], data[:, 2]
+
+        with self.lock:
+            self.__init__(self.window, self.horizon)
+            if len(data) > 1:
+                # One-step-ahead error of every historical window, computed in one vectorised pass
+                X = np.column_stack([np.ones(len(data) - 1), temperatures[1:], counts[:-1]])
+                y = counts[1:]
+                coefficients = rolling_fit(X, y, self.window)
+                predicted = np.einsum("ni,ni->n", coefficients[:-1], X[1:])
+                errors = np.abs(predicted - y[1:])
+                errors = errors[~np.isnan(errors)]
+                self.backtest_mae = round(float(errors.mean()), 2) if len(errors) else None
+            for row in data[-(self.window + 1):]:
+                self.add_sample(*row)
+            self.refresh()
+        print(f"📈 Forecast model loaded from {len(data)} scheduled capture(s)")
+
+    def observe(self, captured_at, count, temperature):
+        """Folds one new capture into the model and recomputes the cached forecast."""
+        if count is None or temperature is None:
+            return
+        with self.lock:
+            if self.last_captured_at is not None and captured_at < self.last_captured_at:
+                return  # Out-of-order rows are picked up by the next load() (startup, clear-data, after a backfill)
+            self.add_sample(captured_at, count, temperature)
+            self.refresh()
+
+    def refresh(self):
+        """Solves the current window and rolls the forecast forward. Caller holds the lock."""
+        n = len(self.samples)
+        if n < NUM_FEATURES + 2:
+            self.cached = {"status": "insufficient data", "samples": n, "forecast": []}
+            return
+        coefficients = np.linalg.solve(self.xtx + RIDGE * np.eye(NUM_FEATURES), self.xty)
+
+        count_n, sum_t, sum_tt, sum_temp, sum_t_temp = self.trend
+        denominator = count_n * sum_tt - sum_t * sum_t
+        slope = (count_n * sum_t_temp - sum_t * sum_temp) / denominator if denominator > 1e-9 else 0.0
+        intercept = (sum_temp - slope * sum_t) / count_n
+
+        forecast = []
+        previous_count = self.last_count
+        for slot in next_capture_times(self.last_captured_at, self.horizon):
+            temperature = intercept + slope * slot / DAY
+            predicted = max(0.0, float(features(temperature, previous_count) @ coefficients))
+            forecast.append({
+                "captured_at": slot,
+                "datetime": datetime.fromtimestamp(slot, timezone.utc).strftime("%Y-%m-%d %H:%M"),
+                "temperature": round(float(temperature), 2),
+                "faa_count": round(predicted, 1),
+            })
+            previous_count = predicted
+
+        self.cached = {
+            "status": "ok",
+            "generated_at": int(time.time()),
+            "samples": n,
+            "window": self.window,
+            "coefficients": {
+                "intercept": round(float(coefficients[0]), 4),
+                "temperature": round(float(coefficients[1]), 4),
+                "previous_count": round(float(coefficients[2]), 4),
+            },
+            "temperature_trend_per_day": round(float(slope), 4),
+            "backtest_mae": self.backtest_mae,
+            "forecast": forecast,
+        }
+
+    def latest(self):
+        """The cached forecast. Never recomputes, so it is constant time."""
+        return self.cached
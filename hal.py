@@ -0,0 +1,263 @@
+"""Hardware abstraction for the camera, the DS3231 real-time clock and the flash LED.
+
+The "pi" backend drives the real devices; its driver modules (board, adafruit_ds3231, RPi.GPIO,
+picamera2) are only imported when it is selected, so the rest of the app imports on any machine. The
+"simulated" backend replays JPEG fixtures as camera frames, keeps a fake clock that can be
+advanced by hand and records every flash toggle, which lets the whole capture -> inference -> log
+pipeline run and be profiled off-device.
+"""
+import calendar
+import glob
+import io
+import math
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import NamedTuple
+
+import config
+
+
+class Camera:
+    """Interface: capture(path) writes one JPEG; capture_burst(paths, interval) writes one per path.
+
+    capture_bytes() and capture_frames(count, interval) return the JPEGs as bytes instead of writing them.
+    """
+
+    def capture(self, path):
+        raise NotImplementedError
+
+    def capture_bytes(self):
+        raise NotImplementedError
+
+    def capture_burst(self, paths, interval=config.CAPTURE_BURST_INTERVAL):
+        for i, path in enumerate(paths):
+            if i:
+                time.sleep(interval)
+            self.capture(path)
+
+    def capture_frames(self, count, interval=config.CAPTURE_BURST_INTERVAL):
+        frames = []
+        for i in range(count):
+            if i:
+                time.sleep(interval)
+            frames.append(self.capture_bytes())
+        return frames
+
+    def close(self):
+        pass
+
+
+class LibcameraCamera(Camera):
+    """Raspberry Pi Camera Module via the libcamera-still command. Starts the camera for every shot."""
+
+    def __init__(self, width=config.CAPTURE_WIDTH, height=config.CAPTURE_HEIGHT):
+        self.width = width
+        self.height = height
+
+    def command(self, output):
+        return ["libcamera-still", "-o", output, "--width", str(self.width), "--height", str(self.height), "--timeout", "1"]
+
+    def capture(self, path):
+        subprocess.run(self.command(path), check=True)
+
+    def capture_bytes(self):
+        return subprocess.run(self.command("-"), check=True, stdout=subprocess.PIPE).stdout  # "-o -" writes the JPEG to stdout
+
+
+class Picamera2Camera(Camera):
+    """Raspberry Pi Camera Module kept running through one Picamera2 session.
+
+    The sensor is started, and auto-exposure settles, once at startup; each capture then only
+    grabs and encodes the next frame, which takes a fraction of a second instead of the seconds
+    libcamera-still spends starting the camera.
+    """
+
+    def __init__(self, width=config.CAPTURE_WIDTH, height=config.CAPTURE_HEIGHT, settle=config.CAMERA_SETTLE_SECONDS):
+        from picamera2 import Picamera2
+
+        self.lock = threading.Lock()
+        self.camera = Picamera2()
+        self.camera.configure(self.camera.create_still_configuration(main={"size": (width, height)}))
+        self.camera.start()
+        time.sleep(settle)  # Let auto-exposure and white balance converge before the first shot
+
+    def capture(self, path):
+        with self.lock:
+            self.camera.capture_file(path)
+
+    def capture_bytes(self):
+        with self.lock:
+            return self.encode_frame()
+
+    def encode_frame(self):
+        buffer = io.BytesIO()
+        self.camera.capture_file(buffer, format="jpeg")
+        return buffer.getvalue()
+
+    def capture_burst(self, paths, interval=config.CAPTURE_BURST_INTERVAL):
+        with self.lock:  # One burst at a time, so its frames are not interleaved with another capture
+            for i, path in enumerate(paths):
+                if i:
+                    time.sleep(interval)
+                self.camera.capture_file(path)
+
+    def capture_frames(self, count, interval=config.CAPTURE_BURST_INTERVAL):
+        frames = []
+        with self.lock:
+            for i in range(count):
+                if i:
+                    time.sleep(interval)
+                frames.append(self.encode_frame())
+        return frames
+
+    def close(self):
+        self.camera.stop()
+        self.camera.close()
+
+
+def pi_camera():
+    """The CAMERA_BACKEND camera; "auto" prefers a persistent Picamera2 session when picamera2 is installed."""
+    if config.CAMERA_BACKEND in ("auto", "picamera2"):
+        try:
+            return Picamera2Camera()
+        except ImportError:
+            if config.CAMERA_BACKEND == "picamera2":
+                raise
+            print("⚠️ picamera2 is not installed, falling back to libcamera-still per capture")
+    return LibcameraCamera()
+
+
+class DS3231Clock:
+    """DS3231 on the default I2C bus. Exposes the driver's datetime and temperature properties."""
+
+    def __init__(self):
+        import board
+        import adafruit_ds3231
+
+        self.rtc = adafruit_ds3231.DS3231(board.I2C())
+
+    @property
+    def datetime(self):
+        return self.rtc.datetime
+
+    @property
+    def temperature(self):
+        return self.rtc.temperature
+
+
+class GPIOFlash:
+    """Flash LED switched by a GPIO pin (BCM numbering)."""
+
+    def __init__(self, pin=config.FLASH_GPIO_PIN):
+        import RPi.GPIO as GPIO
+
+        self.GPIO = GPIO
+        self.pin = pin
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(pin, GPIO.OUT)
+
+    def on(self):
+        self.GPIO.output(self.pin, self.GPIO.HIGH)
+
+    def off(self):
+        self.GPIO.output(self.pin, self.GPIO.LOW)
+
+
+class SimulatedCamera(Camera):
+    """Writes the fixture JPEGs of a folder in turn as captured frames, taking latency seconds per shot."""
+
+    def __init__(self, fixtures_dir=config.SIM_FIXTURES_DIR, latency=config.SIM_CAMERA_LATENCY):
+        self.fixtures = sorted(glob.glob(os.path.join(fixtures_dir, "*.jpg")))
+        if not self.fixtures:
+            raise ValueError(f"No .jpg fixtures found in {fixtures_dir}")
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.captures = 0
+
+    def next_fixture(self):
+        with self.lock:
+            fixture = self.fixtures[self.captures % len(self.fixtures)]
+            self.captures += 1
+        time.sleep(self.latency)
+        return fixture
+
+    def capture(self, path):
+        shutil.copyfile(self.next_fixture(), path)
+
+    def capture_bytes(self):
+        with open(self.next_fixture(), "rb") as f:
+            return f.read()
+
+
+class SimulatedClock:
+    """Fake RTC. Runs from start (epoch seconds, default now) at speed times real time, plus any advance().
+
+    The temperature follows a daily cycle between 24 and 32 degC, peaking mid-afternoon.
+    """
+
+    def __init__(self, start=None, speed=1.0):
+        self.start = calendar.timegm(time.localtime()) if start is None else start
+        self.speed = speed
+        self.started = time.monotonic()
+        self.offset = 0.0
+        self.lock = threading.Lock()
+
+    def now(self):
+        with self.lock:
+            return self.start + (time.monotonic() - self.started) * self.speed + self.offset
+
+    def advance(self, seconds):
+        with self.lock:
+            self.offset += seconds
+
+    def set(self, epoch):
+        with self.lock:
+            self.offset += epoch - (self.start + (time.monotonic() - self.started) * self.speed + self.offset)
+
+    @property
+    def datetime(self):
+        return time.gmtime(int(self.now()))
+
+    @property
+    def temperature(self):
+        hour = (self.now() % 86400) / 3600
+        return round(28 + 4 * math.sin((hour - 9) / 24 * 2 * math.pi), 2)
+
+
+class SimulatedFlash:
+    """Records every toggle as (epoch seconds, state)."""
+
+    def __init__(self):
+        self.toggles = []
+        self.state = False
+
+    def on(self):
+        self.state = True
+        self.toggles.append((time.time(), True))
+
+    def off(self):
+        self.state = False
+        self.toggles.append((time.time(), False))
+
+
+class Hardware(NamedTuple):
+    camera: object
+    clock: object
+    flash: object
+
+
+HARDWARE_BACKENDS = {
+    "pi": lambda: Hardware(pi_camera(), DS3231Clock(), GPIOFlash()),
+    "simulated": lambda: Hardware(SimulatedCamera(), SimulatedClock(), SimulatedFlash()),
+}
+
+
+def get_hardware(backend=config.HARDWARE_BACKEND):
+    """Returns the camera, clock and flash of the configured backend."""
+    if backend not in HARDWARE_BACKENDS:
+        raise ValueError(f"Unknown HARDWARE_BACKEND '{backend}', expected one of {sorted(HARDWARE_BACKENDS)}")
+    print(f"🔌 Using {backend} hardware backend")
+    return HARDWARE_BACKENDS[backend]()
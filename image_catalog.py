@@ -0,0 +1,137 @@
+"""Catalog of the image files on disk, so galleries are listed from an index instead of os.listdir.
+
+Rows are written whenever the app saves or deletes an image. reconcile() brings the catalog back
+in line with the folders at startup, picking up files copied in or deleted by hand. A capture row
+links to its annotated output image once one exists.
+"""
+import os
+import re
+from datetime import datetime
+
+from mosquito_data import SCHEDULED_HOURS, date_epoch, decode_cursor, encode_cursor
+
+MAX_PAGE_SIZE = 500
+OUTPUT_FOLDER = "inference_output"
+OUTPUT_PREFIX = "output_"
+
+CREATE_IMAGE_CATALOG_TABLE = '''
+CREATE TABLE IF NOT EXISTS ImageCatalog (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    captured_at INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    output_filename TEXT,
+    UNIQUE (folder, filename)
+);
+'''
+CREATE_IMAGE_CATALOG_INDEX = "CREATE INDEX IF NOT EXISTS idx_image_catalog_listing ON ImageCatalog (folder, captured_at, id);"
+
+# "2025_02_23_AM.jpg" (scheduled, at the usual AM/PM time), "2025_02_23_AM_063012.jpg" (scheduled at another
+# time), "2025_02_23_AM_063012-2.jpg" (later shots of a burst) and "RunTest_2025_02_23_14_05.jpg" (manual),
+# with any prefix such as "output_"
+SCHEDULED_FILE = re.compile(r"(\d{4})_(\d{2})_(\d{2})_(AM|PM)(?:_(\d{2})(\d{2})(\d{2})(?:-\d+)?)?\.jpg$")
+MANUAL_FILE = re.compile(r"RunTest_(\d{4})_(\d{2})_(\d{2})_(\d{2})_(\d{2})\.jpg$")
+
+
+def create_tables(conn):
+    conn.execute(CREATE_IMAGE_CATALOG_TABLE)
+    conn.execute(CREATE_IMAGE_CATALOG_INDEX)
+
+
+def filename_captured_at(filename, fallback):
+    """Capture time (RTC wall-clock epoch seconds) encoded in an image filename, else fallback."""
+    match = SCHEDULED_FILE.search(filename)
+    if match:
+        day = datetime(int(match[1]), int(match[2]), int(match[3]))
+        if match[5]:
+            return date_epoch(day) + int(match[5]) * 3600 + int(match[6]) * 60 + int(match[7])
+        return date_epoch(day) + SCHEDULED_HOURS[match[4]] * 3600
+    match = MANUAL_FILE.search(filename)
+    if match:
+        day = datetime(int(match[1]), int(match[2]), int(match[3]))
+        return date_epoch(day) + int(match[4]) * 3600 + int(match[5]) * 60
+    return int(fallback)
+
+
+def upsert(cursor, folder, filename, stat, captured_at=None):
+    captured_at = captured_at if captured_at is not None else filename_captured_at(filename, stat.st_mtime)
+    cursor.execute('''
+        INSERT INTO ImageCatalog (folder, filename, captured_at, size_bytes, mtime_ns) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (folder, filename) DO UPDATE SET
+            captured_at = excluded.captured_at, size_bytes = excluded.size_bytes, mtime_ns = excluded.mtime_ns;
+    ''', (folder, filename, captured_at, stat.st_size, stat.st_mtime_ns))
+
+
+def record_image(cursor, folder, filename, captured_at=None, source=None):
+    """Catalogs a file the app has just written. source is (folder, filename) of the capture an output image annotates."""
+    upsert(cursor, folder, filename, os.stat(os.path.join(folder, filename)), captured_at)
+    if source is not None:
+        cursor.execute("UPDATE ImageCatalog SET output_filename = ? WHERE folder = ? AND filename = ?;",
+                       (filename, *source))
+
+
+def remove_images(cursor, folder, filenames):
+    cursor.executemany("DELETE FROM ImageCatalog WHERE folder = ? AND filename = ?;",
+                       [(folder, filename) for filename in filenames])
+    cursor.executemany("UPDATE ImageCatalog SET output_filename = NULL WHERE output_filename = ?;",
+                       [(filename,) for filename in filenames])
+
+
+def sync_folder(cursor, folder, entries):
+    """Applies one folder scan ({filename: stat}) to the catalog. Returns (added or changed, removed)."""
+    known = {filename: (size, mtime_ns) for filename, size, mtime_ns in cursor.execute(
+        "SELECT filename, size_bytes, mtime_ns FROM ImageCatalog WHERE folder = ?;", (folder,))}
+    changed = [name for name, stat in entries.items() if known.get(name) != (stat.st_size, stat.st_mtime_ns)]
+    for name in changed:
+        upsert(cursor, folder, name, entries[name])
+    removed = [name for name in known if name not in entries]
+    remove_images(cursor, folder, removed)
+    return len(changed), len(removed)
+
+
+def link_outputs(cursor, capture_folder):
+    """Links every capture to its annotated output image by filename (output_<capture>)."""
+    cursor.execute('''
+        UPDATE ImageCatalog SET output_filename = (
+            SELECT o.filename FROM ImageCatalog o WHERE o.folder = ? AND o.filename = ? || ImageCatalog.filename
+        ) WHERE folder = ?;
+    ''', (OUTPUT_FOLDER, OUTPUT_PREFIX, capture_folder))
+
+
+def reconcile(database, folders, capture_folder):
+    """Rescans the image folders and corrects the catalog for files added, changed or removed outside the app."""
+    scans = {}
+    for folder in folders:
+        # Stats come from the directory scan itself, so this is one pass over each folder
+        scans[folder] = {entry.name: entry.stat() for entry in os.scandir(folder)
+                         if entry.name.endswith(".jpg") and entry.is_file()} if os.path.isdir(folder) else {}
+
+    def apply(cursor):
+        totals = [sync_folder(cursor, folder, entries) for folder, entries in scans.items()]
+        link_outputs(cursor, capture_folder)
+        return [sum(column) for column in zip(*totals)]
+
+    changed, removed = database.write(apply).result()
+    print(f"🗂️ Image catalog reconciled: {sum(map(len, scans.values()))} file(s), {changed} added/updated, {removed} removed")
+
+
+def list_page(conn, folder, limit=50, cursor=None):
+    """One page of a folder's images, newest first, and the cursor of the next page (None on the last page)."""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    clauses, params = ["folder = ?"], [folder]
+    if cursor:
+        last_captured_at, last_id = decode_cursor(cursor)
+        clauses.append("(captured_at < ? OR (captured_at = ? AND id < ?))")
+        params += [last_captured_at, last_captured_at, last_id]
+    rows = conn.execute(
+        f"SELECT id, filename, captured_at, size_bytes, output_filename FROM ImageCatalog WHERE {' AND '.join(clauses)} "
+        f"ORDER BY captured_at DESC, id DESC LIMIT ?;", params + [limit + 1]).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][2], rows[-1][0]])
+    return [{"filename": r[1], "url": f"/{folder}/{r[1]}", "captured_at": r[2], "size_bytes": r[3],
+             "output": f"/{OUTPUT_FOLDER}/{r[4]}" if r[4] else None} for r in rows], next_cursor
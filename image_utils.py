@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+
+def load_image(image):
+    """Decodes an image given as a file path, JPEG bytes or an already decoded array."""
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        decoded = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        decoded = cv2.imread(image)
+    if decoded is None:
+        raise ValueError(f"Unable to decode image {image if isinstance(image, str) else '<buffer>'}")
+    return decoded
+
+
+def read_image_bytes(image):
+    """Returns the encoded bytes of an image given as a file path, bytes or array."""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    if isinstance(image, np.ndarray):
+        ok, encoded = cv2.imencode(".jpg", image)
+        if not ok:
+            raise ValueError("Unable to encode image")
+        return encoded.tobytes()
+    with open(image, "rb") as f:
+        return f.read()
+
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, arithmetic); they carry the image size
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+REDUCED_DECODES = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+
+
+def jpeg_size(data):
+    """(width, height) read from a JPEG's frame header without decoding it, or None if data is not a JPEG."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # Fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # Markers without a length
+            i += 2
+            continue
+        if marker in SOF_MARKERS:
+            return int.from_bytes(data[i + 7:i + 9], "big"), int.from_bytes(data[i + 5:i + 7], "big")
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def encode_for_upload(image, max_side, quality):
+    """Shrinks an image (path, bytes or array) so its longer side is at most max_side and encodes it as JPEG.
+
+    JPEGs are decoded at a reduced libjpeg scale when that is still large enough, and a JPEG that is
+    already small enough is returned untouched. Returns the encoded bytes and the x and y scale
+    factors from the original frame to the encoded image.
+    """
+    if isinstance(image, np.ndarray):
+        frame = image
+        height, width = frame.shape[:2]
+    else:
+        data = read_image_bytes(image)
+        size = jpeg_size(data)
+        if size is None:
+            frame = load_image(data)
+            height, width = frame.shape[:2]
+        else:
+            width, height = size
+            if max(width, height) <= max_side:
+                return data, 1.0, 1.0
+            flag = next((flag for factor, flag in REDUCED_DECODES if -(-max(width, height) // factor) >= max_side),
+                        cv2.IMREAD_COLOR)
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+            if frame is None:
+                raise ValueError("Unable to decode image <buffer>")
+
+    scale = min(max_side / max(width, height), 1.0)
+    target = (max(round(width * scale), 1), max(round(height * scale), 1))
+    if (frame.shape[1], frame.shape[0]) != target:
+        frame = cv2.resize(frame, target, interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Unable to encode image")
+    return encoded.tobytes(), target[0] / width, target[1] / height
@@ -0,0 +1,61 @@
+"""Background writer that persists in-memory JPEGs, so capture and inference never wait on the SD card.
+
+Each image is written exactly once, under a temporary name and renamed so readers never see a
+partial file, and is cataloged once it is on disk. Writes happen in order on one thread; save()
+blocks only when max_pending images are already queued, so memory use stays bounded.
+"""
+import os
+import queue
+import tempfile
+import threading
+
+import config
+from image_catalog import record_image
+
+
+def write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ImageWriter:
+    def __init__(self, database, max_pending=config.IMAGE_WRITER_MAX_PENDING, on_saved=None):
+        self.database = database
+        self.on_saved = on_saved  # Called with (folder, filename) once an image is on disk and cataloged
+        self.queue = queue.Queue(max_pending)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.written = 0
+        self.failures = 0
+
+    def save(self, folder, filename, data, captured_at=None, source=None):
+        """Queues data to be written to folder/filename and cataloged (see image_catalog.record_image)."""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="image-writer", daemon=True)
+                self.thread.start()
+        self.queue.put((folder, filename, data, captured_at, source))
+
+    def run(self):
+        while True:
+            folder, filename, data, captured_at, source = self.queue.get()
+            try:
+                write_atomic(os.path.join(folder, filename), data)
+                self.database.write(record_image, folder, filename, captured_at, source).result()
+                self.written += 1
+                if self.on_saved:
+                    self.on_saved(folder, filename)
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Failed to save {folder}/{filename}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Waits until every queued image is on disk."""
+        self.queue.join()
+
+    def stats(self):
+        return {"pending": self.queue.qsize(), "written": self.written, "failures": self.failures}
@@ -0,0 +1,163 @@
+"""Shared HTTP client for the hosted inference API: pooled connections, bounded concurrency and retries."""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from image_utils import encode_for_upload, read_image_bytes
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class InferenceError(Exception):
+    """Raised when the inference API could not process an image after all retries."""
+
+
+class LatencyStats:
+    """Thread-safe counters and a rolling window of per-call latencies."""
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+
+    def record(self, latency, ok, retries):
+        with self.lock:
+            self.calls += 1
+            self.retries += retries
+            if ok:
+                self.latencies.append(latency)
+            else:
+                self.failures += 1
+
+    def summary(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            summary = {"calls": self.calls, "failures": self.failures, "retries": self.retries}
+        if len(latencies):
+            summary.update({
+                "mean_ms": round(float(latencies.mean()), 1),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+                "max_ms": round(float(latencies.max()), 1),
+            })
+        return summary
+
+
+class InferenceClient:
+    """Posts images to the /{MODEL_ID} endpoint over a keep-alive session."""
+
+    def __init__(self, api_url=config.API_URL, api_key=config.API_KEY, model_id=config.MODEL_ID,
+                 max_concurrency=config.INFERENCE_MAX_CONCURRENCY, timeout=config.INFERENCE_TIMEOUT,
+                 max_retries=config.INFERENCE_MAX_RETRIES, backoff=config.INFERENCE_BACKOFF,
+                 upload_max_side=config.UPLOAD_MAX_SIDE, upload_quality=config.UPLOAD_JPEG_QUALITY):
+        self.url = f"{api_url}/{model_id}"
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.upload_max_side = upload_max_side
+        self.upload_quality = upload_quality
+        self.stats = LatencyStats()
+        self.bytes_lock = threading.Lock()
+        self.bytes_sent = 0  # Image bytes uploaded, including retried attempts
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, image_bytes):
+        response = self.session.post(
+            self.url,
+            params={"api_key": self.api_key},
+            files={"file": ("image.jpg", image_bytes, "image/jpeg")},
+            timeout=self.timeout,
+        )
+        if response.status_code in RETRY_STATUS_CODES:
+            raise requests.HTTPError(f"{response.status_code}: {response.text[:200]}", response=response)
+        if response.status_code != 200:
+            # Anything else (bad key, unknown model, bad image) will not succeed on retry
+            raise InferenceError(f"Failed to process image - {response.status_code}: {response.text[:200]}")
+        try:
+            return response.json()
+        except ValueError as e:  # A 200 page that is not the API's (a proxy or captive portal)
+            raise InferenceError(f"Failed to process image - response is not JSON: {response.text[:200]}") from e
+
+    def encode(self, image):
+        """The bytes to upload for an image and the x/y scale from the original frame to them."""
+        if not self.upload_max_side:
+            return read_image_bytes(image), 1.0, 1.0
+        return encode_for_upload(image, self.upload_max_side, self.upload_quality)
+
+    def infer(self, image):
+        """Runs inference on a path, bytes or array. Retries transient failures with exponential backoff.
+
+        The image is shrunk and re-encoded for upload (see encode); predictions are in original-frame pixels.
+        """
+        start = time.perf_counter()
+        image_bytes, scale_x, scale_y = self.encode(image)
+        attempt = 0
+        with self.slots:
+            while True:
+                try:
+                    with self.bytes_lock:
+                        self.bytes_sent += len(image_bytes)
+                    result = rescale_result(self.post(image_bytes), scale_x, scale_y)
+                    self.stats.record(time.perf_counter() - start, True, attempt)
+                    return result
+                except InferenceError:
+                    self.stats.record(time.perf_counter() - start, False, attempt)
+                    raise
+                except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                    if attempt >= self.max_retries:
+                        self.stats.record(time.perf_counter() - start, False, attempt)
+                        raise InferenceError(f"Giving up after {attempt + 1} attempts: {e}") from e
+                    delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    print(f"🔁 Inference attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+                    attempt += 1
+
+    def infer_many(self, images):
+        """Runs inference on several images concurrently, bounded by max_concurrency. Keeps input order."""
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            return list(pool.map(self.infer, images))
+
+    def close(self):
+        self.session.close()
+
+
+def rescale_result(result, scale_x, scale_y):
+    """Maps the boxes (and image size) of a result for a scaled upload back to original-frame pixels."""
+    if scale_x == 1.0 and scale_y == 1.0:
+        return result
+    for p in result.get("predictions", []):
+        p["x"], p["width"] = p["x"] / scale_x, p["width"] / scale_x
+        p["y"], p["height"] = p["y"] / scale_y, p["height"] / scale_y
+    if "image" in result:
+        result["image"] = {"width": round(result["image"]["width"] / scale_x),
+                           "height": round(result["image"]["height"] / scale_y)}
+    return result
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide inference client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = InferenceClient()
+        return _client
@@ -1,10 +1,10 @@
 import sys
-import requests
-import cv2
 import os
-import json
 from datetime import datetime
 
+from annotate import render_annotated
+from detector import get_detector
+
 # Ensure correct usage
 if len(sys.argv) != 3:
     print("❌ Usage: python3 inference_hosted_api.py <input_image> <output_image>")
@@ -14,56 +14,33 @@ if len(sys.argv) != 3:
 input_image_path = sys.argv[1]
 output_image_path = sys.argv[2]
 
-# Define constants
-API_URL = "https://detect.roboflow.com"
-API_KEY = "122aOY67jDoRdfvlcYg6"
-MODEL_ID = "mosquito_faa/1"
-
 # Validate input image
 if not os.path.exists(input_image_path):
     print(f"❌ Error: Input image not found at {input_image_path}")
     sys.exit(1)
 
-# Initialize Inference Client
-response = requests.post(
-    f"{API_URL}/{MODEL_ID}?api_key={API_KEY}",
-    files={"file": open(input_image_path, "rb")}
-)
+# Read the image once for both inference and annotation
+with open(input_image_path, "rb") as f:
+    image_bytes = f.read()
 
-if response.status_code != 200:
-    print(f"❌ Error: Failed to process image - {response.text}")
+# Run inference through the shared detector (cached by image hash)
+try:
+    result = get_detector().detect(image_bytes)
+except Exception as e:
+    print(f"❌ Error: {e}")
     sys.exit(1)
 
 # Parse inference results
-result = response.json()
 predictions = result.get("predictions", [])
 faa_count = len(predictions)
 print(f"✅ Total FAA detected: {faa_count}")
 
-# Load the input image
-image = cv2.imread(input_image_path)
-if image is None:
-    print(f"❌ Error: Unable to read input image {input_image_path}")
-    sys.exit(1)
-
-# Overlay bounding boxes and FAA count
-for pred in predictions:
-    x, y, width, height = (
-        int(pred["x"]), int(pred["y"]), int(pred["width"]), int(pred["height"])
-    )
-    confidence = pred["confidence"]
-    label = "FAA"
-    
-    x1, y1, x2, y2 = x - width // 2, y - height // 2, x + width // 2, y + height // 2
-    cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 2)
-    text = f"{label}: {confidence:.2f}"
-    cv2.putText(image, text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-
-# Overlay FAA count
+# Overlay bounding boxes and FAA count, then save the output image
 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 info_text = f"{timestamp} | FAA Count: {faa_count}"
-cv2.putText(image, info_text, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-# Save the output image
-cv2.imwrite(output_image_path, image)
+try:
+    render_annotated(image_bytes, predictions, output_image_path, info_text)
+except ValueError as e:
+    print(f"❌ Error: {e}")
+    sys.exit(1)
 print(f"✅ Inference result saved at {output_image_path}")
@@ -0,0 +1,179 @@
+"""Durable job queue stored in FAA_DB.db and worked by a fixed pool of threads.
+
+Jobs are claimed with a lease. A job whose worker dies (or whose process restarts) mid-run is
+handed out again once the lease expires or on the next start, so every job runs at least once.
+Handlers must therefore be safe to run twice for the same payload (the inference handler logs each
+capture under a unique source, so a second run changes nothing).
+"""
+import json
+import threading
+import time
+
+import config
+
+CREATE_JOBS_TABLE = '''
+CREATE TABLE IF NOT EXISTS InferenceJobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    run_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+'''
+CREATE_JOBS_INDEX = "CREATE INDEX IF NOT EXISTS idx_inference_jobs_status_run_at ON InferenceJobs (status, run_at);"
+
+
+class QueueFull(Exception):
+    """Raised by enqueue when the number of unfinished jobs has reached max_pending (unless deferring)."""
+
+
+class JobQueue:
+    def __init__(self, handlers, database, workers=config.JOB_WORKERS, max_pending=config.JOB_MAX_PENDING,
+                 max_attempts=config.JOB_MAX_ATTEMPTS, lease_seconds=config.JOB_LEASE_SECONDS,
+                 retry_delay=config.JOB_RETRY_DELAY):
+        self.handlers = handlers
+        self.database = database
+        self.num_workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        self.wakeup = threading.Condition()
+        self.stopping = threading.Event()
+        self.workers = []
+
+    def enqueue(self, kind, payload, delay=0, defer=False):
+        """Adds a job that becomes runnable after delay seconds. Returns the job id and whether it was deferred.
+
+        When max_pending jobs are already queued it raises QueueFull, or with defer stores the job as
+        'deferred'; deferred jobs are queued in order as the backlog drains, so none is lost.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        def insert(cursor):
+            pending = cursor.execute(
+                "SELECT COUNT(*) FROM InferenceJobs WHERE status IN ('pending', 'running', 'deferred')").fetchone()[0]
+            status = "pending"
+            if pending >= self.max_pending:
+                if not defer:
+                    raise QueueFull(f"{pending} jobs already queued")
+                status = "deferred"
+            now = time.time()
+            job_id = cursor.execute(
+                "INSERT INTO InferenceJobs (kind, payload, status, run_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?);",
+                (kind, json.dumps(payload), status, now + delay, now, now)).lastrowid
+            return job_id, status == "deferred"
+
+        job_id, deferred = self.database.write(insert).result()
+        with self.wakeup:
+            self.wakeup.notify()
+        return job_id, deferred
+
+    def promote_deferred(self, cursor, now):
+        """Queues the oldest deferred jobs while fewer than max_pending jobs are pending or running."""
+        active = cursor.execute(
+            "SELECT COUNT(*) FROM InferenceJobs WHERE status IN ('pending', 'running')").fetchone()[0]
+        if active < self.max_pending:
+            cursor.execute(
+                "UPDATE InferenceJobs SET status = 'pending', run_at = MAX(run_at, ?), updated_at = ? WHERE id IN "
+                "(SELECT id FROM InferenceJobs WHERE status = 'deferred' ORDER BY id LIMIT ?);",
+                (now, now, self.max_pending - active))
+
+    def recover(self):
+        """Returns jobs left running by a previous process to the pending state."""
+        def reset(cursor):
+            recovered = cursor.execute(
+                "UPDATE InferenceJobs SET status = 'pending', lease_until = NULL, updated_at = ? WHERE status = 'running';",
+                (time.time(),)).rowcount
+            pending = cursor.execute("SELECT COUNT(*) FROM InferenceJobs WHERE status = 'pending'").fetchone()[0]
+            return recovered, pending
+
+        recovered, pending = self.database.write(reset).result()
+        if recovered or pending:
+            print(f"♻️ Recovered {recovered} interrupted job(s), {pending} job(s) pending")
+
+    def claim(self):
+        """Leases the next runnable job, or returns None and the time until the next one is due."""
+        def lease(cursor):
+            now = time.time()
+            self.promote_deferred(cursor, now)
+            job = cursor.execute(
+                "SELECT id, kind, payload, attempts FROM InferenceJobs "
+                "WHERE (status = 'pending' AND run_at <= ?) OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY run_at LIMIT 1;", (now, now)).fetchone()
+            if job is None:
+                next_run = cursor.execute(
+                    "SELECT MIN(run_at) FROM InferenceJobs WHERE status = 'pending'").fetchone()[0]
+                return None, (next_run - now) if next_run is not None else None
+            cursor.execute(
+                "UPDATE InferenceJobs SET status = 'running', attempts = attempts + 1, lease_until = ?, "
+                "updated_at = ? WHERE id = ?;", (now + self.lease_seconds, now, job[0]))
+            return {"id": job[0], "kind": job[1], "payload": job[2], "attempts": job[3] + 1}, 0
+
+        return self.database.write(lease).result()
+
+    def finish(self, job, error=None):
+        now = time.time()
+        if error is None:
+            self.database.execute("UPDATE InferenceJobs SET status = 'done', lease_until = NULL, last_error = NULL, "
+                                  "updated_at = ? WHERE id = ?;", (now, job["id"]))
+        elif job["attempts"] >= self.max_attempts:
+            self.database.execute("UPDATE InferenceJobs SET status = 'failed', lease_until = NULL, last_error = ?, "
+                                  "updated_at = ? WHERE id = ?;", (error, now, job["id"]))
+            print(f"❌ Job {job['id']} failed permanently after {job['attempts']} attempts: {error}")
+        else:
+            delay = self.retry_delay * (2 ** (job["attempts"] - 1))
+            self.database.execute("UPDATE InferenceJobs SET status = 'pending', run_at = ?, lease_until = NULL, "
+                                  "last_error = ?, updated_at = ? WHERE id = ?;", (now + delay, error, now, job["id"]))
+            print(f"🔁 Job {job['id']} failed ({error}), retrying in {delay:.0f}s")
+
+    def worker(self):
+        while not self.stopping.is_set():
+            try:
+                self.run_next()
+            except Exception as e:
+                # The queue's own write failed (database locked, disk I/O): keep the thread, back off and poll again.
+                # A job left 'running' is picked up again once its lease expires.
+                print(f"❌ Job worker error: {e}, retrying in {config.JOB_POLL_INTERVAL}s")
+                self.stopping.wait(config.JOB_POLL_INTERVAL)
+
+    def run_next(self):
+        """Runs one runnable job and records its outcome, or waits until one may be due."""
+        job, wait = self.claim()
+        if job is None:
+            with self.wakeup:
+                self.wakeup.wait(timeout=min(wait, config.JOB_POLL_INTERVAL) if wait else config.JOB_POLL_INTERVAL)
+            return
+        try:
+            self.handlers[job["kind"]](**json.loads(job["payload"]))
+        except Exception as e:
+            self.finish(job, str(e))
+        else:
+            self.finish(job)
+
+    def start(self):
+        """Recovers interrupted jobs and starts the worker pool."""
+        self.recover()
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self.worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self.workers.append(thread)
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        with self.wakeup:
+            self.wakeup.notify_all()
+        for thread in self.workers:
+            thread.join(timeout)
+
+    def stats(self):
+        """Returns the number of jobs in each state."""
+        with self.database.read() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM InferenceJobs GROUP BY status;").fetchall()
+        return {status: count for status, count in rows}
@@ -1,149 +1,65 @@
-from flask import Flask, jsonify, render_template, send_from_directory, Response, request
-import board
-import adafruit_ds3231
+from flask import Flask, jsonify, render_template, send_file, Response, request, abort
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
 import time
 import os
 import threading
-import requests
-import cv2
-import numpy as np
-from datetime import datetime
-import subprocess
-import sqlite3
-import csv
-import RPi.GPIO as GPIO
 
-app = Flask(__name__)
-
-# Define the GPIO pin number
-GPIO_PIN = 23  # Use any available GPIO pin
-
-# Set up GPIO
-GPIO.setmode(GPIO.BCM)  # Use Broadcom pin numbering (BCM mode)
-GPIO.setup(GPIO_PIN, GPIO.OUT)  # Set GPIO as an output
+from config import (APP_MODE, IMAGE_CACHE_MAX_AGE, IMAGE_FOLDER, INFERENCE_OUTPUT_FOLDER, LAZY_ANNOTATION,
+                    SSE_KEEPALIVE_SECONDS, SSE_RETRY_MS, TEST_INFERENCE_FOLDER, THUMBNAIL_JPEG_QUALITY)
+from db import get_database
+from events import EventBroker
+from image_catalog import list_page as list_image_page
+from mosquito_data import fetch_page, stream_csv
+from rollups import PERIODS, range_stats, series
+from thumbnails import TIERS, get_tier
+from worker_ipc import WorkerClient, WorkerError, WorkerUnavailable
 
-# Initialize the DS3231 real-time clock
-i2c = board.I2C()
-rtc = adafruit_ds3231.DS3231(i2c)
-
-# Directories for storing images
-IMAGE_FOLDER = "captured_images"
-INFERENCE_OUTPUT_FOLDER = "inference_output"
-TEST_INFERENCE_FOLDER = "system_test"
-os.makedirs(IMAGE_FOLDER, exist_ok=True)
-os.makedirs(INFERENCE_OUTPUT_FOLDER, exist_ok=True)
+app = Flask(__name__)
 
-# Configuration for Roboflow API
-API_URL = "https://detect.roboflow.com"
-API_KEY = "122aOY67jDoRdfvlcYg6"
-MODEL_ID = "mosquito_faa/1"
+if APP_MODE == "web":
+    # Under wsgi.py: the camera, scheduler and inference run in worker.py, reached over its socket
+    worker = WorkerClient()
+    events = EventBroker()  # Fed by relay_worker_events for this process's pages
+else:
+    # python main.py: this process is also the capture worker
+    from worker import events, service as worker
 
-# Database file path
-DATABASE_PATH = 'FAA_DB.db'
+db = get_database()
 
 # Set a password for clearing the database (Change this in the environment settings)
 CLEAR_DB_PASSWORD = os.getenv('CLEAR_DB_PASSWORD', 'FAA_Forecaster2025')
 
-scheduled_capture_enable = True  # Flag to enable/disable scheduled capture
-scheduled_capture_hascaptured = False
-
-inference_type = "scheduled"
-
-def capture_image():
-    """Captures an image using the Raspberry Pi Camera Module 2 at scheduled times."""
-    now = rtc.datetime
-    date_str = f"{now.tm_year}_{now.tm_mon:02d}_{now.tm_mday:02d}"
-    time_period = "AM" if now.tm_hour < 12 else "PM"
-    filename = f"{date_str}_{time_period}.jpg"
-    image_path = os.path.join(IMAGE_FOLDER, filename)
-
-    try:
-        print(f"📸 Capturing image: {image_path}...")
-        subprocess.run(["libcamera-still", "-o", image_path, "--width", "1920", "--height", "1080", "--timeout", "1"], check=True)
-        print(f"✅ Image saved: {image_path}")
-        run_inference_later(image_path, filename)
-    except Exception as e:
-        print(f"❌ Camera Error: {e}")
-
-def run_inference(image_path, filename):
-    """Processes images to detect and count mosquito presence."""
-    output_filename = f"output_{filename}"
-    output_path = os.path.join(INFERENCE_OUTPUT_FOLDER, output_filename)
-
-    try:
-        print(f"🚀 Running inference on {image_path}...")
-        response = requests.post(
-            f"{API_URL}/{MODEL_ID}?api_key={API_KEY}",
-            files={"file": open(image_path, "rb")}
-        )
-        if response.status_code != 200:
-            print(f"❌ Error: Failed to process image - {response.text}")
-            return
-
-        result = response.json()
-        predictions = result.get("predictions", [])
-        faa_count = len(predictions)
-        print(f"✅ Total FAA detected: {faa_count}")
-
-        image = cv2.imread(image_path)
-        for pred in predictions:
-            x, y, width, height = (
-                int(pred["x"]), int(pred["y"]), int(pred["width"]), int(pred["height"])
-            )
-            cv2.rectangle(image, (x - width // 2, y - height // 2), (x + width // 2, y + height // 2), (255, 0, 0), 2)
-            cv2.putText(image, f"FAA: {pred['confidence']:.2f}", (x - width // 2, y - height // 2 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-        timestamp = f"{rtc.datetime.tm_year}-{rtc.datetime.tm_mon:02d}-{rtc.datetime.tm_mday:02d} {'AM' if rtc.datetime.tm_hour < 12 else 'PM'}"
-        info_text = f"{timestamp} | FAA Count: {faa_count} | Temp: {rtc.temperature:.1f} degC"
-        cv2.putText(image, info_text, (10, image.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        cv2.imwrite(output_path, image)
-        print(f"✅ Inference result saved at {output_path}")
-        print("====================================================================== > LOGGING DATA")
-        log_data(f"{rtc.datetime.tm_year}-{rtc.datetime.tm_mon:02d}-{rtc.datetime.tm_mday:02d} {'AM' if rtc.datetime.tm_hour < 12 else 'PM'}", faa_count, rtc.temperature)
-
-    except Exception as e:
-        print(f"❌ Inference Error: {e}")
-
-def run_inference_later(image_path, filename):
-    """Delays the inference process to allow for any post-capture processing."""
-    threading.Timer(30, run_inference, args=[image_path, filename]).start()
-    print("⏳ Scheduling inference in 30 seconds...")
-
-def schedule_capture():
+def relay_worker_events():
+    """Republishes the worker's image and inference events to this web process's pages, one long-poll at a time."""
+    after = None
     while True:
-        """Schedules image capture at 7 AM and 8 PM daily, ensuring it runs only once per scheduled time."""
-        global scheduled_capture_enable, scheduled_capture_hascaptured
-        now = rtc.datetime
-        print(f"⏰ Current Time: {now.tm_hour}:{now.tm_min}, Scheduled Capture Enabled: {scheduled_capture_enable}, Has Captured: {scheduled_capture_hascaptured}")  # Debugging
-        if (now.tm_hour == 7 and now.tm_min == 0) or (now.tm_hour == 20 and now.tm_min == 0):
-            if scheduled_capture_enable and scheduled_capture_hascaptured == False:
-                GPIO.output(GPIO_PIN, GPIO.HIGH) #turn ON flash
-                print("📸 Triggering scheduled capture...")
-                scheduled_capture_hascaptured = True  # Ensure it captures only once per scheduled time
-                capture_image()
-        elif (now.tm_min != 0):
-                scheduled_capture_hascaptured = False
-
-        time.sleep(10)  # Reduce frequency of loop execution
-        GPIO.output(GPIO_PIN, GPIO.LOW) #turn OFF flash
-
-def funct_disable_scheduled_capture():
-    global scheduled_capture_enable
-    scheduled_capture_enable = False
-
-def funct_enable_schedule_capture():
-    global scheduled_capture_enable
-    scheduled_capture_enable = True
-
-
-def log_data(datetime_str, faa_count, temperature):
-    """Logs mosquito data into the database."""
-    conn = sqlite3.connect('FAA_DB.db')
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO MosquitoData (datetime, faa_count, temperature) VALUES (?, ?, ?);", (datetime_str, faa_count, temperature))
-    conn.commit()
-    conn.close()
-    print(f"Data logged for {datetime_str}: FAA Count = {faa_count}, Temp = {temperature}")
+        try:
+            after, new_events = worker.wait_events(after, SSE_KEEPALIVE_SECONDS)
+        except WorkerError as e:
+            print(f"❌ Event relay: {e}")
+            after = None
+            time.sleep(SSE_RETRY_MS / 1000)
+            continue
+        for event, data in new_events:
+            events.publish(event, data)
+
+event_relay = None
+event_relay_lock = threading.Lock()
+
+def start_event_relay():
+    """Starts the relay and sensor ticker of a web process on its first /events subscriber (after any fork)."""
+    global event_relay
+    with event_relay_lock:
+        if event_relay is None:
+            event_relay = threading.Thread(target=relay_worker_events, name="event-relay", daemon=True)
+            event_relay.start()
+            events.start_ticker(worker.sensor_snapshot)
+
+@app.errorhandler(WorkerError)
+def worker_error(e):
+    """Requests that need the capture worker fail with 503 while it is down."""
+    return jsonify({"error": str(e)}), 503 if isinstance(e, WorkerUnavailable) else 500
 
 # Application routes
 @app.route('/')
@@ -154,18 +70,72 @@ def home():
 def gallery():
     return render_template("gallery.html")
 
+def image_listing(folder, url=None):
+    """One catalog page of a folder, newest first: image URLs plus their details and the next ?cursor=."""
+    try:
+        with db.read() as conn:
+            items, next_cursor = list_image_page(conn, folder, request.args.get("limit", 50, type=int),
+                                                 request.args.get("cursor"))
+    except ValueError as e:
+        abort(400, str(e))
+    return jsonify({"images": [url(item) if url else item["url"] for item in items], "items": items,
+                    "next_cursor": next_cursor})
+
 @app.route('/captured_images')
 def list_captured_images():
-    files = [f"/captured_images/{f}" for f in os.listdir(IMAGE_FOLDER) if f.endswith(".jpg")]
-    return jsonify({"images": files})
+    return image_listing(IMAGE_FOLDER)
+
+def send_image(folder, filename):
+    """Sends an image, or its ?size=thumb|preview tier, with a strong ETag and long-lived caching headers."""
+    size = request.args.get("size")
+    if size is not None and size not in TIERS:
+        abort(400, f"size must be one of {', '.join(TIERS)}")
+    path = safe_join(os.path.join(app.root_path, folder), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    stat = os.stat(path)
+    # Derived from the source file, so it is known without generating the tier and changes with it
+    etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}-{size or 'full'}" + (f"-q{THUMBNAIL_JPEG_QUALITY}" if size else "")
+    response = send_file(get_tier(path, size) if size else path, mimetype="image/jpeg", conditional=True,
+                         etag=etag, last_modified=stat.st_mtime, max_age=IMAGE_CACHE_MAX_AGE)
+    response.cache_control.public = True
+    return response
 
 @app.route('/captured_images/<filename>')
 def get_captured_image(filename):
-    return send_from_directory(IMAGE_FOLDER, filename)
+    return send_image(IMAGE_FOLDER, filename)
 
 @app.route('/data')
 def get_sensor_data():
-    return jsonify({"time": f"{rtc.datetime.tm_year}-{rtc.datetime.tm_mon:02d}-{rtc.datetime.tm_mday:02d} {rtc.datetime.tm_hour:02d}:{rtc.datetime.tm_min:02d}:{rtc.datetime.tm_sec:02d}", "temperature": rtc.temperature})
+    return jsonify(worker.sensor_snapshot())
+
+@app.route('/events')
+def event_stream():
+    """Server-Sent Events: "sensor" snapshots every SSE_TICK_SECONDS, "image" when an image is saved and "inference" when a capture is counted."""
+    if APP_MODE == "web":
+        start_event_relay()
+    return Response(events.stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})  # No buffering by a reverse proxy
+
+@app.route('/schedule', methods=['GET', 'POST'])
+def schedule():
+    """Reports the capture schedules and their next/last fire times; POST {"enabled": true|false} to switch them."""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data.get("enabled"), bool):
+            abort(400, 'Expected a JSON body like {"enabled": true}')
+        return jsonify(worker.schedule(data["enabled"]))
+    return jsonify(worker.schedule())
+
+@app.route('/board', methods=['GET', 'POST'])
+def board():
+    """Reports the current sticky board and its tracked insects; POST starts a new board after it was replaced."""
+    return jsonify(worker.board(request.method == 'POST'))
+
+@app.route('/sensor_stats')
+def sensor_stats():
+    """Reports RTC read counts, I2C errors, read latency percentiles and the age of the cached reading."""
+    return jsonify(worker.sensor_stats())
 
 @app.route('/inference')
 def inference_output():
@@ -173,41 +143,93 @@ def inference_output():
 
 @app.route('/inference_images')
 def list_inference_images():
-    files = [f"/inference_output/{f}" for f in os.listdir(INFERENCE_OUTPUT_FOLDER) if f.endswith(".jpg")]
-    return jsonify({"images": files})
+    if LAZY_ANNOTATION:
+        # Every capture has an annotated image available, rendered on first request
+        return image_listing(IMAGE_FOLDER, lambda item: f"/inference_output/output_{item['filename']}")
+    return image_listing(INFERENCE_OUTPUT_FOLDER)
+
+@app.route('/inference_stats')
+def inference_stats():
+    """Reports call counts and latency percentiles of the hosted inference client, prediction cache usage and prefilter decisions."""
+    return jsonify(worker.inference_stats())
+
+@app.route('/inference_jobs')
+def inference_jobs():
+    """Reports how many inference jobs are pending, running, done or failed, and the background image writer's backlog."""
+    return jsonify(worker.inference_jobs())
+
+@app.route('/events/stats')
+def event_stats():
+    """Reports how many pages are subscribed to /events and how many events were published."""
+    return jsonify(events.stats())
+
+@app.route('/forecast')
+def forecast():
+    """Serves the latest count forecast, kept up to date as captures are logged."""
+    return jsonify(worker.forecast())
+
+@app.route('/stats')
+def stats():
+    """Count and temperature statistics over ?from=&to= (inclusive dates), or one row per ?period= bucket."""
+    date_from, date_to = request.args.get("from") or None, request.args.get("to") or None
+    period = request.args.get("period")
+    if period is not None and period not in PERIODS:
+        abort(400, f"period must be one of {', '.join(PERIODS)}")
+    try:
+        with db.read() as conn:
+            if period:
+                return jsonify({"period": period, "buckets": series(conn, period, date_from, date_to)})
+            return jsonify(range_stats(conn, date_from, date_to))
+    except ValueError as e:
+        abort(400, str(e))
 
 @app.route('/inference_output/<filename>')
 def get_inference_image(filename):
-    return send_from_directory(INFERENCE_OUTPUT_FOLDER, filename)
+    if LAZY_ANNOTATION and not os.path.exists(os.path.join(INFERENCE_OUTPUT_FOLDER, filename)):
+        filename = secure_filename(filename)
+        if not filename.startswith("output_") or not os.path.exists(os.path.join(IMAGE_FOLDER, filename[len("output_"):])):
+            abort(404)
+        worker.render_output(filename)
+    return send_image(INFERENCE_OUTPUT_FOLDER, filename)
+
+def page_args():
+    """Reads the pagination and date-range query parameters shared by the data log endpoints."""
+    return {
+        "limit": request.args.get("limit", 50, type=int),
+        "cursor": request.args.get("cursor"),
+        "date_from": request.args.get("from") or None,
+        "date_to": request.args.get("to") or None,
+    }
 
 @app.route('/data-log')
 def data_log():
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT datetime, faa_count, temperature FROM MosquitoData ORDER BY datetime DESC")
-    data = cursor.fetchall()
-    conn.close()
-    return render_template('data_log.html', data=data)
+    args = page_args()
+    try:
+        with db.read() as conn:
+            data, next_cursor = fetch_page(conn, **args)
+    except ValueError as e:
+        abort(400, str(e))
+    return render_template('data_log.html', data=data, next_cursor=next_cursor, limit=args["limit"],
+                           date_from=args["date_from"] or "", date_to=args["date_to"] or "")
+
+@app.route('/api/data-log')
+def data_log_api():
+    try:
+        with db.read() as conn:
+            data, next_cursor = fetch_page(conn, **page_args())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"data": data, "next_cursor": next_cursor})
 
 @app.route('/download-data')
 def download_data():
-    conn = sqlite3.connect('FAA_DB.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT datetime, temperature, faa_count FROM MosquitoData ORDER BY datetime DESC")
-    data = cursor.fetchall()
-    conn.close()
-
-    def generate():
-        import io
-        data_stream = io.StringIO()
-        csv_writer = csv.writer(data_stream)
-        csv_writer.writerow(['Date and Time', 'Temperature', 'FAA Count'])
-        for row in data:
-            csv_writer.writerow(row)
-        data_stream.seek(0)
-        return data_stream.getvalue()
-
-    return Response(generate(), mimetype='text/csv', headers={"Content-Disposition": "attachment;filename=FAA_DataLog.csv"})
+    args = page_args()
+    try:
+        chunks = stream_csv(db, args["date_from"], args["date_to"])
+    except ValueError as e:
+        abort(400, str(e))
+    return Response(chunks, mimetype='text/csv',
+                    headers={"Content-Disposition": "attachment;filename=FAA_DataLog.csv"})
 
 @app.route('/clear-data', methods=['POST'])
 def clear_data():
@@ -217,11 +239,7 @@ def clear_data():
     if password != CLEAR_DB_PASSWORD:
         return jsonify({'status': 'Incorrect password'}), 403
 
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM MosquitoData")
-    conn.commit()
-    conn.close()
+    worker.clear_data()
 
     return jsonify({'status': 'Database cleared'})
 
@@ -233,97 +251,24 @@ def RunTest():
 @app.route('/RunTest_Images')
 def list_RunTest_Images():
     """Lists the latest image from the system_test folder"""
-    try:
-        files = [f for f in os.listdir(TEST_INFERENCE_FOLDER) if f.endswith(".jpg")]
-        print("Files in system_test:", files)  # Debugging print
-
-        if not files:
-            return jsonify({"images": []})  # Return empty if no images exist
-
-        latest_image = sorted(files, reverse=True)[0]  # Get the latest image
-        image_url = f"/system_test/{latest_image}"  # Adjusted URL format
-        print("Serving image:", image_url)  # Debugging print
-        return jsonify({"images": [image_url]})
-    except Exception as e:
-        print("Error accessing system_test folder:", str(e))  # Debugging print
-        return jsonify({"error": str(e)})
+    with db.read() as conn:
+        items, _ = list_image_page(conn, TEST_INFERENCE_FOLDER, limit=1)
+    return jsonify({"images": [item["url"] for item in items]})
 
 @app.route('/system_test/<filename>')
 def get_RunTest_Images(filename):
     """Serves images from the system_test folder"""
-    return send_from_directory(TEST_INFERENCE_FOLDER, filename)
+    return send_image(TEST_INFERENCE_FOLDER, filename)
 
 @app.route('/RunTest_Capture', methods=['POST'])
 def RunTest_Capture():
     """Deletes old images, captures a new one, runs inference, and saves only the processed image."""
-    try:
-        GPIO.output(GPIO_PIN, GPIO.HIGH) #turn ON flash
-        # Step 1: Delete old images in system_test
-        files = [f for f in os.listdir(TEST_INFERENCE_FOLDER) if f.endswith(".jpg")]
-        for file in files:
-            os.remove(os.path.join(TEST_INFERENCE_FOLDER, file))
-        print("🗑️ Deleted old image(s) in system_test.")
-
-        # Step 2: Capture a new image
-        now = rtc.datetime
-        filename = f"RunTest_{now.tm_year}_{now.tm_mon:02d}_{now.tm_mday:02d}_{now.tm_hour:02d}_{now.tm_min:02d}.jpg"
-        image_path = os.path.join(TEST_INFERENCE_FOLDER, filename)
-
-        print(f"📸 Capturing new image: {image_path}...")
-        subprocess.run(["libcamera-still", "-o", image_path, "--width", "1920", "--height", "1080", "--timeout", "1"], check=True)
-        print("✅ Image captured and saved.")
-
-        # Step 3: Run inference on the captured image
-        output_filename = f"inferred_{filename}"
-        output_path = os.path.join(TEST_INFERENCE_FOLDER, output_filename)
-
-        print(f"🚀 Running inference on {image_path}...")
-        response = requests.post(
-            f"{API_URL}/{MODEL_ID}?api_key={API_KEY}",
-            files={"file": open(image_path, "rb")}
-        )
-
-        if response.status_code != 200:
-            print(f"❌ Error: Failed to process image - {response.text}")
-            return jsonify({"status": "Error", "error": "Inference failed"})
-
-        result = response.json()
-        predictions = result.get("predictions", [])
-        faa_count = len(predictions)
-        print(f"✅ Total FAA detected: {faa_count}")
-
-        image = cv2.imread(image_path)
-        for pred in predictions:
-            x, y, width, height = (
-                int(pred["x"]), int(pred["y"]), int(pred["width"]), int(pred["height"])
-            )
-            cv2.rectangle(image, (x - width // 2, y - height // 2), (x + width // 2, y + height // 2), (255, 0, 0), 2)
-            cv2.putText(image, f"FAA: {pred['confidence']:.2f}", (x - width // 2, y - height // 2 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-        timestamp = f"{rtc.datetime.tm_year}-{rtc.datetime.tm_mon:02d}-{rtc.datetime.tm_mday:02d} {'AM' if rtc.datetime.tm_hour < 12 else 'PM'}"
-        info_text = f"{timestamp} | FAA Count: {faa_count} | Temp: {rtc.temperature:.1f} degC"
-        cv2.putText(image, info_text, (10, image.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-        # Save the inferred image, replacing the original
-        cv2.imwrite(output_path, image)
-        print(f"✅ Inference result saved at {output_path}")
-
-        # Remove the original image (only keeping the inferred one)
-        os.remove(image_path)
-        global inference_type
-        inference_type = "manual"
-        log_data(f"{rtc.datetime.tm_year}-{rtc.datetime.tm_mon:02d}-{rtc.datetime.tm_mday:02d}_test_{rtc.datetime.tm_hour:02d}:{rtc.datetime.tm_min:02d}", faa_count, rtc.temperature)
-        GPIO.output(GPIO_PIN, GPIO.LOW) #turn OFF flash
-
-        return jsonify({"status": "Captured & Inferred", "image": f"/system_test/{output_filename}"})
-
-    except Exception as e:
-        print(f"❌ Capture or Inference Error: {e}")
-        return jsonify({"status": "Error", "error": str(e)})
+    return jsonify(worker.run_test())
 
 
 if __name__ == '__main__':
-    threading.Thread(target=schedule_capture, daemon=True).start()
+    import worker as capture_worker
+    capture_worker.start()
     print("🚀 Starting Flask server...")
-    print(f"schedule_capture status: {scheduled_capture_enable}")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # No reloader: it would start a second process, and with it a second worker
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
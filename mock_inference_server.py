@@ -0,0 +1,102 @@
+"""Local stand-in for the Roboflow hosted detection endpoint (POST /{MODEL_ID}?api_key=...)."""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+from image_utils import jpeg_size
+
+
+class MockInferenceHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        with self.server.lock:
+            self.server.requests_served += 1
+            self.server.bytes_received += length
+        # Upload time over the simulated link, then the model's own latency
+        time.sleep(self.server.latency + (length * 8 / self.server.bandwidth if self.server.bandwidth else 0))
+
+        if random.random() < self.server.failure_rate:
+            self.send_json(503, {"message": "Simulated upstream failure"})
+            return
+
+        path = self.path.split("?", 1)[0].lstrip("/")
+        if path != self.server.model_id:
+            self.send_json(404, {"message": f"Model {path} not found"})
+            return
+
+        # Like the real API, boxes are in the pixels of the uploaded image
+        start = body.find(b"\xff\xd8")
+        width, height = (jpeg_size(body[start:]) if start >= 0 else None) or (1920, 1080)
+        scale = width / 1920
+        predictions = []
+        for _ in range(self.server.num_predictions):
+            predictions.append({
+                "x": random.uniform(0, width),
+                "y": random.uniform(0, height),
+                "width": random.uniform(15, 40) * scale,
+                "height": random.uniform(15, 40) * scale,
+                "confidence": random.uniform(0.4, 0.99),
+                "class": "FAA",
+                "class_id": 0,
+            })
+        self.send_json(200, {
+            "time": self.server.latency,
+            "image": {"width": width, "height": height},
+            "predictions": predictions,
+        })
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(host="127.0.0.1", port=0, latency=0.2, num_predictions=10, failure_rate=0.0,
+                      model_id=config.MODEL_ID, bandwidth=0):
+    """Starts the mock server on a background thread. Returns the server and its base URL.
+
+    bandwidth (bits/s, 0 for unlimited) adds the time an upload of each request's size would take.
+    """
+    server = ThreadingHTTPServer((host, port), MockInferenceHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.num_predictions = num_predictions
+    server.failure_rate = failure_rate
+    server.bandwidth = bandwidth
+    server.model_id = model_id
+    server.lock = threading.Lock()
+    server.requests_served = 0
+    server.bytes_received = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the Roboflow detection API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated server-side latency in seconds")
+    parser.add_argument("--predictions", type=int, default=10, help="Number of boxes returned per image")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--bandwidth", type=float, default=0, help="Simulated uplink in Mbit/s (0 for unlimited)")
+    args = parser.parse_args()
+
+    server, url = start_mock_server(args.host, args.port, args.latency, args.predictions, args.failure_rate,
+                                    bandwidth=args.bandwidth * 1e6)
+    print(f"🧪 Mock inference server listening on {url}/{config.MODEL_ID}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
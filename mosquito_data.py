@@ -0,0 +1,153 @@
+"""Paginated and streaming reads of the MosquitoData log, and its time-series columns.
+
+captured_at holds the RTC wall-clock time as epoch seconds (the RTC keeps local time, so it is
+converted with calendar.timegm and never shifted by a timezone). capture_type is "scheduled"
+or "manual".
+"""
+import base64
+import calendar
+import csv
+import io
+import json
+import re
+from datetime import date, datetime, timedelta
+
+MAX_PAGE_SIZE = 500
+CSV_CHUNK_ROWS = 500
+
+# Scheduled captures are logged as "2025-02-23 AM"; these are the times schedule_capture fires at
+SCHEDULED_ROW = re.compile(r"^(\d{4}-\d{2}-\d{2}) (AM|PM)$")
+SCHEDULED_HOURS = {"AM": 7, "PM": 20}
+# RunTest captures are logged as "2025-02-23_test_14:05"
+MANUAL_ROW = re.compile(r"^(\d{4}-\d{2}-\d{2})_test_(\d{2}):(\d{2})$")
+
+
+def wall_clock_epoch(struct_time):
+    """RTC wall-clock time (a time.struct_time) as epoch seconds."""
+    return calendar.timegm(struct_time)
+
+
+def date_epoch(day):
+    """Epoch seconds of midnight at the start of a date."""
+    return calendar.timegm(day.timetuple())
+
+
+def parse_legacy_datetime(text):
+    """Recovers (captured_at, capture_type) from a free-form datetime value written by log_data."""
+    match = SCHEDULED_ROW.match(text)
+    if match:
+        day = datetime.strptime(match[1], "%Y-%m-%d")
+        return date_epoch(day) + SCHEDULED_HOURS[match[2]] * 3600, "scheduled"
+    match = MANUAL_ROW.match(text)
+    if match:
+        day = datetime.strptime(match[1], "%Y-%m-%d")
+        return date_epoch(day) + int(match[2]) * 3600 + int(match[3]) * 60, "manual"
+    try:
+        # Anything else that at least starts with a date is placed at midnight of that day
+        return date_epoch(datetime.strptime(text[:10], "%Y-%m-%d")), None
+    except ValueError:
+        return 0, None
+
+
+def add_captured_at(conn):
+    """Migration: adds the indexed epoch timestamp and capture type, and backfills legacy rows."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(MosquitoData);")}
+    if "captured_at" not in columns:
+        conn.execute("ALTER TABLE MosquitoData ADD COLUMN captured_at INTEGER;")
+    if "capture_type" not in columns:
+        conn.execute("ALTER TABLE MosquitoData ADD COLUMN capture_type TEXT;")
+    rows = conn.execute("SELECT id, datetime FROM MosquitoData WHERE captured_at IS NULL;").fetchall()
+    updates = [(*parse_legacy_datetime(text), row_id) for row_id, text in rows]
+    conn.executemany("UPDATE MosquitoData SET captured_at = ?, capture_type = ? WHERE id = ?;", updates)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mosquito_data_captured_at ON MosquitoData (captured_at);")
+    unparsed = sum(1 for _, capture_type, _ in updates if capture_type is None)
+    print(f"🕒 Backfilled captured_at for {len(updates)} row(s), {unparsed} with an unrecognised datetime")
+
+
+def add_capture_source(conn):
+    """Migration: adds the capture file a row was counted from, unique so a re-run inference job logs it once."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(MosquitoData);")}
+    if "source" not in columns:
+        conn.execute("ALTER TABLE MosquitoData ADD COLUMN source TEXT;")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_mosquito_data_source ON MosquitoData (source) WHERE source IS NOT NULL;")
+
+
+def encode_cursor(row_key):
+    return base64.urlsafe_b64encode(json.dumps(row_key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        row_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(row_key, list) or len(row_key) != 2:
+        raise ValueError("Invalid cursor")
+    return row_key
+
+
+def date_filter(date_from=None, date_to=None):
+    """SQL clauses for an inclusive YYYY-MM-DD date range on captured_at."""
+    clauses, params = [], []
+    if date_from:
+        clauses.append("captured_at >= ?")
+        params.append(date_epoch(date.fromisoformat(date_from)))
+    if date_to:
+        clauses.append("captured_at < ?")
+        params.append(date_epoch(date.fromisoformat(date_to) + timedelta(days=1)))
+    return clauses, params
+
+
+def fetch_page(conn, limit=50, cursor=None, date_from=None, date_to=None):
+    """Returns one page of rows, newest first, and the cursor of the next page (None on the last page).
+
+    Pages are keyed on (captured_at, id) rather than OFFSET, so every page is an index range scan.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    clauses, params = date_filter(date_from, date_to)
+    if cursor:
+        last_captured_at, last_id = decode_cursor(cursor)
+        clauses.append("(captured_at < ? OR (captured_at = ? AND id < ?))")
+        params += [last_captured_at, last_captured_at, last_id]
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(
+        f"SELECT id, captured_at, datetime, faa_count, temperature, capture_type, new_arrivals FROM MosquitoData {where} "
+        f"ORDER BY captured_at DESC, id DESC LIMIT ?;", params + [limit + 1]).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][1], rows[-1][0]])
+    return [{"datetime": r[2], "captured_at": r[1], "faa_count": r[3], "temperature": r[4], "capture_type": r[5],
+             "new_arrivals": r[6]} for r in rows], next_cursor
+
+
+def stream_csv(database, date_from=None, date_to=None):
+    """Returns a generator of the CSV export in chunks straight from the database cursor, in constant memory.
+
+    The dates are checked here, before anything is sent: a bad one raises ValueError to the caller
+    instead of cutting the download short.
+    """
+    clauses, params = date_filter(date_from, date_to)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    def chunks():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Date and Time', 'Temperature', 'FAA Count', 'New Arrivals'])
+        with database.read() as conn:
+            cursor = conn.execute(
+                f"SELECT datetime, temperature, faa_count, new_arrivals FROM MosquitoData {where} ORDER BY captured_at DESC, id DESC;",
+                params)
+            while True:
+                rows = cursor.fetchmany(CSV_CHUNK_ROWS)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # Header of an empty export
+
+    return chunks()
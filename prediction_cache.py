@@ -0,0 +1,145 @@
+"""Content-addressed cache of raw detector output, keyed by image SHA-256 and model.
+
+Payloads are stored as zlib-compressed JSON in a small SQLite file. The cache is bounded in
+bytes and evicts the least recently used entries first, so it can live on the SD card.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+import config
+from image_utils import read_image_bytes
+
+
+def image_digest(image):
+    """SHA-256 of the encoded image bytes (or of the raw pixels for a decoded array)."""
+    if isinstance(image, np.ndarray):
+        return hashlib.sha256(np.ascontiguousarray(image).tobytes()).hexdigest()
+    return hashlib.sha256(read_image_bytes(image)).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, path=config.PREDICTION_CACHE_PATH, max_bytes=config.PREDICTION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS PredictionCache (
+                digest TEXT NOT NULL,
+                model_id TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (digest, model_id)
+            );
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_prediction_cache_last_access ON PredictionCache (last_access);")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest, model_id):
+        """Returns the cached detector result, or None on a miss."""
+        with self.lock:
+            row = self.conn.execute("SELECT payload FROM PredictionCache WHERE digest = ? AND model_id = ?;",
+                                    (digest, model_id)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE PredictionCache SET last_access = ? WHERE digest = ? AND model_id = ?;",
+                              (time.time(), digest, model_id))
+            self.conn.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, digest, model_id, result):
+        payload = zlib.compress(json.dumps(result, separators=(",", ":")).encode(), 9)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO PredictionCache (digest, model_id, payload, size, last_access) "
+                              "VALUES (?, ?, ?, ?, ?);", (digest, model_id, payload, len(payload), time.time()))
+            self.evict()
+            self.conn.commit()
+
+    def total_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM PredictionCache;").fetchone()[0]
+
+    def evict(self):
+        """Drops least recently used entries until the cache fits in max_bytes. Caller holds the lock.
+
+        Runs in put()'s write transaction, so the size it sums already includes every other process's
+        entries and none can be added until it commits.
+        """
+        excess = self.total_bytes() - self.max_bytes
+        while excess > 0:
+            rows = self.conn.execute("SELECT digest, model_id, size FROM PredictionCache "
+                                     "ORDER BY last_access LIMIT 64;").fetchall()
+            if not rows:
+                break
+            for digest, model_id, size in rows:
+                self.conn.execute("DELETE FROM PredictionCache WHERE digest = ? AND model_id = ?;", (digest, model_id))
+                excess -= size
+                if excess <= 0:
+                    break
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM PredictionCache;").fetchone()[0]
+            return {"entries": entries, "bytes": self.total_bytes(), "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+class CachedDetector:
+    """Wraps a detector so results for an image it has already seen come from the cache."""
+
+    def __init__(self, detector, cache):
+        self.detector = detector
+        self.cache = cache
+        self.name = detector.name
+        # Results depend on the model (its version or file contents) and on how it was run (upload
+        # resize, thresholds, tiling); the wrapped detector's fingerprint covers all of them
+        self.fingerprint = self.model_id = detector.fingerprint
+
+    def lookup(self, image):
+        """Returns cached predictions for an image without running the detector, or None."""
+        return self.cache.get(image_digest(image), self.model_id)
+
+    def detect(self, image):
+        if not isinstance(image, np.ndarray):
+            image = read_image_bytes(image)  # Read once for both hashing and detection
+        digest = image_digest(image)
+        result = self.cache.get(digest, self.model_id)
+        if result is not None:
+            return result
+        result = self.detector.detect(image)
+        self.cache.put(digest, self.model_id, result)
+        return result
+
+    def detect_batch(self, images):
+        """Serves hits from the cache and sends only the misses to the wrapped detector, as one batch."""
+        images = [image if isinstance(image, np.ndarray) else read_image_bytes(image) for image in images]
+        digests = [image_digest(image) for image in images]
+        results = [self.cache.get(digest, self.model_id) for digest in digests]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            for i, result in zip(misses, self.detector.detect_batch([images[i] for i in misses])):
+                self.cache.put(digests[i], self.model_id, result)
+                results[i] = result
+        return results
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide prediction cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PredictionCache()
+        return _cache
@@ -0,0 +1,220 @@
+"""Prefilter for scheduled captures: trap-ROI cropping and a frame difference against the previous capture.
+
+Consecutive captures of the same sticky board differ only where new insects landed. Each capture
+is cropped to the trap region, reduced to a small blurred greyscale frame and compared with the
+previous one. An unchanged board reuses the previous predictions, a few changed blobs send only
+padded crops around them to the detector, and a large change (new board, lighting) runs the
+whole trap region. Predictions are always returned in full-frame coordinates.
+"""
+import argparse
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import config
+from detector import get_detector
+from image_utils import load_image
+from prediction_cache import CachedDetector, image_digest
+from tiling import merge_tile_predictions
+
+
+def parse_roi(text):
+    """Parses "x,y,width,height" into a tuple, or None for an empty string (the whole frame)."""
+    if not text.strip():
+        return None
+    roi = tuple(int(v) for v in text.split(","))
+    if len(roi) != 4 or roi[2] <= 0 or roi[3] <= 0:
+        raise ValueError(f"Invalid TRAP_ROI '{text}', expected 'x,y,width,height'")
+    return roi
+
+
+def crop_roi(image, roi):
+    """The trap region of image (a view, not a copy) and its (x, y) origin in the frame."""
+    if roi is None:
+        return image, (0, 0)
+    height, width = image.shape[:2]
+    x, y = min(max(roi[0], 0), width - 1), min(max(roi[1], 0), height - 1)
+    return image[y:min(y + roi[3], height), x:min(x + roi[2], width)], (x, y)
+
+
+def reference_frame(image, scale=config.PREFILTER_SCALE):
+    """Small blurred greyscale copy of image with its mean removed, so a global brightness shift cancels out."""
+    grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(grey, (max(grey.shape[1] // scale, 1), max(grey.shape[0] // scale, 1)), interpolation=cv2.INTER_AREA)
+    small = cv2.GaussianBlur(small, (5, 5), 0).astype(np.int16)
+    return small - int(small.mean())
+
+
+def merge_boxes(boxes):
+    """Unions overlapping x1/y1/x2/y2 boxes until none overlap."""
+    boxes = [list(box) for box in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(len(boxes) - 1, i, -1):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+    return [tuple(box) for box in boxes]
+
+
+def changed_regions(previous, current, width, height, scale=config.PREFILTER_SCALE,
+                    threshold=config.PREFILTER_DIFF_THRESHOLD, min_area=config.PREFILTER_MIN_AREA,
+                    padding=config.PREFILTER_PADDING, min_region=config.PREFILTER_MIN_REGION):
+    """Boxes (x1, y1, x2, y2 in width x height pixels) around every blob that differs between two reference frames.
+
+    Returns the boxes and the fraction of the frame that changed.
+    """
+    mask = (np.abs(current - previous) > threshold).astype(np.uint8)
+    mask = cv2.dilate(mask, np.ones((3, 3), np.uint8))  # Joins the fragments of one insect
+    _, _, blobs, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    boxes = []
+    for x, y, w, h, area in blobs[1:]:
+        if area < min_area:
+            continue
+        # Back to full resolution, padded for context and grown to the smallest useful crop
+        cx, cy = (x + w / 2) * scale, (y + h / 2) * scale
+        half_w = max(w * scale / 2 + padding, min_region / 2)
+        half_h = max(h * scale / 2 + padding, min_region / 2)
+        boxes.append((int(max(cx - half_w, 0)), int(max(cy - half_h, 0)),
+                      int(min(cx + half_w, width)), int(min(cy + half_h, height))))
+    return merge_boxes(boxes), float(mask.mean())
+
+
+class FramePrefilter:
+    """Runs a detector on scheduled captures through the ROI crop and the previous-capture difference."""
+
+    def __init__(self, detector=None, roi=config.TRAP_ROI, max_changed_fraction=config.PREFILTER_MAX_CHANGED_FRACTION,
+                 full_every=config.PREFILTER_FULL_EVERY, iou_threshold=config.IOU_THRESHOLD):
+        self._detector = detector
+        self.roi = parse_roi(roi) if isinstance(roi, str) else roi
+        self.max_changed_fraction = max_changed_fraction
+        self.full_every = full_every
+        self.iou_threshold = iou_threshold
+        self.lock = threading.Lock()
+        self.previous = None  # (reference frame, predictions) of the last capture
+        self.since_full = 0
+        self.counts = {"reused": 0, "regions": 0, "full": 0}
+        self.pixels_sent = 0
+        self.pixels_total = 0
+
+    @property
+    def detector(self):
+        if self._detector is None:
+            self._detector = get_detector()
+        return self._detector
+
+    def plan(self, reference, width, height):
+        """Chooses "reused", "regions" or "full" for a capture. Returns it, the regions and the previous predictions."""
+        with self.lock:
+            previous, since_full = self.previous, self.since_full
+        if previous is None or previous[0].shape != reference.shape or since_full + 1 >= self.full_every:
+            return "full", [], None
+        regions, changed = changed_regions(previous[0], reference, width, height)
+        if not regions:
+            return "reused", [], previous[1]
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if changed > self.max_changed_fraction or area > self.max_changed_fraction * width * height:
+            return "full", [], None
+        return "regions", regions, previous[1]
+
+    def detect(self, image):
+        start = time.perf_counter()
+        frame = load_image(image)
+        trap, (ox, oy) = crop_roi(frame, self.roi)
+        height, width = trap.shape[:2]
+        reference = reference_frame(trap)
+        mode, regions, previous = self.plan(reference, width, height)
+
+        if mode == "full":
+            # Without an ROI the original encoded bytes are sent as they are, rather than re-encoded
+            result = self.detector.detect(image if self.roi is None else trap)
+            predictions = merge_tile_predictions([result], [(ox, oy)], self.iou_threshold)
+            sent = width * height
+        elif mode == "reused":
+            predictions = previous
+            sent = 0
+        else:
+            # Boxes from the previous capture stay unless they fall in a changed region, where they are re-detected
+            kept = [p for p in previous if not any(
+                x1 <= p["x"] - ox < x2 and y1 <= p["y"] - oy < y2 for x1, y1, x2, y2 in regions)]
+            results = self.detector.detect_batch([trap[y1:y2, x1:x2] for x1, y1, x2, y2 in regions])
+            predictions = merge_tile_predictions([{"predictions": kept}] + results,
+                                                 [(0, 0)] + [(ox + x1, oy + y1) for x1, y1, _, _ in regions],
+                                                 self.iou_threshold)
+            sent = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+
+        with self.lock:
+            self.previous = (reference, predictions)
+            self.since_full = 0 if mode == "full" else self.since_full + 1
+            self.counts[mode] += 1
+            self.pixels_sent += sent
+            self.pixels_total += width * height
+        result = {
+            "time": time.perf_counter() - start,
+            "image": {"width": frame.shape[1], "height": frame.shape[0]},
+            "prefilter": {"mode": mode, "regions": len(regions), "sent_fraction": round(sent / (width * height), 4)},
+            "predictions": predictions,
+        }
+        if isinstance(self.detector, CachedDetector) and not isinstance(image, np.ndarray):
+            # Kept apart from the detector's own results: it depends on the previous capture, so a
+            # backfill or re-score must not take it for a full detection of this image
+            self.detector.cache.put(image_digest(image), self.cache_id(), result)
+        return result
+
+    def cache_id(self):
+        return f"{self.detector.model_id}:prefilter"
+
+    def lookup(self, image):
+        """The prefilter's cached result for a capture it handled (what was counted), or None."""
+        if not isinstance(self.detector, CachedDetector):
+            return None
+        return self.detector.cache.get(image_digest(image), self.cache_id())
+
+    def summary(self):
+        with self.lock:
+            return {**self.counts, "sent_fraction": round(self.pixels_sent / self.pixels_total, 4) if self.pixels_total else None}
+
+
+_prefilter = None
+_prefilter_lock = threading.Lock()
+
+
+def get_prefilter():
+    """Returns the process-wide prefilter in front of the configured detector."""
+    global _prefilter
+    with _prefilter_lock:
+        if _prefilter is None:
+            _prefilter = FramePrefilter()
+        return _prefilter
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show what the prefilter would send to the detector for a pair of captures.")
+    parser.add_argument("previous", help="Earlier capture of the board")
+    parser.add_argument("current", help="Later capture of the same board")
+    parser.add_argument("--roi", default=config.TRAP_ROI, help="Trap region 'x,y,width,height' (default TRAP_ROI)")
+    parser.add_argument("--output", default="prefilter_regions.jpg", help="Where to draw the ROI and changed regions")
+    args = parser.parse_args()
+
+    roi = parse_roi(args.roi)
+    previous, current = load_image(args.previous), load_image(args.current)
+    trap, (ox, oy) = crop_roi(current, roi)
+    height, width = trap.shape[:2]
+    start = time.perf_counter()
+    regions, changed = changed_regions(reference_frame(crop_roi(previous, roi)[0]), reference_frame(trap), width, height)
+    elapsed = time.perf_counter() - start
+    area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+    print(f"🔍 {changed:.2%} of the board changed, {len(regions)} region(s) covering {area / (width * height):.1%} "
+          f"of it ({elapsed * 1000:.0f} ms)")
+
+    cv2.rectangle(current, (ox, oy), (ox + width, oy + height), (0, 255, 255), 3)
+    for x1, y1, x2, y2 in regions:
+        cv2.rectangle(current, (ox + x1, oy + y1), (ox + x2, oy + y2), (0, 0, 255), 2)
+    cv2.imwrite(args.output, current)
+    print(f"✅ Regions drawn on {args.output}")
@@ -0,0 +1,218 @@
+"""Daily, weekly and monthly rollups of the MosquitoData log.
+
+Each bucket keeps sufficient statistics (row count, sums, sums of squares, min/max and the
+temperature x count cross term) of the rows captured inside it, so means, standard deviations
+and the temperature-count correlation of any date range come from a handful of bucket rows
+instead of a scan of the raw table. Rows are folded in by log_data inside the same write
+transaction as the insert. Only rows with both a count and a temperature are rolled up.
+
+Weeks start on Monday; all buckets are in the RTC wall-clock time of captured_at.
+"""
+import math
+from datetime import date, datetime, timedelta, timezone
+
+from mosquito_data import date_epoch
+
+DAY = 86400
+PERIODS = ("day", "week", "month")
+
+CREATE_ROLLUPS_TABLE = '''
+CREATE TABLE IF NOT EXISTS MosquitoRollups (
+    period TEXT NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    sum_count REAL NOT NULL,
+    sum_count_sq REAL NOT NULL,
+    min_count REAL NOT NULL,
+    max_count REAL NOT NULL,
+    sum_temp REAL NOT NULL,
+    sum_temp_sq REAL NOT NULL,
+    min_temp REAL NOT NULL,
+    max_temp REAL NOT NULL,
+    sum_temp_count REAL NOT NULL,
+    PRIMARY KEY (period, bucket_start)
+) WITHOUT ROWID;
+'''
+
+# The bucket a captured_at falls in, as SQL (for rebuilds) and Python (for single rows)
+BUCKET_SQL = {
+    "day": "captured_at - captured_at % 86400",
+    "week": "captured_at - captured_at % 86400 - ((captured_at / 86400 + 3) % 7) * 86400",  # 1970-01-01 was a Thursday
+    "month": "CAST(strftime('%s', captured_at, 'unixepoch', 'start of month') AS INTEGER)",
+}
+AGGREGATES_SQL = ("COUNT(*), SUM(faa_count), SUM(faa_count * faa_count), MIN(faa_count), MAX(faa_count), "
+                  "SUM(temperature), SUM(temperature * temperature), MIN(temperature), MAX(temperature), "
+                  "SUM(temperature * faa_count)")
+ROLLED_UP = "faa_count IS NOT NULL AND temperature IS NOT NULL"
+
+
+def create_tables(conn):
+    conn.execute(CREATE_ROLLUPS_TABLE)
+
+
+def bucket_bounds(period, captured_at):
+    """(start, end) epoch seconds of the period bucket containing captured_at."""
+    day = captured_at - captured_at % DAY
+    if period == "day":
+        return day, day + DAY
+    if period == "week":
+        start = day - ((day // DAY + 3) % 7) * DAY
+        return start, start + 7 * DAY
+    first = datetime.fromtimestamp(day, timezone.utc).date().replace(day=1)
+    next_month = (first + timedelta(days=32)).replace(day=1)
+    return date_epoch(first), date_epoch(next_month)
+
+
+def add_row(cursor, captured_at, faa_count, temperature):
+    """Folds one new MosquitoData row into its day, week and month buckets. Runs in the caller's transaction."""
+    if faa_count is None or temperature is None:
+        return
+    values = (faa_count, faa_count * faa_count, faa_count, faa_count,
+              temperature, temperature * temperature, temperature, temperature, temperature * faa_count)
+    cursor.executemany('''
+        INSERT INTO MosquitoRollups VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (period, bucket_start) DO UPDATE SET
+            n = n + 1,
+            sum_count = sum_count + excluded.sum_count,
+            sum_count_sq = sum_count_sq + excluded.sum_count_sq,
+            min_count = MIN(min_count, excluded.min_count),
+            max_count = MAX(max_count, excluded.max_count),
+            sum_temp = sum_temp + excluded.sum_temp,
+            sum_temp_sq = sum_temp_sq + excluded.sum_temp_sq,
+            min_temp = MIN(min_temp, excluded.min_temp),
+            max_temp = MAX(max_temp, excluded.max_temp),
+            sum_temp_count = sum_temp_count + excluded.sum_temp_count;
+    ''', [(period, bucket_bounds(period, captured_at)[0], *values) for period in PERIODS])
+
+
+def refresh_buckets(cursor, captured_at_values):
+    """Recomputes the buckets containing the given capture times from the raw rows.
+
+    For changes that cannot be applied incrementally, such as a count being overwritten (min/max
+    cannot be un-applied). Each bucket is an index range scan over its own rows only.
+    """
+    buckets = {(period, *bucket_bounds(period, t)) for t in captured_at_values for period in PERIODS}
+    for period, start, end in buckets:
+        cursor.execute("DELETE FROM MosquitoRollups WHERE period = ? AND bucket_start = ?;", (period, start))
+        cursor.execute(f"INSERT INTO MosquitoRollups SELECT ?, ?, {AGGREGATES_SQL} FROM MosquitoData "
+                       f"WHERE captured_at >= ? AND captured_at < ? AND {ROLLED_UP} HAVING COUNT(*) > 0;",
+                       (period, start, start, end))
+
+
+def rebuild(cursor):
+    """Recomputes every bucket from MosquitoData. Returns the number of buckets written."""
+    cursor.execute("DELETE FROM MosquitoRollups;")
+    for period in PERIODS:
+        cursor.execute(f"INSERT INTO MosquitoRollups SELECT '{period}', {BUCKET_SQL[period]} AS bucket, {AGGREGATES_SQL} "
+                       f"FROM MosquitoData WHERE {ROLLED_UP} GROUP BY bucket;")
+    return cursor.execute("SELECT COUNT(*) FROM MosquitoRollups;").fetchone()[0]
+
+
+def delete_all(cursor):
+    cursor.execute("DELETE FROM MosquitoRollups;")
+
+
+def create_rollups(conn):
+    """Migration: creates the rollup table and fills it from the existing rows."""
+    create_tables(conn)
+    print(f"📊 Built {rebuild(conn.cursor())} rollup bucket(s)")
+
+
+def cover(start, end):
+    """Splits [start, end) (midnight-aligned) into the fewest month, week and day buckets, greedily.
+
+    A week is not used when it straddles a month boundary whose whole month is in range, so the
+    larger bucket is not missed.
+    """
+    buckets = []
+    t = start
+    while t < end:
+        month_start, month_end = bucket_bounds("month", t)
+        week_start, week_end = bucket_bounds("week", t)
+        next_month_fits = month_end < week_end and bucket_bounds("month", month_end)[1] <= end
+        if t == month_start and month_end <= end:
+            buckets.append(("month", t))
+            t = month_end
+        elif t == week_start and week_end <= end and not next_month_fits:
+            buckets.append(("week", t))
+            t = week_end
+        else:
+            buckets.append(("day", t))
+            t += DAY
+    return buckets
+
+
+def summarize(n, sum_count, sum_count_sq, min_count, max_count, sum_temp, sum_temp_sq, min_temp, max_temp,
+              sum_temp_count):
+    """Means, standard deviations and correlation from combined bucket statistics."""
+    if not n:
+        return {"n": 0, "count": None, "temperature": None, "correlation": None}
+    var_count = max(sum_count_sq / n - (sum_count / n) ** 2, 0.0)
+    var_temp = max(sum_temp_sq / n - (sum_temp / n) ** 2, 0.0)
+    covariance = sum_temp_count / n - (sum_temp / n) * (sum_count / n)
+    correlation = covariance / math.sqrt(var_count * var_temp) if var_count > 0 and var_temp > 0 else None
+    return {
+        "n": n,
+        "count": {"sum": sum_count, "mean": round(sum_count / n, 3), "std": round(math.sqrt(var_count), 3),
+                  "min": min_count, "max": max_count},
+        "temperature": {"mean": round(sum_temp / n, 3), "std": round(math.sqrt(var_temp), 3),
+                        "min": min_temp, "max": max_temp},
+        "correlation": round(correlation, 4) if correlation is not None else None,
+    }
+
+
+def date_range(date_from=None, date_to=None, conn=None):
+    """[start, end) epoch seconds of an inclusive YYYY-MM-DD range; open ends extend to the stored data."""
+    if date_from:
+        start = date_epoch(date.fromisoformat(date_from))
+    else:
+        start = conn.execute("SELECT MIN(bucket_start) FROM MosquitoRollups WHERE period = 'month';").fetchone()[0] or 0
+    if date_to:
+        end = date_epoch(date.fromisoformat(date_to) + timedelta(days=1))
+    else:
+        last = conn.execute("SELECT MAX(bucket_start) FROM MosquitoRollups WHERE period = 'day';").fetchone()[0]
+        end = last + DAY if last is not None else start
+    return start, end
+
+
+def range_stats(conn, date_from=None, date_to=None):
+    """Aggregate statistics of an inclusive date range, combined from rollup buckets."""
+    start, end = date_range(date_from, date_to, conn)
+    buckets = cover(start, end)
+    stats = [0, 0.0, 0.0, None, None, 0.0, 0.0, None, None, 0.0]
+    for period in PERIODS:
+        starts = [t for p, t in buckets if p == period]
+        for i in range(0, len(starts), 500):  # Stay under SQLite's bound-parameter limit
+            chunk = starts[i:i + 500]
+            rows = conn.execute(
+                f"SELECT n, sum_count, sum_count_sq, min_count, max_count, sum_temp, sum_temp_sq, min_temp, max_temp, "
+                f"sum_temp_count FROM MosquitoRollups WHERE period = ? AND bucket_start IN ({', '.join('?' * len(chunk))});",
+                [period, *chunk]).fetchall()
+            for row in rows:
+                for j in (0, 1, 2, 5, 6, 9):
+                    stats[j] += row[j]
+                for j in (3, 7):
+                    stats[j] = row[j] if stats[j] is None else min(stats[j], row[j])
+                for j in (4, 8):
+                    stats[j] = row[j] if stats[j] is None else max(stats[j], row[j])
+    return {"from": date_from, "to": date_to, "buckets": len(buckets), **summarize(*stats)}
+
+
+def series(conn, period, date_from=None, date_to=None):
+    """Per-bucket statistics (e.g. daily mean count, weekly max) for a date range, oldest first."""
+    start, end = date_range(date_from, date_to, conn)
+    rows = conn.execute(
+        "SELECT bucket_start, n, sum_count, sum_count_sq, min_count, max_count, sum_temp, sum_temp_sq, min_temp, "
+        "max_temp, sum_temp_count FROM MosquitoRollups WHERE period = ? AND bucket_start >= ? AND bucket_start < ? "
+        "ORDER BY bucket_start;", (period, bucket_bounds(period, start)[0], end)).fetchall()
+    return [{"start": datetime.fromtimestamp(row[0], timezone.utc).strftime("%Y-%m-%d"), **summarize(*row[1:])} for row in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+    from db import Database
+
+    parser = argparse.ArgumentParser(description="Rebuild the MosquitoData rollup tables from the raw rows.")
+    parser.parse_args()
+
+    print(f"📊 Rebuilt {Database().write(rebuild).result()} rollup bucket(s)")
@@ -0,0 +1,208 @@
+"""Capture scheduler driven by cron-style schedules.
+
+A schedule is five cron fields (minute hour day-of-month month day-of-week; "*", lists, ranges
+and "/step") optionally followed by "xN" to take a burst of N shots, e.g. "0 7 * * *" or
+"30 5 * * 1-5 x3". CAPTURE_SCHEDULE holds any number of them separated by ";".
+
+The scheduler sleeps until the next fire time instead of polling the clock. It keeps the time of
+the last window it handled for every schedule in the database, so after a reboot (or a stalled
+clock) it captures once for a window it missed, as long as the window is less than
+SCHEDULER_CATCHUP_WINDOW old. All times are RTC wall-clock epoch seconds.
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+
+import config
+from mosquito_data import date_epoch
+
+CREATE_SCHEDULER_STATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS SchedulerState (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+ENABLED_KEY = "enabled"
+SEARCH_DAYS = 366 * 8  # Long enough to find Feb 29 schedules
+
+
+def create_tables(conn):
+    conn.execute(CREATE_SCHEDULER_STATE_TABLE)
+
+
+def parse_field(text, low, high):
+    values = set()
+    for part in text.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = map(int, part.split("-"))
+        else:
+            start = end = int(part)
+            if step:
+                end = high
+        if start < low or end > high or start > end:
+            raise ValueError(f"'{text}' is out of range {low}-{high}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return sorted(values)
+
+
+class Schedule:
+    def __init__(self, spec):
+        fields = spec.split()
+        burst = 1
+        if len(fields) == 6 and fields[5].startswith("x"):
+            burst = int(fields.pop()[1:])
+        if len(fields) != 5 or burst < 1:
+            raise ValueError(f"Invalid schedule '{spec}', expected 'minute hour day month weekday [xN]'")
+        self.spec = spec
+        self.burst = burst
+        self.minutes = parse_field(fields[0], 0, 59)
+        self.hours = parse_field(fields[1], 0, 23)
+        self.days = parse_field(fields[2], 1, 31)
+        self.months = parse_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in parse_field(fields[4], 0, 7)}  # 0 and 7 are both Sunday
+        # As in cron, a restricted day-of-month and day-of-week match when either does
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+        self.times = [hour * 3600 + minute * 60 for hour in self.hours for minute in self.minutes]
+
+    def matches_day(self, day):
+        if day.month not in self.months:
+            return False
+        day_ok, weekday_ok = day.day in self.days, (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, t):
+        """First fire time strictly after t, or None."""
+        day = datetime.fromtimestamp(t, timezone.utc).date()
+        for _ in range(SEARCH_DAYS):
+            if self.matches_day(day):
+                midnight = date_epoch(day)
+                for offset in self.times:
+                    if midnight + offset > t:
+                        return midnight + offset
+            day += timedelta(days=1)
+        return None
+
+    def previous(self, t):
+        """Last fire time at or before t, or None."""
+        day = datetime.fromtimestamp(t, timezone.utc).date()
+        for _ in range(SEARCH_DAYS):
+            if self.matches_day(day):
+                midnight = date_epoch(day)
+                for offset in reversed(self.times):
+                    if midnight + offset <= t:
+                        return midnight + offset
+            day -= timedelta(days=1)
+        return None
+
+
+def parse_schedules(text):
+    return [Schedule(spec.strip()) for spec in text.split(";") if spec.strip()]
+
+
+class CaptureScheduler:
+    """Calls fire(schedule) for every due capture window; fire takes the schedule's burst of shots."""
+
+    def __init__(self, fire, clock, database, schedules=config.CAPTURE_SCHEDULE,
+                 catchup_window=config.SCHEDULER_CATCHUP_WINDOW, max_sleep=config.SCHEDULER_MAX_SLEEP,
+                 retry=config.SCHEDULER_RETRY_SECONDS):
+        self.fire = fire
+        self.clock = clock  # Returns the current RTC wall-clock time in epoch seconds
+        self.database = database
+        self.schedules = parse_schedules(schedules) if isinstance(schedules, str) else schedules
+        self.catchup_window = catchup_window
+        self.max_sleep = max_sleep
+        self.retry = retry
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        with database.read() as conn:
+            state = dict(conn.execute("SELECT key, value FROM SchedulerState;").fetchall())
+        self.enabled = bool(state.get(ENABLED_KEY, 1))
+        self.last_fire = {s.spec: state.get(s.spec) for s in self.schedules}
+
+    def save(self, key, value):
+        self.database.execute("INSERT INTO SchedulerState (key, value) VALUES (?, ?) "
+                              "ON CONFLICT (key) DO UPDATE SET value = excluded.value;", (key, value))
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+        self.save(ENABLED_KEY, int(self.enabled))
+        self.wakeup.set()
+        print(f"⏰ Scheduled capture {'enabled' if self.enabled else 'disabled'}")
+
+    def run_due(self, now):
+        """Handles every window that came due since it was last handled. Returns how many were captured."""
+        captured = 0
+        for schedule in self.schedules:
+            due = schedule.previous(now)
+            last = self.last_fire[schedule.spec]
+            if due is None or (last is not None and due <= last):
+                continue
+            # A schedule never seen before starts from now rather than catching up on the past
+            if last is not None and self.enabled:
+                late = now - due
+                if late <= self.catchup_window:
+                    if late > 60:
+                        print(f"⏰ Catching up on the missed {schedule.spec} window from {late / 60:.0f} min ago")
+                    self.capture(schedule)
+                    captured += 1
+                else:
+                    print(f"⏭️ Skipping the {schedule.spec} window, {late / 3600:.1f} h is past the catch-up window")
+            self.last_fire[schedule.spec] = due
+            self.save(schedule.spec, due)
+        return captured
+
+    def capture(self, schedule):
+        try:
+            self.fire(schedule)
+        except Exception as e:
+            print(f"❌ Scheduled capture failed: {e}")
+
+    def next_fire(self, now=None):
+        """Epoch seconds of the next capture window, or None when disabled."""
+        if not self.enabled:
+            return None
+        now = self.clock() if now is None else now
+        times = [t for t in (s.next_after(now) for s in self.schedules) if t is not None]
+        return min(times) if times else None
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                now = self.clock()
+                self.run_due(now)
+            except Exception as e:  # An I2C error reading the RTC, or the database; the next window must still fire
+                print(f"❌ Scheduler check failed: {e}, retrying in {self.retry:g}s")
+                self.stopping.wait(self.retry)
+                continue
+            upcoming = [t for t in (s.next_after(now) for s in self.schedules) if t is not None]
+            # Sleeps are capped so the wall clock is re-read regularly (RTC and monotonic clock can drift)
+            sleep = min(min(upcoming) - now, self.max_sleep) if upcoming else self.max_sleep
+            self.wakeup.wait(max(sleep, 0.05))
+            self.wakeup.clear()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="capture-scheduler", daemon=True)
+            self.thread.start()
+            print(f"⏰ Capture schedules: {'; '.join(s.spec for s in self.schedules)} "
+                  f"({'enabled' if self.enabled else 'disabled'})")
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def status(self):
+        now = self.clock()
+        next_fire = self.next_fire(now)
+        return {
+            "enabled": self.enabled,
+            "next_fire": next_fire,
+            "schedules": [{"spec": s.spec, "burst": s.burst, "next_fire": s.next_after(now),
+                           "last_fire": self.last_fire[s.spec]} for s in self.schedules],
+        }
@@ -0,0 +1,90 @@
+"""Background sampling of the DS3231 clock and temperature.
+
+One thread reads the RTC over I2C every SENSOR_POLL_INTERVAL seconds and publishes the result as
+an immutable snapshot; readers just take the current snapshot (a single attribute read, so no
+lock is needed) and never touch the bus. The clock is advanced from the monotonic clock between
+samples, so timestamps keep ticking even when the poll interval is long.
+"""
+import calendar
+import threading
+import time
+from typing import NamedTuple
+
+import config
+from inference_client import LatencyStats
+
+
+class SensorReading(NamedTuple):
+    datetime: time.struct_time  # RTC wall-clock time, same form as adafruit_ds3231's datetime
+    temperature: float
+    age: float  # Seconds since the RTC was actually read
+
+
+class Sample(NamedTuple):
+    epoch: int
+    temperature: float
+    monotonic: float
+
+
+class SensorService:
+    def __init__(self, rtc, interval=config.SENSOR_POLL_INTERVAL):
+        self.rtc = rtc
+        self.interval = interval
+        self.snapshot = None
+        self.stats = LatencyStats()
+        self.last_error = None
+        self.sample_lock = threading.Lock()  # Only serialises bus access, never taken by readers
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        """Reads the clock and temperature once and publishes them. Returns False on an I2C error."""
+        with self.sample_lock:
+            start = time.perf_counter()
+            try:
+                now = self.rtc.datetime
+                temperature = self.rtc.temperature
+            except Exception as e:  # OSError on a bus error; drivers raise other types too
+                self.stats.record(time.perf_counter() - start, False, 0)
+                self.last_error = str(e)
+                print(f"❌ RTC read failed: {e}")
+                return False
+            self.stats.record(time.perf_counter() - start, True, 0)
+            self.snapshot = Sample(calendar.timegm(now), temperature, time.monotonic())
+            return True
+
+    def read(self):
+        """The latest reading, as one consistent clock + temperature pair."""
+        snapshot = self.snapshot
+        # Without the sampling thread (e.g. a one-off script), sample on demand once the reading is stale
+        if snapshot is None or (self.thread is None and time.monotonic() - snapshot.monotonic >= self.interval):
+            if not self.sample() and snapshot is None:
+                raise RuntimeError(f"RTC unavailable: {self.last_error}")
+            snapshot = self.snapshot
+        age = time.monotonic() - snapshot.monotonic
+        return SensorReading(time.gmtime(snapshot.epoch + int(age)), snapshot.temperature, age)
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.sample()
+            self.stopping.wait(self.interval)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="sensor-service", daemon=True)
+            self.thread.start()
+            print(f"🌡️ Sampling the RTC every {self.interval:g}s")
+
+    def stop(self):
+        self.stopping.set()
+
+    def summary(self):
+        """I2C read counts, errors and latency percentiles, and the age of the current reading."""
+        summary = self.stats.summary()
+        del summary["retries"]
+        summary["reads"] = summary.pop("calls")
+        summary["i2c_errors"] = summary.pop("failures")
+        snapshot = self.snapshot
+        summary["last_error"] = self.last_error
+        summary["age_s"] = round(time.monotonic() - snapshot.monotonic, 1) if snapshot else None
+        return summary
@@ -1,32 +1,7 @@
-import sqlite3
+from db import Database
 
-# Define the path to your database
-database_path = 'FAA_DB.db'
-
-# Connect to SQLite Database
-conn = sqlite3.connect(database_path)
-
-# Create a cursor object using the cursor() method
-cursor = conn.cursor()
-
-# SQL command to create a table
-sql_command = '''
-CREATE TABLE IF NOT EXISTS MosquitoData (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    datetime TEXT NOT NULL,
-    faa_count INTEGER,
-    temperature REAL
-);
-'''
-
-# Execute the SQL command to create the table
-cursor.execute(sql_command)
-
-# Commit the changes to the database
-conn.commit()
-
-# Close the database connection
-conn.close()
+# Bring FAA_DB.db up to the latest schema (safe to run on an existing database)
+database = Database()
 
 # Print a success message
-print("Database and table created successfully")
+print("Database and tables are up to date")
@@ -10,32 +10,64 @@ const galleries = {
     }
 };
 
+// The page's single connection to the server's event stream, opened by the first listener.
+let eventSource = null;
+
+// Calls handler with the data of every server event of the given type; returns false without EventSource support.
+function onServerEvent(type, handler) {
+    if (!window.EventSource) {
+        return false;
+    }
+    if (!eventSource) {
+        eventSource = new EventSource("/events");  // Reconnects on its own if the connection drops
+    }
+    eventSource.addEventListener(type, event => handler(JSON.parse(event.data)));
+    return true;
+}
+
+// Shows a sensor snapshot on the home page.
+function showData(data) {
+    let splitDateTime = data.time.split(" ");
+    document.getElementById("time").textContent = splitDateTime[1];
+    document.getElementById("date").textContent = splitDateTime[0];
+    document.getElementById("temperature").textContent = data.temperature.toFixed(2);
+
+    // The server computes the next window from the configured capture schedules
+    let nextCapture = data.next_capture ? data.next_capture : "Scheduled capture disabled";
+    document.getElementById("next-capture").textContent = nextCapture;
+}
+
 // Updates the display data on the home page.
 function updateData() {
     fetch("/data")
         .then(response => response.json())
-        .then(data => {
-            let splitDateTime = data.time.split(" ");
-            document.getElementById("time").textContent = splitDateTime[1];
-            document.getElementById("date").textContent = splitDateTime[0];
-            document.getElementById("temperature").textContent = data.temperature.toFixed(2);
-
-            let currentHour = parseInt(splitDateTime[1].split(":")[0]);
-            let nextCapture = currentHour >= 20 ? "07:00 AM (Tomorrow)" :
-                              currentHour >= 7 ? "08:00 PM" : "07:00 AM";
-            document.getElementById("next-capture").textContent = nextCapture;
-        })
+        .then(showData)
         .catch(error => console.error("Error fetching data:", error));
 }
 
+// Keeps the home page up to date from the server's sensor events, or by polling where EventSource is missing.
+function watchData() {
+    updateData();
+    if (!onServerEvent("sensor", showData)) {
+        setInterval(updateData, 2000);
+    }
+}
+
 // Loads images from the server for a specified gallery.
-function loadImages(apiEndpoint, galleryId) {
-    fetch(apiEndpoint)
+function loadImages(apiEndpoint, galleryId, cursor = null) {
+    // Pages come newest first; later pages are appended when the viewer steps past the last loaded image
+    const url = cursor ? apiEndpoint + "?cursor=" + encodeURIComponent(cursor) : apiEndpoint;
+    return fetch(url)
         .then(response => response.json())
         .then(data => {
-            if (data.images && data.images.length > 0) {
-                galleries[galleryId].images = data.images;
-                galleries[galleryId].currentIndex = 0;  // Resets index when images are loaded
+            const galleryInfo = galleries[galleryId];
+            galleryInfo.endpoint = apiEndpoint;
+            galleryInfo.nextCursor = data.next_cursor || null;
+            if (cursor) {
+                galleryInfo.images = galleryInfo.images.concat(data.images || []);
+            } else if (data.images && data.images.length > 0) {
+                galleryInfo.images = data.images;
+                galleryInfo.currentIndex = 0;  // Resets index when images are loaded
                 displayImage(galleryId);
             } else {
                 console.error("No images found at:", apiEndpoint);
@@ -44,16 +76,44 @@ function loadImages(apiEndpoint, galleryId) {
         .catch(error => console.error("Error fetching images from", apiEndpoint, ":", error));
 }
 
+// Puts a newly saved image at the front of a gallery, without moving a viewer who has stepped back to older images.
+function addImage(galleryId, url) {
+    const galleryInfo = galleries[galleryId];
+    if (galleryInfo.images.includes(url)) {
+        return;
+    }
+    galleryInfo.images.unshift(url);
+    if (galleryInfo.currentIndex > 0) {
+        galleryInfo.currentIndex += 1;  // Still the same image
+    } else {
+        displayImage(galleryId);
+    }
+}
+
+// Adds images saved in a folder to a gallery as the server announces them.
+function watchImages(galleryId, folder) {
+    onServerEvent("image", data => {
+        if (data.folder === folder) {
+            addImage(galleryId, data.url);
+        }
+    });
+}
+
 // Displays the current image in a specified gallery.
 function displayImage(galleryId) {
     const gallery = document.getElementById(galleryId);
     const galleryInfo = galleries[galleryId];
     gallery.innerHTML = "";  // Clears the current content
     if (galleryInfo.images.length > 0) {
+        // Shows the lightweight preview tier; clicking opens the full-resolution image
+        let link = document.createElement("a");
+        link.href = galleryInfo.images[galleryInfo.currentIndex];
+        link.target = "_blank";
         let img = document.createElement("img");
-        img.src = galleryInfo.images[galleryInfo.currentIndex];
+        img.src = galleryInfo.images[galleryInfo.currentIndex] + "?size=preview";
         img.classList.add("active");
-        gallery.appendChild(img);
+        link.appendChild(img);
+        gallery.appendChild(link);
 
         let filename = document.createElement("p");
         filename.textContent = "Filename: " + galleryInfo.images[galleryInfo.currentIndex].split('/').pop();
@@ -66,6 +126,13 @@ function displayImage(galleryId) {
 // Changes the displayed image in a specified gallery based on direction.
 function changeImage(direction, galleryId) {
     const galleryInfo = galleries[galleryId];
+    if (direction > 0 && galleryInfo.currentIndex === galleryInfo.images.length - 1 && galleryInfo.nextCursor) {
+        loadImages(galleryInfo.endpoint, galleryId, galleryInfo.nextCursor).then(() => {
+            galleryInfo.currentIndex = Math.min(galleryInfo.currentIndex + 1, galleryInfo.images.length - 1);
+            displayImage(galleryId);
+        });
+        return;
+    }
     galleryInfo.currentIndex = (galleryInfo.currentIndex + direction + galleryInfo.images.length) % galleryInfo.images.length;
     displayImage(galleryId);
 }
@@ -98,33 +165,45 @@ function clearDatabase() {
 
 // Initiates the download of the data log as a CSV file.
 function downloadCSV() {
-    window.location.href = '/download-data'; // Navigates to download data endpoint
+    window.location.href = '/download-data' + window.location.search; // Navigates to download data endpoint, keeping the date filter
 }
 
 
+// Shows the latest test image on the RunTest page.
+function showRunTestImage(url) {
+    const gallery = document.getElementById('RunTest');
+    gallery.innerHTML = "";
+
+    if (url) {
+        let img = document.createElement("img");
+        img.src = url;
+        img.classList.add("active");
+        gallery.appendChild(img);
+
+        let filename = document.createElement("p");
+        filename.textContent = "Filename: " + url.split('/').pop();
+        gallery.appendChild(filename);
+    } else {
+        gallery.textContent = "No image available";
+    }
+}
+
 document.addEventListener("DOMContentLoaded", function() {
     if (document.getElementById("RunTest")) {
         fetch('/RunTest_Images')
             .then(response => response.json())
             .then(data => {
                 console.log("Received image data:", data);
-                const gallery = document.getElementById('RunTest');
-                gallery.innerHTML = "";
-
-                if (data.images.length > 0) {
-                    let img = document.createElement("img");
-                    img.src = data.images[0];
-                    img.classList.add("active");
-                    gallery.appendChild(img);
-
-                    let filename = document.createElement("p");
-                    filename.textContent = "Filename: " + data.images[0].split('/').pop();
-                    gallery.appendChild(filename);
-                } else {
-                    gallery.textContent = "No image available";
-                }
+                showRunTestImage(data.images[0]);
             })
             .catch(error => console.error("Error fetching RunTest image:", error));
+
+        // A test run from another open page shows up here too
+        onServerEvent("image", data => {
+            if (data.folder === "system_test") {
+                showRunTestImage(data.url);
+            }
+        });
     }
 });
 
@@ -140,11 +219,10 @@ function performInference() {
         .then(data => {
             if (data.status === "Captured & Inferred") {
                 console.log("✅ Image captured and inference completed!");
-                showNotification("✅ Image captured & processed! Reloading...");
-
-                setTimeout(() => {
-                    location.reload();  // Refresh the page to display the updated image
-                }, 2000);
+                showNotification("✅ Image captured & processed!");
+                showRunTestImage(data.image);
+                button.disabled = false;
+                button.textContent = "PERFORM INFERENCE";
             } else {
                 console.error("❌ Error:", data.error);
                 showNotification("❌ Error capturing or processing image!", "error");
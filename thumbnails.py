@@ -0,0 +1,81 @@
+"""Downscaled JPEG tiers of captured and annotated images, cached on disk.
+
+A tier is generated the first time it is requested and kept under THUMBNAIL_CACHE_DIR, mirroring
+the source folder. It is regenerated whenever the source file is newer than the cached copy.
+JPEG decoding is done at a reduced scale (libjpeg's DCT scaling) when the tier is small enough,
+so a thumbnail never pays for decoding the full 1920x1080 frame.
+"""
+import os
+import tempfile
+
+import cv2
+
+import config
+from annotate import encode_jpeg
+
+# Tier name -> maximum width in pixels
+TIERS = {"thumb": 320, "preview": 960}
+REDUCED_READS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+
+
+def tier_path(source_path, size):
+    folder = os.path.basename(os.path.dirname(os.path.abspath(source_path)))
+    return os.path.join(config.THUMBNAIL_CACHE_DIR, size, folder, os.path.basename(source_path))
+
+
+def load_scaled(source_path, width):
+    """Decodes source_path at the smallest libjpeg scale that is still at least width pixels wide."""
+    # A 1/8 scale decode is almost free and tells us the full width
+    image = cv2.imread(source_path, cv2.IMREAD_REDUCED_COLOR_8)
+    if image is None:
+        raise ValueError(f"Unable to decode {source_path}")
+    full_width = image.shape[1] * 8
+    for factor, flag in REDUCED_READS:
+        if full_width // factor >= width:
+            return image if factor == 8 else cv2.imread(source_path, flag)
+    return cv2.imread(source_path, cv2.IMREAD_COLOR)
+
+
+def render_tier(source_path, size):
+    """Returns the encoded JPEG of one tier of source_path."""
+    width = TIERS[size]
+    image = load_scaled(source_path, width)
+    if image.shape[1] > width:
+        height = round(image.shape[0] * width / image.shape[1])
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    return encode_jpeg(image, config.THUMBNAIL_JPEG_QUALITY)
+
+
+def get_tier(source_path, size):
+    """Path of the cached tier of source_path, generating it first if it is missing or stale."""
+    path = tier_path(source_path, size)
+    try:
+        if os.stat(path).st_mtime_ns >= os.stat(source_path).st_mtime_ns:
+            return path
+    except FileNotFoundError:
+        pass
+    data = render_tier(source_path, size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written under a temporary name and renamed, so concurrent requests never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-generate every thumbnail tier of the images in some folders.")
+    parser.add_argument("folders", nargs="*", default=["captured_images", "inference_output"])
+    args = parser.parse_args()
+
+    generated = 0
+    for folder in args.folders:
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith(".jpg"):
+                for size in TIERS:
+                    get_tier(os.path.join(folder, filename), size)
+                    generated += 1
+    print(f"🖼️ {generated} thumbnail(s) up to date in {config.THUMBNAIL_CACHE_DIR}")
@@ -0,0 +1,113 @@
+"""Sliced inference: runs the detector over overlapping tiles of a full-resolution capture."""
+import argparse
+import time
+import numpy as np
+
+import config
+from detector import non_max_suppression, predictions_to_arrays
+from image_utils import load_image
+
+
+def tile_offsets(length, tile_size, overlap):
+    """Start offsets along one axis so tiles of tile_size cover length with at least overlap between them."""
+    if length <= tile_size:
+        return [0]
+    stride = max(tile_size - overlap, 1)
+    offsets = list(range(0, length - tile_size, stride))
+    offsets.append(length - tile_size)  # Last tile is aligned to the frame edge
+    return offsets
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """Returns (x, y) origins of every tile covering a width x height frame."""
+    return [(x, y) for y in tile_offsets(height, tile_size, overlap) for x in tile_offsets(width, tile_size, overlap)]
+
+
+def merge_tile_predictions(tile_results, origins, iou_threshold):
+    """Shifts per-tile predictions into frame coordinates and removes duplicates across tile seams."""
+    all_boxes, all_scores, all_names = [], [], []
+    for result, (x, y) in zip(tile_results, origins):
+        boxes, scores, names = predictions_to_arrays(result.get("predictions", []))
+        all_boxes.append(boxes + np.array([x, y, x, y], dtype=np.float32))
+        all_scores.append(scores)
+        all_names.append(names)
+    boxes = np.concatenate(all_boxes)
+    scores = np.concatenate(all_scores)
+    names = np.concatenate(all_names)
+    if len(boxes) == 0:
+        return []
+
+    class_names, class_ids = np.unique(names, return_inverse=True)
+    keep = non_max_suppression(boxes, scores, iou_threshold, class_ids)
+    boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    sizes = boxes[:, 2:] - boxes[:, :2]
+    return [
+        {
+            "x": float(cx), "y": float(cy), "width": float(w), "height": float(h),
+            "confidence": float(score), "class": str(class_names[class_id]),
+        }
+        for (cx, cy), (w, h), score, class_id in zip(centers, sizes, scores, class_ids)
+    ]
+
+
+class TiledDetector:
+    """Wraps a detector so each frame is split into overlapping tiles that are detected in batches."""
+
+    def __init__(self, detector, tile_size=config.TILE_SIZE, overlap=config.TILE_OVERLAP,
+                 batch_size=config.TILE_BATCH_SIZE, iou_threshold=config.IOU_THRESHOLD):
+        if overlap >= tile_size:
+            raise ValueError("Tile overlap must be smaller than the tile size")
+        self.detector = detector
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.iou_threshold = iou_threshold
+        self.name = f"{detector.name}+tiled{tile_size}"
+        self.fingerprint = f"{detector.fingerprint}+tiled{tile_size}o{overlap}iou{iou_threshold}"
+
+    def detect(self, image):
+        image = load_image(image)
+        height, width = image.shape[:2]
+        origins = tile_grid(width, height, self.tile_size, self.overlap)
+        start = time.perf_counter()
+
+        tile_results = []
+        for i in range(0, len(origins), self.batch_size):
+            batch = [image[y:y + self.tile_size, x:x + self.tile_size] for x, y in origins[i:i + self.batch_size]]
+            tile_results.extend(self.detector.detect_batch(batch))
+
+        return {
+            "time": time.perf_counter() - start,
+            "image": {"width": width, "height": height},
+            "tiles": len(origins),
+            "predictions": merge_tile_predictions(tile_results, origins, self.iou_threshold),
+        }
+
+    def detect_batch(self, images):
+        return [self.detect(image) for image in images]
+
+
+if __name__ == "__main__":
+    from detector import DETECTOR_BACKENDS
+
+    parser = argparse.ArgumentParser(description="Sweep tile sizes to trade recall for seconds per capture.")
+    parser.add_argument("image", help="Full-resolution capture to run sliced inference on")
+    parser.add_argument("--tile-sizes", type=int, nargs="+", default=[320, 480, 640, 960])
+    parser.add_argument("--overlap", type=int, default=config.TILE_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=config.TILE_BATCH_SIZE)
+    parser.add_argument("--backend", default=config.DETECTOR_BACKEND, choices=sorted(DETECTOR_BACKENDS))
+    args = parser.parse_args()
+
+    frame = load_image(args.image)
+    detector = DETECTOR_BACKENDS[args.backend]()
+    start = time.perf_counter()
+    baseline = detector.detect(frame)
+    print(f"{'full frame':>12}: {1:3d} tiles | {time.perf_counter() - start:6.2f} s | "
+          f"{len(baseline['predictions'])} boxes")
+    for tile_size in args.tile_sizes:
+        tiled = TiledDetector(detector, tile_size, min(args.overlap, tile_size // 2), args.batch_size)
+        start = time.perf_counter()
+        result = tiled.detect(frame)
+        print(f"{f'tile {tile_size}':>12}: {result['tiles']:3d} tiles | {time.perf_counter() - start:6.2f} s | "
+              f"{len(result['predictions'])} boxes")
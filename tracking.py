@@ -0,0 +1,267 @@
+"""Cross-capture matching of detections, so each capture counts the insects that newly arrived on the board.
+
+A sticky board keeps every insect it catches, so faa_count is the board's running total. Each
+board keeps a track per insect it has seen (its latest box). A scheduled capture's boxes are
+paired one-to-one with the board's tracks by centre distance (within TRACK_MATCH_RADIUS pixels);
+the boxes left unpaired are new arrivals and start new tracks, and their number is stored as
+MosquitoData.new_arrivals. Starting a new board (after the sticky board is replaced) begins with
+no tracks.
+
+Candidate pairs come from a KD-tree over the track centres, and the assignment is solved with
+linear_sum_assignment separately for each group of boxes and tracks that compete for each other,
+so matching stays fast as a board collects thousands of tracks.
+"""
+import itertools
+import threading
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components, min_weight_full_bipartite_matching
+from scipy.spatial import cKDTree
+
+import config
+
+CREATE_BOARDS_TABLE = '''
+CREATE TABLE IF NOT EXISTS Boards (
+    id INTEGER PRIMARY KEY,
+    started_at INTEGER NOT NULL
+);
+'''
+CREATE_BOARD_TRACKS_TABLE = '''
+CREATE TABLE IF NOT EXISTS BoardTracks (
+    id INTEGER PRIMARY KEY,
+    board_id INTEGER NOT NULL REFERENCES Boards (id) ON DELETE CASCADE,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    width REAL NOT NULL,
+    height REAL NOT NULL,
+    first_seen_at INTEGER NOT NULL,
+    last_seen_at INTEGER NOT NULL,
+    hits INTEGER NOT NULL
+);
+'''
+CREATE_BOARD_TRACKS_INDEX = "CREATE INDEX IF NOT EXISTS idx_board_tracks_board_id ON BoardTracks (board_id);"
+DENSE_GROUP_LIMIT = 500  # Larger groups (a densely packed board) are assigned on a sparse cost matrix
+
+
+def create_board_tracks(conn):
+    """Migration: adds the board and track tables and MosquitoData.new_arrivals (NULL until computed)."""
+    conn.execute(CREATE_BOARDS_TABLE)
+    conn.execute(CREATE_BOARD_TRACKS_TABLE)
+    conn.execute(CREATE_BOARD_TRACKS_INDEX)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(MosquitoData);")}
+    if "new_arrivals" not in columns:
+        conn.execute("ALTER TABLE MosquitoData ADD COLUMN new_arrivals INTEGER;")
+
+
+def match_boxes(track_xy, box_xy, radius):
+    """Pairs boxes with tracks one-to-one, minimising the total centre distance, pairs at most radius apart.
+
+    Returns (box indices, track indices).
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if len(track_xy) == 0 or len(box_xy) == 0:
+        return empty, empty
+    neighbours = cKDTree(track_xy).query_ball_point(box_xy, r=radius)
+    boxes = np.repeat(np.arange(len(box_xy)), [len(n) for n in neighbours])
+    if len(boxes) == 0:
+        return empty, empty
+    tracks = np.fromiter(itertools.chain.from_iterable(neighbours), dtype=np.int64, count=len(boxes))
+    distances = np.linalg.norm(box_xy[boxes] - track_xy[tracks], axis=1)
+
+    # Boxes and tracks only compete within a connected group of candidate pairs, so each group is solved on its own
+    candidates, local = np.unique(tracks, return_inverse=True)
+    nodes = len(box_xy) + len(candidates)
+    graph = coo_matrix((np.ones(len(boxes)), (boxes, len(box_xy) + local)), shape=(nodes, nodes))
+    _, labels = connected_components(graph, directed=False)
+    groups = labels[boxes]
+    order = np.argsort(groups, kind="stable")
+    bounds = np.flatnonzero(np.diff(groups[order])) + 1
+
+    matched_boxes, matched_tracks = [], []
+    for pairs in np.split(order, bounds):
+        if len(pairs) == 1:  # One candidate pair: nothing to assign
+            matched_boxes.append(boxes[pairs])
+            matched_tracks.append(tracks[pairs])
+            continue
+        group_boxes, rows = np.unique(boxes[pairs], return_inverse=True)
+        group_tracks, cols = np.unique(tracks[pairs], return_inverse=True)
+        if max(len(group_boxes), len(group_tracks)) > DENSE_GROUP_LIMIT:
+            r, c = sparse_assignment(rows, cols, distances[pairs], len(group_boxes), len(group_tracks), radius)
+        else:
+            cost = np.full((len(group_boxes), len(group_tracks)), radius * 1e3)  # Pairs that are not candidates
+            cost[rows, cols] = distances[pairs]
+            r, c = linear_sum_assignment(cost)
+            feasible = cost[r, c] <= radius
+            r, c = r[feasible], c[feasible]
+        matched_boxes.append(group_boxes[r])
+        matched_tracks.append(group_tracks[c])
+    return np.concatenate(matched_boxes), np.concatenate(matched_tracks)
+
+
+def sparse_assignment(rows, cols, distances, num_boxes, num_tracks, radius):
+    """Minimum-distance assignment over candidate pairs only, for groups too large for a dense cost matrix.
+
+    Every box also gets a private "unmatched" column costing radius, so a full matching always exists.
+    Costs are offset by 1 so zero distances are not dropped from the sparse matrix.
+    """
+    boxes = np.arange(num_boxes)
+    cost = csr_matrix((np.concatenate([distances + 1, np.full(num_boxes, radius + 1)]),
+                       (np.concatenate([rows, boxes]), np.concatenate([cols, num_tracks + boxes]))),
+                      shape=(num_boxes, num_tracks + num_boxes))
+    r, c = min_weight_full_bipartite_matching(cost)
+    real = c < num_tracks
+    return r[real], c[real]
+
+
+def boxes_array(predictions):
+    """(N, 4) x, y, width, height of a predictions list."""
+    if not predictions:
+        return np.empty((0, 4))
+    return np.array([[p["x"], p["y"], p["width"], p["height"]] for p in predictions], dtype=np.float64)
+
+
+class BoardTracker:
+    """The current board's tracks, kept in memory and in BoardTracks.
+
+    update() runs inside the database writer transaction, so captures are matched one at a time in
+    the order they are written.
+    """
+
+    def __init__(self, database, radius=config.TRACK_MATCH_RADIUS):
+        self.database = database
+        self.radius = radius
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """(Re)reads the current board and its tracks from the database."""
+        with self.database.read() as conn:
+            board = conn.execute("SELECT id, started_at FROM Boards ORDER BY id DESC LIMIT 1;").fetchone()
+            rows = conn.execute("SELECT id, x, y FROM BoardTracks WHERE board_id = ? ORDER BY id;",
+                                (board[0] if board else None,)).fetchall()
+        with self.lock:
+            self.board = board
+            self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+            self.xy = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 2)
+
+    def start_board(self, cursor, started_at):
+        """Begins a new, empty board. Runs in the caller's transaction."""
+        board_id = cursor.execute("INSERT INTO Boards (started_at) VALUES (?);", (started_at,)).lastrowid
+        with self.lock:
+            self.board = (board_id, started_at)
+            self.ids = np.empty(0, dtype=np.int64)
+            self.xy = np.empty((0, 2))
+        return board_id
+
+    def reset(self, started_at):
+        """Starts a new board, e.g. after the sticky board was replaced. Returns its id."""
+        return self.database.write(self.start_board, started_at).result()
+
+    def update(self, cursor, captured_at, predictions):
+        """Matches one capture's boxes against the board and stores the result. Returns the number of new arrivals."""
+        if self.board is None:
+            self.start_board(cursor, captured_at)
+        boxes = boxes_array(predictions)
+        with self.lock:
+            matched, tracks = match_boxes(self.xy, boxes[:, :2], self.radius)
+            new = np.setdiff1d(np.arange(len(boxes)), matched)
+
+            # Tracks follow the latest box, so a slowly shifting camera does not turn old insects into new ones
+            cursor.executemany(
+                "UPDATE BoardTracks SET x = ?, y = ?, width = ?, height = ?, last_seen_at = ?, hits = hits + 1 WHERE id = ?;",
+                [(*boxes[i].tolist(), captured_at, int(self.ids[t])) for i, t in zip(matched, tracks)])
+            first_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM BoardTracks;").fetchone()[0]
+            new_ids = np.arange(first_id, first_id + len(new), dtype=np.int64)
+            cursor.executemany(
+                "INSERT INTO BoardTracks (id, board_id, x, y, width, height, first_seen_at, last_seen_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1);",
+                [(int(track_id), self.board[0], *boxes[i].tolist(), captured_at, captured_at) for track_id, i in zip(new_ids, new)])
+
+            self.xy[tracks] = boxes[matched, :2]
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.xy = np.concatenate([self.xy, boxes[new, :2]])
+        return len(new)
+
+    def status(self):
+        with self.lock:
+            board, tracks = self.board, len(self.ids)
+        return {"board_id": board[0] if board else None, "started_at": board[1] if board else None, "tracks": tracks}
+
+
+def delete_all(cursor):
+    cursor.execute("DELETE FROM BoardTracks;")
+    cursor.execute("DELETE FROM Boards;")
+
+
+def rebuild(cursor, radius=config.TRACK_MATCH_RADIUS):
+    """Replays every scheduled capture's stored detections, in capture order, to recompute tracks and new arrivals.
+
+    Captures before the first board's start belong to the first board; those logged before boxes were stored
+    stay NULL. Returns the number of captures replayed.
+    """
+    cursor.execute("DELETE FROM BoardTracks;")
+    boards = cursor.execute("SELECT id, started_at FROM Boards ORDER BY started_at, id;").fetchall()
+    captures = cursor.execute("SELECT id, captured_at, faa_count FROM MosquitoData WHERE capture_type = 'scheduled' "
+                              "ORDER BY captured_at, id;").fetchall()
+    if not captures:
+        return 0
+    if not boards:
+        boards = [(cursor.execute("INSERT INTO Boards (started_at) VALUES (?);", (captures[0][1],)).lastrowid, captures[0][1])]
+    detections = {}
+    for capture_id, x, y, width, height in cursor.execute(
+            "SELECT capture_id, x, y, width, height FROM Detections d JOIN MosquitoData m ON m.id = d.capture_id "
+            "WHERE m.capture_type = 'scheduled' ORDER BY d.id;"):
+        detections.setdefault(capture_id, []).append((x, y, width, height))
+
+    tracks, arrivals = [], []  # Rows for BoardTracks, (new_arrivals, capture id) for MosquitoData
+    board = 0
+    rows, xy = [], np.empty((0, 2))
+    for capture_id, captured_at, faa_count in captures:
+        if capture_id not in detections and faa_count:
+            arrivals.append((None, capture_id))  # Logged before boxes were stored: unknown
+            continue
+        while board + 1 < len(boards) and captured_at >= boards[board + 1][1]:
+            board += 1
+            tracks += rows
+            rows, xy = [], np.empty((0, 2))
+        boxes = np.array(detections.get(capture_id, []), dtype=np.float64).reshape(-1, 4)
+        matched, matched_tracks = match_boxes(xy, boxes[:, :2], radius)
+        for i, t in zip(matched, matched_tracks):
+            rows[t][1:5] = boxes[i].tolist()
+            rows[t][6] = captured_at
+            rows[t][7] += 1
+        new = np.setdiff1d(np.arange(len(boxes)), matched)
+        rows += [[boards[board][0], *boxes[i].tolist(), captured_at, captured_at, 1] for i in new]
+        xy[matched_tracks] = boxes[matched, :2]
+        xy = np.concatenate([xy, boxes[new, :2]])
+        arrivals.append((len(new), capture_id))
+    tracks += rows
+
+    cursor.executemany("INSERT INTO BoardTracks (board_id, x, y, width, height, first_seen_at, last_seen_at, hits) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?);", tracks)
+    cursor.executemany("UPDATE MosquitoData SET new_arrivals = ? WHERE id = ?;", arrivals)
+    return len(captures)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from db import Database
+
+    parser = argparse.ArgumentParser(description="Recompute board tracks and new-arrival counts from the stored detections.")
+    parser.add_argument("--benchmark", type=int, metavar="TRACKS",
+                        help="Instead, time matching a capture against a synthetic board of this many tracks")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        rng = np.random.default_rng(0)
+        track_xy = rng.uniform([0, 0], [1920, 1080], size=(args.benchmark, 2))
+        box_xy = np.concatenate([track_xy + rng.normal(0, 3, track_xy.shape), rng.uniform([0, 0], [1920, 1080], (50, 2))])
+        start = time.perf_counter()
+        matched, _ = match_boxes(track_xy, box_xy, config.TRACK_MATCH_RADIUS)
+        print(f"⏱️ Matched {len(box_xy)} boxes against {args.benchmark} tracks in {(time.perf_counter() - start) * 1000:.1f} ms, "
+              f"{len(box_xy) - len(matched)} new")
+    else:
+        print(f"🪰 Replayed {Database().write(rebuild).result()} scheduled capture(s)")
@@ -2,6 +2,33 @@
 interface DataResponse {
     time: string;
     temperature: number;
+    next_capture: string | null;
+}
+
+import { onServerEvent } from "./serverEvents";
+
+// Shows a sensor snapshot on the home page
+export function showData(data: DataResponse): void {
+    // Get elements safely
+    const timeElement = document.getElementById("time");
+    const dateElement = document.getElementById("date");
+    const temperatureElement = document.getElementById("temperature");
+    const nextCaptureElement = document.getElementById("next-capture");
+
+    if (!timeElement || !dateElement || !temperatureElement || !nextCaptureElement) {
+        console.error("❌ One or more elements not found in the DOM");
+        return;
+    }
+
+    let [date, time] = data.time.split(" ");
+    timeElement.textContent = time;
+    dateElement.textContent = date;
+    temperatureElement.textContent = data.temperature.toFixed(2);
+
+    // The server computes the next window from the configured capture schedules
+    let nextCapture: string = data.next_capture ? data.next_capture : "Scheduled capture disabled";
+
+    nextCaptureElement.textContent = nextCapture;
 }
 
 // Updates the display data on the home page
@@ -15,28 +42,7 @@ export function updateData(): void {
         })
         .then((data: DataResponse) => {
             console.log("✅ Data received:", data);
-
-            // Get elements safely
-            const timeElement = document.getElementById("time");
-            const dateElement = document.getElementById("date");
-            const temperatureElement = document.getElementById("temperature");
-            const nextCaptureElement = document.getElementById("next-capture");
-
-            if (!timeElement || !dateElement || !temperatureElement || !nextCaptureElement) {
-                console.error("❌ One or more elements not found in the DOM");
-                return;
-            }
-
-            let [date, time] = data.time.split(" ");
-            timeElement.textContent = time;
-            dateElement.textContent = date;
-            temperatureElement.textContent = data.temperature.toFixed(2);
-
-            let currentHour: number = parseInt(time.split(":")[0], 10);
-            let nextCapture: string = currentHour >= 20 ? "07:00 AM (Tomorrow)" :
-                                      currentHour >= 7 ? "08:00 PM" : "07:00 AM";
-
-            nextCaptureElement.textContent = nextCapture;
+            showData(data);
         })
         .catch(error => {
             console.error("❌ Error fetching data:", error);
@@ -44,5 +50,13 @@ export function updateData(): void {
         });
 }
 
-// Ensure updateData runs on page load
-document.addEventListener("DOMContentLoaded", updateData);
+// Keeps the home page up to date from the server's sensor events, or by polling where EventSource is missing
+export function watchData(): void {
+    updateData();
+    if (!onServerEvent<DataResponse>("sensor", showData)) {
+        setInterval(updateData, 2000);
+    }
+}
+
+// Ensure the data is shown and kept current from page load
+document.addEventListener("DOMContentLoaded", watchData);
@@ -1,7 +1,11 @@
 // imageGallery.ts
+import { onServerEvent } from "./serverEvents";
+
 interface Gallery {
     images: string[];
     currentIndex: number;
+    endpoint?: string;
+    nextCursor?: string | null;
 }
 
 const galleries: Record<string, Gallery> = {
@@ -10,13 +14,20 @@ const galleries: Record<string, Gallery> = {
 };
 
 // Loads images from the server for a specified gallery
-export function loadImages(apiEndpoint: string, galleryId: string): void {
-    fetch(apiEndpoint)
+export function loadImages(apiEndpoint: string, galleryId: string, cursor: string | null = null): Promise<void> {
+    // Pages come newest first; later pages are appended when the viewer steps past the last loaded image
+    const url: string = cursor ? apiEndpoint + "?cursor=" + encodeURIComponent(cursor) : apiEndpoint;
+    return fetch(url)
         .then(response => response.json())
-        .then((data: { images: string[] }) => {
-            if (data.images && data.images.length > 0) {
-                galleries[galleryId].images = data.images;
-                galleries[galleryId].currentIndex = 0; // Reset index when new images are loaded
+        .then((data: { images: string[]; next_cursor: string | null }) => {
+            const galleryInfo: Gallery = galleries[galleryId];
+            galleryInfo.endpoint = apiEndpoint;
+            galleryInfo.nextCursor = data.next_cursor || null;
+            if (cursor) {
+                galleryInfo.images = galleryInfo.images.concat(data.images || []);
+            } else if (data.images && data.images.length > 0) {
+                galleryInfo.images = data.images;
+                galleryInfo.currentIndex = 0; // Reset index when new images are loaded
                 displayImage(galleryId);
             } else {
                 console.error("❌ No images found at:", apiEndpoint);
@@ -25,6 +36,29 @@ export function loadImages(apiEndpoint: string, galleryId: string): void {
         .catch(error => console.error("❌ Error fetching images from", apiEndpoint, ":", error));
 }
 
+// Puts a newly saved image at the front of a gallery, without moving a viewer who has stepped back to older images
+export function addImage(galleryId: string, url: string): void {
+    const galleryInfo: Gallery = galleries[galleryId];
+    if (galleryInfo.images.includes(url)) {
+        return;
+    }
+    galleryInfo.images.unshift(url);
+    if (galleryInfo.currentIndex > 0) {
+        galleryInfo.currentIndex += 1; // Still the same image
+    } else {
+        displayImage(galleryId);
+    }
+}
+
+// Adds images saved in a folder to a gallery as the server announces them
+export function watchImages(galleryId: string, folder: string): void {
+    onServerEvent<{ folder: string; url: string }>("image", data => {
+        if (data.folder === folder) {
+            addImage(galleryId, data.url);
+        }
+    });
+}
+
 // Displays the current image in a specified gallery
 export function displayImage(galleryId: string): void {
     const gallery = document.getElementById(galleryId);
@@ -37,10 +71,15 @@ export function displayImage(galleryId: string): void {
     gallery.innerHTML = ""; // Clears the current content
 
     if (galleryInfo.images.length > 0) {
+        // Shows the lightweight preview tier; clicking opens the full-resolution image
+        let link = document.createElement("a");
+        link.href = galleryInfo.images[galleryInfo.currentIndex];
+        link.target = "_blank";
         let img = document.createElement("img");
-        img.src = galleryInfo.images[galleryInfo.currentIndex];
+        img.src = galleryInfo.images[galleryInfo.currentIndex] + "?size=preview";
         img.classList.add("active");
-        gallery.appendChild(img);
+        link.appendChild(img);
+        gallery.appendChild(link);
 
         let filename = document.createElement("p");
         filename.textContent = "Filename: " + galleryInfo.images[galleryInfo.currentIndex].split('/').pop();
@@ -52,7 +91,14 @@ export function displayImage(galleryId: string): void {
 
 // Changes the displayed image in a specified gallery based on direction
 export function changeImage(direction: number, galleryId: string): void {
-    const galleryInfo = galleries[galleryId];
+    const galleryInfo: Gallery = galleries[galleryId];
+    if (direction > 0 && galleryInfo.currentIndex === galleryInfo.images.length - 1 && galleryInfo.nextCursor) {
+        loadImages(galleryInfo.endpoint!, galleryId, galleryInfo.nextCursor).then(() => {
+            galleryInfo.currentIndex = Math.min(galleryInfo.currentIndex + 1, galleryInfo.images.length - 1);
+            displayImage(galleryId);
+        });
+        return;
+    }
     galleryInfo.currentIndex = (galleryInfo.currentIndex + direction + galleryInfo.images.length) % galleryInfo.images.length;
     displayImage(galleryId);
 }
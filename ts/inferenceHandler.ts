@@ -1,4 +1,25 @@
 // inferenceHandler.ts
+import { onServerEvent } from "./serverEvents";
+
+// Shows the latest test image on the RunTest page
+export function showRunTestImage(url: string | undefined): void {
+    const gallery = document.getElementById("RunTest");
+    if (!gallery) return;
+    gallery.innerHTML = "";
+
+    if (url) {
+        const img: HTMLImageElement = document.createElement("img");
+        img.src = url;
+        img.classList.add("active");
+        gallery.appendChild(img);
+
+        const filename: HTMLParagraphElement = document.createElement("p");
+        filename.textContent = "Filename: " + url.split('/').pop();
+        gallery.appendChild(filename);
+    } else {
+        gallery.textContent = "No image available";
+    }
+}
 
 // Performs the mosquito detection inference
 export function performInference(): void {
@@ -12,14 +33,13 @@ export function performInference(): void {
 
     fetch('/RunTest_Capture', { method: 'POST' })
         .then(response => response.json())
-        .then((data: { status: string; error?: string }) => {
+        .then((data: { status: string; image?: string; error?: string }) => {
             if (data.status === "Captured & Inferred") {
                 console.log("✅ Image captured and inference completed!");
-                showNotification("✅ Image captured & processed! Reloading...");
-
-                setTimeout(() => {
-                    location.reload(); // Refresh the page to display the updated image
-                }, 2000);
+                showNotification("✅ Image captured & processed!");
+                showRunTestImage(data.image);
+                button.disabled = false;
+                button.textContent = "PERFORM INFERENCE";
             } else {
                 console.error("❌ Error:", data.error);
                 showNotification("❌ Error capturing or processing image!", "error");
@@ -53,4 +73,11 @@ document.addEventListener("DOMContentLoaded", function () {
     if (testButton) {
         testButton.addEventListener("click", performInference);
     }
+
+    // A test run from another open page shows up here too
+    onServerEvent<{ folder: string; url: string }>("image", data => {
+        if (data.folder === "system_test") {
+            showRunTestImage(data.url);
+        }
+    });
 });
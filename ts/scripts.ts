@@ -4,6 +4,8 @@ Maintains the state of image galleries.
 interface Gallery {
     images: string[];
     currentIndex: number;
+    endpoint?: string;
+    nextCursor?: string | null;
 }
 
 interface Galleries {
@@ -21,36 +23,82 @@ const galleries: Galleries = {
     }
 };
 
+interface SensorData {
+    time: string;
+    temperature: number;
+    next_capture: string | null;
+}
+
+/* 
+The page's single connection to the server's event stream, opened by the first listener.
+*/
+let eventSource: EventSource | null = null;
+
+/* 
+Calls handler with the data of every server event of the given type; returns false without EventSource support.
+*/
+function onServerEvent(type: string, handler: (data: any) => void): boolean {
+    if (!window.EventSource) {
+        return false;
+    }
+    if (!eventSource) {
+        eventSource = new EventSource("/events");  // Reconnects on its own if the connection drops
+    }
+    eventSource.addEventListener(type, (event: MessageEvent) => handler(JSON.parse(event.data)));
+    return true;
+}
+
+/* 
+Shows a sensor snapshot on the home page.
+*/
+function showData(data: SensorData): void {
+    let splitDateTime: string[] = data.time.split(" ");
+    document.getElementById("time")!.textContent = splitDateTime[1];
+    document.getElementById("date")!.textContent = splitDateTime[0];
+    document.getElementById("temperature")!.textContent = data.temperature.toFixed(2);
+
+    // The server computes the next window from the configured capture schedules
+    let nextCapture: string = data.next_capture ? data.next_capture : "Scheduled capture disabled";
+    document.getElementById("next-capture")!.textContent = nextCapture;
+}
+
 /* 
 Updates the display data on the home page.
 */
 function updateData(): void {
     fetch("/data")
         .then(response => response.json())
-        .then((data: { time: string; temperature: number }) => {
-            let splitDateTime: string[] = data.time.split(" ");
-            document.getElementById("time")!.textContent = splitDateTime[1];
-            document.getElementById("date")!.textContent = splitDateTime[0];
-            document.getElementById("temperature")!.textContent = data.temperature.toFixed(2);
-
-            let currentHour: number = parseInt(splitDateTime[1].split(":")[0]);
-            let nextCapture: string = currentHour >= 20 ? "07:00 AM (Tomorrow)" :
-                              currentHour >= 7 ? "08:00 PM" : "07:00 AM";
-            document.getElementById("next-capture")!.textContent = nextCapture;
-        })
+        .then(showData)
         .catch(error => console.error("Error fetching data:", error));
 }
 
+/* 
+Keeps the home page up to date from the server's sensor events, or by polling where EventSource is missing.
+*/
+function watchData(): void {
+    updateData();
+    if (!onServerEvent("sensor", showData)) {
+        setInterval(updateData, 2000);
+    }
+}
+
 /* 
 Loads images from the server for a specified gallery.
 */
-function loadImages(apiEndpoint: string, galleryId: string): void {
-    fetch(apiEndpoint)
+function loadImages(apiEndpoint: string, galleryId: string, cursor: string | null = null): Promise<void> {
+    // Pages come newest first; later pages are appended when the viewer steps past the last loaded image
+    const url: string = cursor ? apiEndpoint + "?cursor=" + encodeURIComponent(cursor) : apiEndpoint;
+    return fetch(url)
         .then(response => response.json())
-        .then((data: { images: string[] }) => {
-            if (data.images && data.images.length > 0) {
-                galleries[galleryId].images = data.images;
-                galleries[galleryId].currentIndex = 0;  // Resets index when images are loaded
+        .then((data: { images: string[]; next_cursor: string | null }) => {
+            const galleryInfo: Gallery = galleries[galleryId];
+            galleryInfo.endpoint = apiEndpoint;
+            galleryInfo.nextCursor = data.next_cursor || null;
+            if (cursor) {
+                galleryInfo.images = galleryInfo.images.concat(data.images || []);
+            } else if (data.images && data.images.length > 0) {
+                galleryInfo.images = data.images;
+                galleryInfo.currentIndex = 0;  // Resets index when images are loaded
                 displayImage(galleryId);
             } else {
                 console.error("No images found at:", apiEndpoint);
@@ -59,6 +107,33 @@ function loadImages(apiEndpoint: string, galleryId: string): void {
         .catch(error => console.error("Error fetching images from", apiEndpoint, ":", error));
 }
 
+/* 
+Puts a newly saved image at the front of a gallery, without moving a viewer who has stepped back to older images.
+*/
+function addImage(galleryId: string, url: string): void {
+    const galleryInfo: Gallery = galleries[galleryId];
+    if (galleryInfo.images.includes(url)) {
+        return;
+    }
+    galleryInfo.images.unshift(url);
+    if (galleryInfo.currentIndex > 0) {
+        galleryInfo.currentIndex += 1;  // Still the same image
+    } else {
+        displayImage(galleryId);
+    }
+}
+
+/* 
+Adds images saved in a folder to a gallery as the server announces them.
+*/
+function watchImages(galleryId: string, folder: string): void {
+    onServerEvent("image", (data: { folder: string; url: string }) => {
+        if (data.folder === folder) {
+            addImage(galleryId, data.url);
+        }
+    });
+}
+
 /* 
 Displays the current image in a specified gallery.
 */
@@ -67,10 +142,15 @@ function displayImage(galleryId: string): void {
     const galleryInfo: Gallery = galleries[galleryId];
     gallery.innerHTML = "";  // Clears the current content
     if (galleryInfo.images.length > 0) {
+        // Shows the lightweight preview tier; clicking opens the full-resolution image
+        let link: HTMLAnchorElement = document.createElement("a");
+        link.href = galleryInfo.images[galleryInfo.currentIndex];
+        link.target = "_blank";
         let img: HTMLImageElement = document.createElement("img");
-        img.src = galleryInfo.images[galleryInfo.currentIndex];
+        img.src = galleryInfo.images[galleryInfo.currentIndex] + "?size=preview";
         img.classList.add("active");
-        gallery.appendChild(img);
+        link.appendChild(img);
+        gallery.appendChild(link);
 
         let filename: HTMLParagraphElement = document.createElement("p");
         filename.textContent = "Filename: " + galleryInfo.images[galleryInfo.currentIndex].split('/').pop();
@@ -85,6 +165,13 @@ Changes the displayed image in a specified gallery based on direction.
 */
 function changeImage(direction: number, galleryId: string): void {
     const galleryInfo: Gallery = galleries[galleryId];
+    if (direction > 0 && galleryInfo.currentIndex === galleryInfo.images.length - 1 && galleryInfo.nextCursor) {
+        loadImages(galleryInfo.endpoint!, galleryId, galleryInfo.nextCursor).then(() => {
+            galleryInfo.currentIndex = Math.min(galleryInfo.currentIndex + 1, galleryInfo.images.length - 1);
+            displayImage(galleryId);
+        });
+        return;
+    }
     galleryInfo.currentIndex = (galleryInfo.currentIndex + direction + galleryInfo.images.length) % galleryInfo.images.length;
     displayImage(galleryId);
 }
@@ -120,7 +207,28 @@ function clearDatabase(): void {
 Initiates the download of the data log as a CSV file.
 */
 function downloadCSV(): void {
-    window.location.href = '/download-data'; // Navigates to download data endpoint
+    window.location.href = '/download-data' + window.location.search; // Navigates to download data endpoint, keeping the date filter
+}
+
+/* 
+Shows the latest test image on the RunTest page.
+*/
+function showRunTestImage(url: string | undefined): void {
+    const gallery: HTMLElement = document.getElementById('RunTest')!;
+    gallery.innerHTML = "";
+
+    if (url) {
+        let img: HTMLImageElement = document.createElement("img");
+        img.src = url;
+        img.classList.add("active");
+        gallery.appendChild(img);
+
+        let filename: HTMLParagraphElement = document.createElement("p");
+        filename.textContent = "Filename: " + url.split('/').pop();
+        gallery.appendChild(filename);
+    } else {
+        gallery.textContent = "No image available";
+    }
 }
 
 document.addEventListener("DOMContentLoaded", function(): void {
@@ -129,23 +237,16 @@ document.addEventListener("DOMContentLoaded", function(): void {
             .then(response => response.json())
             .then((data: { images: string[] }) => {
                 console.log("Received image data:", data);
-                const gallery: HTMLElement = document.getElementById('RunTest')!;
-                gallery.innerHTML = "";
-
-                if (data.images.length > 0) {
-                    let img: HTMLImageElement = document.createElement("img");
-                    img.src = data.images[0];
-                    img.classList.add("active");
-                    gallery.appendChild(img);
-
-                    let filename: HTMLParagraphElement = document.createElement("p");
-                    filename.textContent = "Filename: " + data.images[0].split('/').pop();
-                    gallery.appendChild(filename);
-                } else {
-                    gallery.textContent = "No image available";
-                }
+                showRunTestImage(data.images[0]);
             })
             .catch(error => console.error("Error fetching RunTest image:", error));
+
+        // A test run from another open page shows up here too
+        onServerEvent("image", (data: { folder: string; url: string }) => {
+            if (data.folder === "system_test") {
+                showRunTestImage(data.url);
+            }
+        });
     }
 });
 
@@ -158,14 +259,13 @@ function performInference(): void {
 
     fetch('/RunTest_Capture', { method: 'POST' })  // Run capture and inference
         .then(response => response.json())
-        .then((data: { status: string; error?: string }) => {
+        .then((data: { status: string; image?: string; error?: string }) => {
             if (data.status === "Captured & Inferred") {
                 console.log("✅ Image captured and inference completed!");
-                showNotification("✅ Image captured & processed! Reloading...");
-
-                setTimeout(() => {
-                    location.reload();  // Refresh the page to display the updated image
-                }, 2000);
+                showNotification("✅ Image captured & processed!");
+                showRunTestImage(data.image);
+                button.disabled = false;
+                button.textContent = "PERFORM INFERENCE";
             } else {
                 console.error("❌ Error:", data.error);
                 showNotification("❌ Error capturing or processing image!", "error");
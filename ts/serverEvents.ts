@@ -0,0 +1,16 @@
+// serverEvents.ts
+
+// The page's single connection to the server's event stream, opened by the first listener
+let eventSource: EventSource | null = null;
+
+// Calls handler with the data of every server event of the given type; returns false without EventSource support
+export function onServerEvent<T>(type: string, handler: (data: T) => void): boolean {
+    if (!window.EventSource) {
+        return false;
+    }
+    if (!eventSource) {
+        eventSource = new EventSource("/events"); // Reconnects on its own if the connection drops
+    }
+    eventSource.addEventListener(type, (event: MessageEvent) => handler(JSON.parse(event.data) as T));
+    return true;
+}
@@ -0,0 +1,432 @@
+"""Capture worker: the one long-lived process that drives the camera, RTC and flash.
+
+It runs the capture scheduler, the inference job queue and the background image writer, and holds
+the state that must exist exactly once (sensor snapshot, board tracker, forecaster, live events).
+`python worker.py` runs it on its own, next to the web tier started from wsgi.py, which reaches it
+over worker_ipc; `python main.py` runs it inside the development server instead. An exclusive lock
+on WORKER_LOCK_FILE, taken before the hardware is opened, makes sure only one worker runs.
+"""
+import fcntl
+import os
+import re
+import threading
+import time
+
+import config
+from annotate import annotate, encode_jpeg, render_annotated
+from config import (IMAGE_FOLDER, IN_MEMORY_PIPELINE, INFERENCE_DELAY_SECONDS, INFERENCE_OUTPUT_FOLDER, LAZY_ANNOTATION,
+                    PREDICTION_CACHE_ENABLED, PREFILTER_ENABLED, TEST_INFERENCE_FOLDER)
+from db import get_database
+from detections_store import delete_all as delete_all_detections, delete_capture as delete_capture_detections, insert_detections
+from detector import get_detector
+from events import EventBroker, image_event
+from forecast import Forecaster
+from hal import get_hardware
+from image_catalog import filename_captured_at, reconcile as reconcile_images, record_image, remove_images
+from image_writer import ImageWriter
+from inference_client import get_client
+from job_queue import JobQueue
+from mosquito_data import SCHEDULED_HOURS, wall_clock_epoch
+from prediction_cache import get_cache
+from prefilter import get_prefilter
+from rollups import add_row as add_rollup_row, delete_all as delete_all_rollups, refresh_buckets
+from scheduler import CaptureScheduler
+from sensor_service import SensorService
+from tracking import BoardTracker, delete_all as delete_all_tracks
+from worker_ipc import WorkerServer
+
+
+def acquire_leader_lock(path=config.WORKER_LOCK_FILE):
+    """Takes the lock that makes this process the only capture worker. The returned file must stay open."""
+    lock_file = open(path, "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)  # Released by the kernel when the process exits
+    except BlockingIOError:
+        lock_file.seek(0)
+        holder = lock_file.read().strip() or "unknown"
+        lock_file.close()
+        raise SystemExit(f"❌ Another capture worker (pid {holder}) holds {path}; only one may drive the camera and scheduler")
+    lock_file.truncate(0)
+    lock_file.write(f"{os.getpid()}\n")
+    lock_file.flush()
+    return lock_file
+
+
+leader_lock = acquire_leader_lock()
+
+# Camera, DS3231 real-time clock and flash LED (real devices, or simulated off-device)
+camera, rtc, flash = get_hardware()
+sensors = SensorService(rtc)  # Every reader goes through the cached snapshot instead of the I2C bus
+
+os.makedirs(IMAGE_FOLDER, exist_ok=True)
+os.makedirs(INFERENCE_OUTPUT_FOLDER, exist_ok=True)
+os.makedirs(TEST_INFERENCE_FOLDER, exist_ok=True)
+
+# In the in-memory pipeline, JPEGs captured but not yet picked up by their inference job
+captured_frames = {}
+
+# Live updates for every open page (GET /events): sensor ticks, new images and finished inferences
+events = EventBroker()
+
+def image_saved(folder, filename):
+    """Tells open pages that an image is on disk and cataloged, so galleries can show it without reloading."""
+    events.publish("image", image_event(folder, filename))
+
+def capture_image(shots=1):
+    """Captures an image (or a burst of shots) using the Raspberry Pi Camera Module 2 at scheduled times."""
+    reading = sensors.read()
+    now = reading.datetime
+    date_str = f"{now.tm_year}_{now.tm_mon:02d}_{now.tm_mday:02d}"
+    time_period = "AM" if now.tm_hour < 12 else "PM"
+    filename = f"{date_str}_{time_period}.jpg"
+    filenames = [filename]
+    if (now.tm_hour, now.tm_min) != (SCHEDULED_HOURS[time_period], 0) or os.path.exists(os.path.join(IMAGE_FOLDER, filename)):
+        # Off the usual 07:00 / 20:00 slot: the time keeps the name unique
+        filenames = [f"{date_str}_{time_period}_{now.tm_hour:02d}{now.tm_min:02d}{now.tm_sec:02d}.jpg"]
+    # Later shots of a burst are numbered after the first shot's time
+    filenames += [f"{date_str}_{time_period}_{now.tm_hour:02d}{now.tm_min:02d}{now.tm_sec:02d}-{shot + 1}.jpg" for shot in range(1, shots)]
+    image_paths = [os.path.join(IMAGE_FOLDER, f) for f in filenames]
+
+    try:
+        print(f"📸 Capturing {len(image_paths)} image(s): {', '.join(image_paths)}...")
+        if IN_MEMORY_PIPELINE:
+            # The buffers go straight to inference; the writer saves each one to disk in the background
+            for image_path, filename, data in zip(image_paths, filenames, camera.capture_frames(len(filenames))):
+                captured_frames[filename] = data
+                image_writer.save(IMAGE_FOLDER, filename, data, wall_clock_epoch(now))
+                print(f"✅ Image captured: {image_path} ({len(data) // 1024} KB, saving in the background)")
+                run_inference_later(image_path, filename, filenames[0], reading.temperature)
+            return
+        camera.capture_burst(image_paths)
+        for image_path, filename in zip(image_paths, filenames):
+            print(f"✅ Image saved: {image_path}")
+            db.write(record_image, IMAGE_FOLDER, filename, wall_clock_epoch(now)).result()
+            image_saved(IMAGE_FOLDER, filename)
+            run_inference_later(image_path, filename, filenames[0], reading.temperature)
+    except Exception as e:
+        print(f"❌ Camera Error: {e}")
+
+def run_inference(image_path, filename, slot=None, temperature=None):
+    """Processes images to detect and count mosquito presence.
+
+    slot is the first shot of the capture's burst: every shot is annotated, but the burst is logged
+    as one MosquitoData row under it, holding the shot with the most detections. temperature is the
+    reading taken at capture time, since the job may run long after it.
+    """
+    output_filename = f"output_{filename}"
+    output_path = os.path.join(INFERENCE_OUTPUT_FOLDER, output_filename)
+
+    try:
+        print(f"🚀 Running inference on {image_path}...")
+        # A retry, or a job recovered after a restart, reads the capture back from disk
+        image_bytes = captured_frames.pop(filename, None)
+        if image_bytes is None:
+            with open(image_path, "rb") as f:
+                image_bytes = f.read()
+        result = (get_prefilter() if PREFILTER_ENABLED else get_detector()).detect(image_bytes)
+        predictions = result.get("predictions", [])
+        faa_count = len(predictions)
+        print(f"✅ Total FAA detected: {faa_count}" + (f" ({result['prefilter']['mode']})" if "prefilter" in result else ""))
+
+        reading = sensors.read()
+        captured_at = filename_captured_at(filename, wall_clock_epoch(reading.datetime))
+        if temperature is None:
+            temperature = reading.temperature  # A job queued before the payload carried the capture's reading
+        now = time.gmtime(captured_at)
+        timestamp = f"{now.tm_year}-{now.tm_mon:02d}-{now.tm_mday:02d} {'AM' if now.tm_hour < 12 else 'PM'}"
+        if LAZY_ANNOTATION:
+            print(f"🕓 Annotated image will be rendered on first view at /inference_output/{output_filename}")
+        else:
+            info_text = f"{timestamp} | FAA Count: {faa_count} | Temp: {temperature:.1f} degC"
+            if IN_MEMORY_PIPELINE:
+                image_writer.save(INFERENCE_OUTPUT_FOLDER, output_filename, encode_jpeg(annotate(image_bytes, predictions, info_text)),
+                                  None, (IMAGE_FOLDER, filename))
+                print(f"✅ Inference result queued for saving at {output_path}")
+            else:
+                render_annotated(image_bytes, predictions, output_path, info_text)
+                db.write(record_image, INFERENCE_OUTPUT_FOLDER, output_filename, None, (IMAGE_FOLDER, filename)).result()
+                image_saved(INFERENCE_OUTPUT_FOLDER, output_filename)
+                print(f"✅ Inference result saved at {output_path}")
+        print("====================================================================== > LOGGING DATA")
+        new_arrivals = log_data(timestamp, faa_count, temperature, predictions, capture_type="scheduled",
+                                captured_at=captured_at, source=slot or filename)
+        # An output still queued for the writer is announced by its "image" event instead
+        output_url = None if IN_MEMORY_PIPELINE and not LAZY_ANNOTATION else f"/{INFERENCE_OUTPUT_FOLDER}/{output_filename}"
+        events.publish("inference", {"filename": filename, "url": output_url, "faa_count": faa_count,
+                                     "new_arrivals": new_arrivals, "temperature": temperature, "captured_at": captured_at})
+
+    except Exception as e:
+        print(f"❌ Inference Error: {e}")
+        raise  # Leave the job to be retried by the queue
+
+def render_inference_output(output_filename):
+    """Renders the annotated image for a capture from its cached predictions and stores it for later requests."""
+    filename = output_filename[len("output_"):]
+    image_path = os.path.join(IMAGE_FOLDER, filename)
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    # What was counted: the prefilter's result for captures it handled, else the detector's (a cache hit)
+    result = get_prefilter().lookup(image_bytes) if PREFILTER_ENABLED else None
+    if result is None:
+        result = get_detector().detect(image_bytes)
+    predictions = result.get("predictions", [])
+
+    info_text = f"FAA Count: {len(predictions)}"
+    match = re.match(r"(\d{4})_(\d{2})_(\d{2})_(AM|PM)(?:_\d{6}(?:-\d+)?)?\.jpg$", filename)
+    if match:
+        timestamp = f"{match[1]}-{match[2]}-{match[3]} {match[4]}"
+        # This capture's own row, else its burst's: later shots carry the first shot's time in their name
+        with db.read() as conn:
+            row = conn.execute("SELECT temperature FROM MosquitoData WHERE source = ? OR (captured_at = ? AND capture_type = 'scheduled') "
+                               "ORDER BY source = ? DESC, id DESC LIMIT 1;",
+                               (filename, filename_captured_at(filename, 0), filename)).fetchone()
+        info_text = f"{timestamp} | {info_text}" + (f" | Temp: {row[0]:.1f} degC" if row and row[0] is not None else "")
+
+    render_annotated(image_bytes, predictions, os.path.join(INFERENCE_OUTPUT_FOLDER, output_filename), info_text)
+    db.write(record_image, INFERENCE_OUTPUT_FOLDER, output_filename, None, (IMAGE_FOLDER, filename)).result()
+    image_saved(INFERENCE_OUTPUT_FOLDER, output_filename)
+    print(f"✅ Rendered {output_filename} on demand")
+
+def run_inference_later(image_path, filename, slot=None, temperature=None):
+    """Queues the inference job to run after a delay, to allow for any post-capture processing."""
+    delay = 0 if IN_MEMORY_PIPELINE else INFERENCE_DELAY_SECONDS  # An in-memory capture is complete already
+    _, deferred = job_queue.enqueue("inference", {"image_path": image_path, "filename": filename, "slot": slot,
+                                                  "temperature": temperature}, delay=delay, defer=True)
+    if deferred:
+        # Queued behind the backlog; the job reads the capture back from disk when its turn comes
+        captured_frames.pop(filename, None)
+        print(f"⏸️ Inference queue is full, {image_path} will be inferred once the backlog drains")
+    else:
+        print(f"⏳ Scheduling inference in {delay:.0f} seconds...")
+
+db = get_database()
+job_queue = JobQueue({"inference": run_inference}, db)
+image_writer = ImageWriter(db, on_saved=image_saved)
+forecaster = Forecaster()
+forecaster.load(db)
+tracker = BoardTracker(db)
+reconcile_images(db, [IMAGE_FOLDER, INFERENCE_OUTPUT_FOLDER, TEST_INFERENCE_FOLDER], IMAGE_FOLDER)
+
+def scheduled_capture(schedule):
+    """Takes the shots of a scheduled capture window, with the flash on only while the camera captures."""
+    print(f"📸 Triggering scheduled capture ({schedule.spec}, {schedule.burst} shot(s))...")
+    flash.on()
+    try:
+        capture_image(schedule.burst)
+    finally:
+        flash.off()
+
+scheduler = CaptureScheduler(scheduled_capture, lambda: wall_clock_epoch(sensors.read().datetime), db)
+
+
+def log_data(datetime_str, faa_count, temperature, predictions=None, capture_type="scheduled", captured_at=None, source=None):
+    """Logs mosquito data and every detected box into the database in one transaction.
+
+    The boxes of a scheduled capture are matched against the board's earlier ones to count new arrivals,
+    which are returned (None for other captures). A capture logged before under the same source (another
+    shot of the same burst, or an inference job run again after a crash) keeps its row, which takes the
+    count and boxes of whichever shot detected more.
+    """
+    if captured_at is None:
+        captured_at = wall_clock_epoch(sensors.read().datetime)
+
+    def insert(cursor):
+        if source is not None:
+            logged = cursor.execute("SELECT id, faa_count, captured_at, new_arrivals FROM MosquitoData WHERE source = ?;",
+                                    (source,)).fetchone()
+            if logged is not None:
+                row_id, logged_count, logged_at, logged_arrivals = logged
+                if faa_count <= logged_count:
+                    return None, logged_arrivals
+                # The board's tracks already hold the burst's first logged shot; only the row and its boxes change
+                cursor.execute("UPDATE MosquitoData SET faa_count = ?, temperature = ? WHERE id = ?;", (faa_count, temperature, row_id))
+                delete_capture_detections(cursor, row_id)
+                insert_detections(cursor, row_id, logged_at, predictions or [])
+                refresh_buckets(cursor, [logged_at])
+                return False, logged_arrivals
+        new_arrivals = None
+        if capture_type == "scheduled" and predictions is not None:
+            new_arrivals = tracker.update(cursor, captured_at, predictions)
+        cursor.execute("INSERT INTO MosquitoData (datetime, faa_count, temperature, captured_at, capture_type, new_arrivals, source) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?);", (datetime_str, faa_count, temperature, captured_at, capture_type, new_arrivals, source))
+        add_rollup_row(cursor, captured_at, faa_count, temperature)
+        return insert_detections(cursor, cursor.lastrowid, captured_at, predictions or []), new_arrivals
+
+    try:
+        detections, new_arrivals = db.write(insert).result()
+    except Exception:
+        tracker.load()  # The tracker's in-memory board may be ahead of the rolled-back transaction
+        raise
+    if detections is None:
+        print(f"⏭️ {source} was already logged with as many detections, keeping the existing row")
+        return new_arrivals
+    if detections is False:
+        print(f"🔁 {source} updated to this shot's higher count: FAA Count = {faa_count}")
+        return new_arrivals
+    print(f"Data logged for {datetime_str}: FAA Count = {faa_count}, Temp = {temperature}, {detections} box(es) stored"
+          + (f", {new_arrivals} new" if new_arrivals is not None else ""))
+    if capture_type == "scheduled":
+        forecaster.observe(captured_at, faa_count, temperature)
+    return new_arrivals
+
+def sensor_snapshot():
+    """Time, temperature and next scheduled capture, as shown on the dashboard."""
+    reading = sensors.read()
+    now = reading.datetime
+    next_fire = scheduler.next_fire(wall_clock_epoch(now))
+    return {"time": f"{now.tm_year}-{now.tm_mon:02d}-{now.tm_mday:02d} {now.tm_hour:02d}:{now.tm_min:02d}:{now.tm_sec:02d}", "temperature": reading.temperature,
+            "next_capture": time.strftime("%Y-%m-%d %H:%M", time.gmtime(next_fire)) if next_fire else None}
+
+def run_test():
+    """Deletes old images, captures a new one, runs inference, and saves only the processed image."""
+    try:
+        flash.on()
+        # Step 1: Delete old images in system_test
+        files = [f for f in os.listdir(TEST_INFERENCE_FOLDER) if f.endswith(".jpg")]
+        for file in files:
+            os.remove(os.path.join(TEST_INFERENCE_FOLDER, file))
+        db.write(remove_images, TEST_INFERENCE_FOLDER, files).result()
+        print("🗑️ Deleted old image(s) in system_test.")
+
+        # Step 2: Capture a new image
+        reading = sensors.read()
+        now = reading.datetime
+        filename = f"RunTest_{now.tm_year}_{now.tm_mon:02d}_{now.tm_mday:02d}_{now.tm_hour:02d}_{now.tm_min:02d}.jpg"
+        image_path = os.path.join(TEST_INFERENCE_FOLDER, filename)
+
+        print(f"📸 Capturing new image: {image_path}...")
+        if IN_MEMORY_PIPELINE:
+            image = camera.capture_bytes()  # Only the inferred image is kept, so the original never touches the disk
+            print("✅ Image captured.")
+        else:
+            image = image_path
+            camera.capture(image_path)
+            print("✅ Image captured and saved.")
+
+        # Step 3: Run inference on the captured image
+        output_filename = f"inferred_{filename}"
+        output_path = os.path.join(TEST_INFERENCE_FOLDER, output_filename)
+
+        print(f"🚀 Running inference on {image_path}...")
+        try:
+            result = get_detector().detect(image)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return {"status": "Error", "error": "Inference failed"}
+
+        predictions = result.get("predictions", [])
+        faa_count = len(predictions)
+        print(f"✅ Total FAA detected: {faa_count}")
+
+        timestamp = f"{now.tm_year}-{now.tm_mon:02d}-{now.tm_mday:02d} {'AM' if now.tm_hour < 12 else 'PM'}"
+        info_text = f"{timestamp} | FAA Count: {faa_count} | Temp: {reading.temperature:.1f} degC"
+
+        # Save the inferred image, replacing the original
+        render_annotated(image, predictions, output_path, info_text)
+        db.write(record_image, TEST_INFERENCE_FOLDER, output_filename, wall_clock_epoch(now)).result()
+        image_saved(TEST_INFERENCE_FOLDER, output_filename)
+        print(f"✅ Inference result saved at {output_path}")
+
+        # Remove the original image (only keeping the inferred one)
+        if not IN_MEMORY_PIPELINE:
+            os.remove(image_path)
+        log_data(f"{now.tm_year}-{now.tm_mon:02d}-{now.tm_mday:02d}_test_{now.tm_hour:02d}:{now.tm_min:02d}", faa_count, reading.temperature, predictions, capture_type="manual", captured_at=wall_clock_epoch(now))
+
+        return {"status": "Captured & Inferred", "image": f"/system_test/{output_filename}"}
+
+    except Exception as e:
+        print(f"❌ Capture or Inference Error: {e}")
+        return {"status": "Error", "error": str(e)}
+    finally:
+        flash.off()
+
+
+class WorkerService:
+    """What the web tier asks of the worker: called directly by `python main.py`, over worker_ipc from wsgi.py."""
+
+    METHODS = ["sensor_snapshot", "sensor_stats", "schedule", "board", "forecast", "inference_stats", "inference_jobs",
+               "render_output", "run_test", "clear_data", "reload_forecast", "wait_events"]
+
+    def sensor_snapshot(self):
+        return sensor_snapshot()
+
+    def sensor_stats(self):
+        return sensors.summary()
+
+    def schedule(self, enabled=None):
+        """The scheduler's status, after switching scheduled capture on or off if enabled is given."""
+        if enabled is not None:
+            scheduler.set_enabled(enabled)
+        return scheduler.status()
+
+    def board(self, reset=False):
+        """The current sticky board's status, after starting a new board if reset is set."""
+        if reset:
+            tracker.reset(wall_clock_epoch(sensors.read().datetime))
+            print("🪰 Started a new board, new arrivals are counted from zero")
+        return tracker.status()
+
+    def forecast(self):
+        return forecaster.latest()
+
+    def inference_stats(self):
+        client = get_client()
+        stats = client.stats.summary()
+        stats["bytes_sent"] = client.bytes_sent
+        if PREDICTION_CACHE_ENABLED:
+            stats["prediction_cache"] = get_cache().stats()
+        if PREFILTER_ENABLED:
+            stats["prefilter"] = get_prefilter().summary()
+        return stats
+
+    def inference_jobs(self):
+        return {**job_queue.stats(), "image_writer": image_writer.stats()}
+
+    def render_output(self, output_filename):
+        """Renders a capture's annotated image on its first view (LAZY_ANNOTATION), here where the detector and cache live."""
+        render_inference_output(output_filename)
+
+    def run_test(self):
+        return run_test()
+
+    def clear_data(self):
+        """Deletes every logged capture and box, and the state derived from them."""
+        def delete_all(cursor):
+            cursor.execute("DELETE FROM MosquitoData")
+            delete_all_detections(cursor)
+            delete_all_rollups(cursor)
+            delete_all_tracks(cursor)
+
+        db.write(delete_all).result()
+        forecaster.load(db)
+        tracker.load()
+
+    def reload_forecast(self):
+        """Rebuilds the forecast from the database, e.g. after backfill.py rewrote past counts."""
+        forecaster.load(db)
+        return forecaster.latest()
+
+    def wait_events(self, after, timeout):
+        return events.wait(after, timeout)
+
+
+service = WorkerService()
+
+
+def start(serve=False):
+    """Starts sensor sampling, the inference jobs, the scheduler and the sensor events; with serve, also the socket for web processes."""
+    sensors.start()
+    job_queue.start()
+    scheduler.start()
+    events.start_ticker(sensor_snapshot)
+    if serve:
+        WorkerServer(service, WorkerService.METHODS).start()
+
+
+if __name__ == '__main__':
+    start(serve=True)
+    print("🚀 Capture worker running; serve the web pages with gunicorn wsgi:app")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("👋 Capture worker stopped")
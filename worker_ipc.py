@@ -0,0 +1,105 @@
+"""Local RPC between the web processes and the capture worker, over a Unix socket.
+
+The worker exposes a handful of methods (sensor snapshot, schedule switch, board reset, test
+capture, event relay...) with WorkerServer; web processes call them through WorkerClient, which
+keeps a small pool of authenticated connections so a request does not pay for a handshake.
+Calls are (method, args) tuples pickled by multiprocessing.connection.
+"""
+import os
+import queue
+import threading
+from multiprocessing.connection import Client, Listener
+
+import config
+
+
+class WorkerError(RuntimeError):
+    """Raised by WorkerClient when the worker's method raised."""
+
+
+class WorkerUnavailable(WorkerError):
+    """Raised by WorkerClient when the capture worker is not running or the connection dropped."""
+
+
+class WorkerServer:
+    def __init__(self, service, methods, address=config.WORKER_SOCKET, authkey=config.WORKER_AUTHKEY):
+        self.service = service
+        self.methods = set(methods)
+        self.address = address
+        self.authkey = authkey.encode()
+        self.listener = None
+
+    def start(self):
+        """Starts accepting connections. Call it only while holding the worker's leader lock."""
+        if os.path.exists(self.address):
+            os.remove(self.address)  # Left behind by a worker that did not shut down cleanly
+        self.listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.address, 0o600)
+        threading.Thread(target=self.accept_loop, name="worker-ipc", daemon=True).start()
+        print(f"🔗 Serving web processes on {self.address}")
+
+    def accept_loop(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except Exception as e:  # A client failing the handshake must not stop the server
+                print(f"❌ Rejected worker connection: {e}")
+                continue
+            threading.Thread(target=self.serve, args=(conn,), name="worker-ipc-conn", daemon=True).start()
+
+    def serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    method, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if method not in self.methods:
+                    conn.send(("error", f"Unknown method '{method}'"))
+                    continue
+                try:
+                    conn.send(("ok", getattr(self.service, method)(*args)))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class WorkerClient:
+    def __init__(self, address=config.WORKER_SOCKET, authkey=config.WORKER_AUTHKEY):
+        self.address = address
+        self.authkey = authkey.encode()
+        self.connections = queue.LifoQueue()
+
+    def connect(self):
+        try:
+            return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        except (OSError, EOFError) as e:
+            raise WorkerUnavailable(f"Capture worker is not running ({e})") from e
+
+    def call(self, method, *args):
+        """Runs method(*args) in the worker and returns its result."""
+        try:
+            conn = self.connections.get_nowait()
+        except queue.Empty:
+            conn = self.connect()
+        try:
+            try:
+                conn.send((method, args))
+            except OSError:
+                # A pooled connection from before a worker restart; the call never reached the worker
+                conn.close()
+                conn = self.connect()
+                conn.send((method, args))
+            status, result = conn.recv()
+        except (OSError, EOFError) as e:
+            conn.close()
+            raise WorkerUnavailable(f"Lost the connection to the capture worker ({e})") from e
+        self.connections.put(conn)
+        if status == "error":
+            raise WorkerError(result)
+        return result
+
+    def __getattr__(self, method):
+        """Lets the client stand in for the worker's service object: client.board() calls the worker's board()."""
+        if method.startswith("_"):
+            raise AttributeError(method)
+        return lambda *args: self.call(method, *args)
@@ -0,0 +1,15 @@
+"""Production entry point for the web pages, served by a multi-worker WSGI server:
+
+    python worker.py &
+    gunicorn --workers 3 --threads 16 --bind 0.0.0.0:5000 wsgi:app
+
+Every gunicorn worker serves pages and database reads on its own; anything that needs the camera,
+the scheduler or in-memory state is handed to the single capture worker (worker.py) over
+WORKER_SOCKET. Each open /events stream holds one thread, so --threads bounds the live pages per
+worker.
+"""
+import os
+
+os.environ["APP_MODE"] = "web"  # Before main imports config: never open the hardware in a web process
+
+from main import app  # noqa: E402